@@ -1,5 +1,7 @@
 from rest_framework import serializers
 from .models import UserLocation
+from apps.forecasts.serializers import ForecastSummarySerializer
+from apps.locations.models import Location
 from apps.locations.serializers import LocationSerializer
 
 
@@ -7,7 +9,7 @@ class UserLocationSerializer(serializers.ModelSerializer):
     location = LocationSerializer(read_only=True)
     location_id = serializers.PrimaryKeyRelatedField(
         source="location",
-        queryset=__import__("apps.locations.models", fromlist=["Location"]).Location.objects.all(),
+        queryset=Location.objects.all(),
         write_only=True,
     )
 
@@ -15,3 +17,12 @@ class UserLocationSerializer(serializers.ModelSerializer):
         model = UserLocation
         fields = ["id", "location", "location_id", "nickname", "is_primary", "created_at"]
         read_only_fields = ["id", "created_at"]
+
+
+class DashboardEntrySerializer(UserLocationSerializer):
+    """A saved place plus its upcoming forecasts (set by DashboardView)."""
+
+    forecasts = ForecastSummarySerializer(source="dashboard_forecasts", many=True, read_only=True)
+
+    class Meta(UserLocationSerializer.Meta):
+        fields = UserLocationSerializer.Meta.fields + ["forecasts"]
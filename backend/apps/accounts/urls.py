@@ -1,6 +1,7 @@
 from django.urls import path
-from .views import UserLocationListView
+from .views import DashboardView, UserLocationListView
 
 urlpatterns = [
     path("locations/", UserLocationListView.as_view(), name="user-location-list"),
+    path("dashboard/", DashboardView.as_view(), name="user-dashboard"),
 ]
@@ -1,10 +1,25 @@
+import logging
+from datetime import date, timedelta
+
+import httpx
+from django.db.models import Prefetch
+from django.utils import timezone as django_tz
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from apps.core.metrics import cache_result, stage
+from apps.core.tasks import enqueue
+from apps.forecasts.models import SunsetForecast
+from apps.forecasts.services.builder import build_forecasts
 from .models import UserLocation
-from .serializers import UserLocationSerializer
+from .serializers import DashboardEntrySerializer, UserLocationSerializer
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_DEFAULT_DAYS = 3
+DASHBOARD_MAX_DAYS = 7
 
 
 class UserLocationListView(APIView):
@@ -15,3 +30,69 @@ class UserLocationListView(APIView):
     def get(self, request):
         saved = UserLocation.objects.filter(user=request.user).select_related("location")
         return Response(UserLocationSerializer(saved, many=True).data)
+
+
+class DashboardView(APIView):
+    """
+    GET /api/v1/accounts/dashboard/?days=N
+
+    Every saved place with its forecasts for today and the following N-1
+    days.  Cached forecasts come from a single prefetch query; missing or
+    stale ones are filled by one batched Open-Meteo fetch, so the query count
+    doesn't grow with the number of saved places.  If that fetch fails the
+    refresh is queued on the interactive background lane.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            days = int(request.query_params.get("days", DASHBOARD_DEFAULT_DAYS))
+        except ValueError:
+            return Response({"error": "days must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= days <= DASHBOARD_MAX_DAYS:
+            return Response(
+                {"error": f"days must be between 1 and {DASHBOARD_MAX_DAYS}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        today = date.today()
+        dates = [today + timedelta(days=i) for i in range(days)]
+
+        with stage("dashboard.db_read"):
+            upcoming = SunsetForecast.objects.filter(forecast_date__range=(dates[0], dates[-1]))
+            saved = list(
+                UserLocation.objects.filter(user=request.user)
+                .select_related("location")
+                .prefetch_related(Prefetch("location__forecasts", queryset=upcoming, to_attr="upcoming_forecasts"))
+            )
+
+        now = django_tz.now()
+        by_location: dict[int, dict[date, SunsetForecast]] = {}
+        needs_refresh = {}
+        for entry in saved:
+            location = entry.location
+            fresh = {f.forecast_date: f for f in location.upcoming_forecasts if f.is_fresh(now)}
+            by_location[location.pk] = fresh
+            for d in dates:
+                cache_result("forecast", "hit" if d in fresh else "miss")
+            if len(fresh) < len(dates):
+                needs_refresh[location.pk] = location
+
+        if needs_refresh:
+            try:
+                built = build_forecasts(list(needs_refresh.values()), dates)
+            except httpx.HTTPError as exc:
+                logger.warning("Dashboard refresh failed, serving cached forecasts and retrying in background: %s", exc)
+                enqueue("apps.forecasts.tasks.refresh_forecasts", list(needs_refresh), [d.isoformat() for d in dates])
+                built = []
+            for forecast in built:
+                by_location[forecast.location_id][forecast.forecast_date] = forecast
+
+        for entry in saved:
+            forecasts = by_location[entry.location_id]
+            entry.dashboard_forecasts = [forecasts[d] for d in dates if d in forecasts]
+
+        with stage("dashboard.serialize"):
+            data = DashboardEntrySerializer(saved, many=True).data
+        return Response(data)
@@ -0,0 +1,16 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "apps.core"
+
+    def ready(self):
+        from .metrics import register_scrape_collector
+        from .ratelimit import BudgetCollector
+        from .routers import connect_pin_signals
+        from .tasks import LaneCollector
+
+        connect_pin_signals(self.apps)
+        register_scrape_collector(LaneCollector())
+        register_scrape_collector(BudgetCollector())
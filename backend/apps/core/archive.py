@@ -0,0 +1,249 @@
+"""
+On-disk record/replay archive of raw upstream responses.
+
+Responses are stored content-addressed under UPSTREAM_ARCHIVE_DIR:
+
+    <upstream>/blobs/ab/abcdef…       response body, named by its SHA-256
+    <upstream>/requests/12/123456….json  {blob, fetched_at, expires_at}
+
+The request key is a hash of the URL and the normalized (sorted,
+stringified) query parameters, so the same request always maps to the same
+entry, and identical bodies are stored once.  Entries expire according to
+the upstream's Cache-Control max-age / Expires headers (no-store responses
+are not kept), falling back to UPSTREAM_ARCHIVE_DEFAULT_TTL.  Bodies are
+read through mmap and parsed straight from the mapping by orjson, without
+copying the file into a bytes object first; open_body() exposes the mapping
+itself for streaming parsers, and Recording lets a response be archived
+while it is still being streamed.
+
+UPSTREAM_ARCHIVE_MODE:
+    off     never read or write the archive
+    record  serve fresh entries, fetch and record misses
+    replay  serve only from the archive, regardless of age; a miss raises
+            ArchiveMiss instead of touching the network
+"""
+
+import hashlib
+import logging
+import mmap
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+
+import httpx
+import orjson
+from django.conf import settings
+
+from .metrics import cache_result
+
+logger = logging.getLogger(__name__)
+
+MODE = getattr(settings, "UPSTREAM_ARCHIVE_MODE", "off")
+ARCHIVE_DIR = Path(getattr(settings, "UPSTREAM_ARCHIVE_DIR", "upstream-archive"))
+DEFAULT_TTL = getattr(settings, "UPSTREAM_ARCHIVE_DEFAULT_TTL", 900)
+
+if MODE not in ("off", "record", "replay"):
+    raise ValueError(f"UPSTREAM_ARCHIVE_MODE must be off, record or replay, not {MODE!r}")
+
+
+class ArchiveMiss(httpx.HTTPError):
+    """Replay mode found no archived response for a request."""
+
+
+def request_key(url: str, params: dict) -> str:
+    """Stable hash of a GET request: URL plus sorted, stringified parameters."""
+    normalized = "&".join(f"{k}={params[k]}" for k in sorted(params))
+    return hashlib.sha256(f"{url}?{normalized}".encode()).hexdigest()
+
+
+def lookup(upstream: str, url: str, params: dict):
+    """
+    Parsed JSON body of the archived response, or None if the request must
+    go to the network.  In replay mode a missing entry raises ArchiveMiss.
+    """
+    with open_body(upstream, url, params) as body:
+        return orjson.loads(body) if body is not None else None
+
+
+@contextmanager
+def open_body(upstream: str, url: str, params: dict):
+    """
+    Yield a read-only memoryview of the archived body mapped from disk, or
+    None if the request must go to the network.  The view is only valid
+    inside the block.  In replay mode a missing entry raises ArchiveMiss.
+    """
+    if MODE == "off":
+        yield None
+        return
+
+    key = request_key(url, params)
+    entry = _read_entry(upstream, key)
+    if entry is None:
+        cache_result(f"archive.{upstream}", "miss")
+        if MODE == "replay":
+            raise ArchiveMiss(f"No archived {upstream} response for {url} {params}")
+        yield None
+        return
+    if MODE == "record" and entry["expires_at"] < time.time():
+        cache_result(f"archive.{upstream}", "stale")
+        yield None
+        return
+
+    path = _blob_path(upstream, entry["blob"])
+    try:
+        # The mapping stays valid after the file is closed
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as exc:
+        logger.warning("Archived %s response %s unreadable: %s", upstream, key, exc)
+        cache_result(f"archive.{upstream}", "miss")
+        if MODE == "replay":
+            raise ArchiveMiss(f"Archived {upstream} response {key} unreadable") from exc
+        yield None
+        return
+
+    cache_result(f"archive.{upstream}", "hit")
+    view = memoryview(mapped)
+    try:
+        yield view
+    finally:
+        view.release()
+        mapped.close()
+
+
+def record(upstream: str, url: str, params: dict, response: httpx.Response):
+    """Archive a successful response unless the upstream forbids storing it."""
+    recording = recorder(upstream, url, params, response.headers)
+    if recording is not None:
+        recording.write(response.content)
+        recording.commit()
+
+
+def recorder(upstream: str, url: str, params: dict, headers: httpx.Headers) -> "Recording | None":
+    """
+    A Recording to stream a response body into, or None if the archive
+    isn't recording or the upstream forbids storing this response.
+    """
+    if MODE != "record":
+        return None
+    ttl = freshness_lifetime(headers)
+    if ttl is None:
+        return None
+    try:
+        return Recording(upstream, request_key(url, params), ttl)
+    except OSError as exc:
+        logger.warning("Could not archive %s response: %s", upstream, exc)
+        return None
+
+
+class Recording:
+    """
+    A body being written to the archive chunk by chunk, hashed as it goes.
+    commit() files it under its content hash and points the request entry
+    at it; discard() (or an error) leaves the archive untouched.
+    """
+
+    def __init__(self, upstream: str, key: str, ttl: float):
+        self.upstream = upstream
+        self.key = key
+        self.ttl = ttl
+        self._hash = hashlib.sha256()
+        staging = ARCHIVE_DIR / upstream / "blobs"
+        staging.mkdir(parents=True, exist_ok=True)
+        fd, self._tmp = tempfile.mkstemp(dir=staging, prefix=".tmp-")
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes):
+        self._hash.update(chunk)
+        self._file.write(chunk)
+
+    def commit(self):
+        self._file.close()
+        blob = self._hash.hexdigest()
+        try:
+            blob_path = _blob_path(self.upstream, blob)
+            if blob_path.exists():
+                os.unlink(self._tmp)
+            else:
+                blob_path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(self._tmp, blob_path)
+            now = time.time()
+            entry = {"blob": blob, "fetched_at": now, "expires_at": now + self.ttl}
+            _atomic_write(_entry_path(self.upstream, self.key), orjson.dumps(entry))
+        except OSError as exc:
+            logger.warning("Could not archive %s response: %s", self.upstream, exc)
+            self.discard()
+
+    def discard(self):
+        self._file.close()
+        try:
+            os.unlink(self._tmp)
+        except FileNotFoundError:
+            pass
+
+
+def freshness_lifetime(headers: httpx.Headers) -> float | None:
+    """
+    Seconds the response may be reused, from Cache-Control / Expires;
+    None if it must not be stored.  Defaults to DEFAULT_TTL.
+    """
+    directives = {}
+    for part in headers.get("Cache-Control", "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"')
+
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives:
+        return 0.0
+    for name in ("s-maxage", "max-age"):
+        if name in directives:
+            try:
+                return max(0.0, float(directives[name]) - float(headers.get("Age", 0)))
+            except ValueError:
+                pass
+
+    if "Expires" in headers:
+        try:
+            expires = parsedate_to_datetime(headers["Expires"])
+            date = parsedate_to_datetime(headers["Date"]) if "Date" in headers else None
+            base = date.timestamp() if date else time.time()
+            return max(0.0, expires.timestamp() - base)
+        except (TypeError, ValueError):
+            return 0.0  # an invalid Expires means already expired
+    return float(DEFAULT_TTL)
+
+
+def _entry_path(upstream: str, key: str) -> Path:
+    return ARCHIVE_DIR / upstream / "requests" / key[:2] / f"{key}.json"
+
+
+def _read_entry(upstream: str, key: str) -> dict | None:
+    try:
+        return orjson.loads(_entry_path(upstream, key).read_bytes())
+    except FileNotFoundError:
+        return None
+    except (OSError, orjson.JSONDecodeError) as exc:
+        logger.warning("Archive entry %s/%s unreadable: %s", upstream, key, exc)
+        return None
+
+
+def _blob_path(upstream: str, blob: str) -> Path:
+    return ARCHIVE_DIR / upstream / "blobs" / blob[:2] / blob
+
+
+def _atomic_write(path: Path, data: bytes):
+    """Write via a temp file and rename, so readers never see a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
@@ -0,0 +1,83 @@
+"""
+Incremental splitting of a streamed JSON document into its top-level items.
+
+Feed chunks of a JSON array (or a single bare object) as they arrive and
+get back the raw bytes of each complete top-level object, ready for
+orjson.loads.  Only one item is buffered at a time, so memory is bounded by
+the largest item rather than the whole document.  Scanning jumps between
+structural characters with a compiled regex, so long runs of numbers are
+skipped at C speed.
+"""
+
+import re
+from collections.abc import Iterable, Iterator
+
+_STRUCTURAL = re.compile(rb'[\[\]{}"\\]')
+
+_OPEN_OBJECT, _CLOSE_OBJECT = ord("{"), ord("}")
+_OPEN_ARRAY, _CLOSE_ARRAY = ord("["), ord("]")
+_QUOTE, _BACKSLASH = ord('"'), ord("\\")
+
+
+class TopLevelSplitter:
+    """Collects the top-level objects of a JSON array fed in arbitrary chunks."""
+
+    def __init__(self):
+        self._depth = 0
+        self._base = None  # depth items open at: 1 inside an array, 0 for a bare object
+        self._in_string = False
+        self._escape_at = -1  # index in the current chunk of an escaped byte
+        self._item: bytearray | None = None
+
+    def feed(self, chunk: bytes | memoryview) -> list[bytes]:
+        """Consume one chunk; returns the items completed within it."""
+        done = []
+        item_start = 0 if self._item is not None else None
+        for match in _STRUCTURAL.finditer(chunk):
+            pos = match.start()
+            if pos == self._escape_at:
+                continue
+            char = chunk[pos]
+
+            if self._in_string:
+                if char == _QUOTE:
+                    self._in_string = False
+                elif char == _BACKSLASH:
+                    self._escape_at = pos + 1
+                continue
+
+            if char == _QUOTE:
+                self._in_string = True
+            elif char == _OPEN_OBJECT or char == _OPEN_ARRAY:
+                if self._base is None:
+                    self._base = 1 if char == _OPEN_ARRAY else 0
+                if self._depth == self._base and char == _OPEN_OBJECT:
+                    self._item = bytearray()
+                    item_start = pos
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == self._base and self._item is not None:
+                    self._item += chunk[item_start:pos + 1]
+                    done.append(bytes(self._item))
+                    self._item = None
+                    item_start = None
+
+        if self._item is not None:
+            self._item += chunk[item_start:]
+        # An escape on the chunk's last byte applies to the next chunk's first
+        self._escape_at = 0 if self._escape_at == len(chunk) else -1
+        return done
+
+    def close(self):
+        """Raise if the document ended inside an item."""
+        if self._item is not None or self._in_string or self._depth:
+            raise ValueError("JSON stream ended mid-document")
+
+
+def iter_items(chunks: Iterable[bytes | memoryview]) -> Iterator[bytes]:
+    """Yield the raw bytes of each top-level object in a chunked JSON document."""
+    splitter = TopLevelSplitter()
+    for chunk in chunks:
+        yield from splitter.feed(chunk)
+    splitter.close()
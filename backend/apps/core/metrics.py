@@ -0,0 +1,161 @@
+"""
+Prometheus metrics shared by every app.
+
+Per-stage latency, cache hit/miss counters, upstream call histograms,
+upstream rate-limit budget usage and background task lane timings.
+When PROMETHEUS_MULTIPROC_DIR is set (it must be, before the process starts,
+whenever more than one worker serves traffic) each process writes its
+samples to that directory and /metrics merges them, so a scrape sees the
+whole server rather than whichever worker happened to answer.  Clear the
+directory on deploy.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UPSTREAM_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 30.0)
+
+STAGE_SECONDS = Histogram(
+    "vespercast_stage_duration_seconds",
+    "Wall time spent in one stage of request handling.",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+
+CACHE_REQUESTS = Counter(
+    "vespercast_cache_requests_total",
+    "Cache lookups by cache and result (hit / miss / stale).",
+    ["cache", "result"],
+)
+
+UPSTREAM_SECONDS = Histogram(
+    "vespercast_upstream_duration_seconds",
+    "Latency of calls to external APIs.",
+    ["upstream"],
+    buckets=UPSTREAM_BUCKETS,
+)
+
+UPSTREAM_REQUESTS = Counter(
+    "vespercast_upstream_requests_total",
+    "Calls to external APIs by outcome (ok / error).",
+    ["upstream", "outcome"],
+)
+
+FORECAST_WRITES = Counter(
+    "vespercast_forecast_writes_total",
+    "Refreshed forecasts by result (created / updated / unchanged), plus score swings.",
+    ["result"],
+)
+
+TASK_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 900.0)
+
+TASK_WAIT_SECONDS = Histogram(
+    "vespercast_task_wait_seconds",
+    "Time background tasks spent queued before a worker picked them up.",
+    ["lane", "task"],
+    buckets=TASK_BUCKETS,
+)
+
+TASK_SECONDS = Histogram(
+    "vespercast_task_duration_seconds",
+    "Run time of background tasks.",
+    ["lane", "task"],
+    buckets=TASK_BUCKETS,
+)
+
+TASK_RUNS = Counter(
+    "vespercast_task_runs_total",
+    "Background task attempts by outcome (ok / retry / error).",
+    ["lane", "task", "outcome"],
+)
+
+BUDGET_WAIT_SECONDS = Histogram(
+    "vespercast_upstream_budget_wait_seconds",
+    "Time calls were queued waiting for an upstream rate-limit token.",
+    ["upstream"],
+    buckets=(0.0, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0),
+)
+
+BUDGET_REQUESTS = Counter(
+    "vespercast_upstream_budget_requests_total",
+    "Rate-limit token requests by result (granted / queued / deferred / throttled).",
+    ["upstream", "result"],
+)
+
+# Collectors that compute their values when scraped, e.g. queue depth
+_scrape_collectors = []
+
+# Per-request tally of upstream calls, read by the profiler; None when nobody is counting
+_upstream_tally: ContextVar[list[int] | None] = ContextVar("upstream_tally", default=None)
+
+
+@contextmanager
+def stage(name: str):
+    """Time the enclosed block into the stage-duration histogram."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage=name).observe(time.perf_counter() - started)
+
+
+@contextmanager
+def upstream_call(upstream: str):
+    """Time one external API call and count it as ok or error."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        UPSTREAM_SECONDS.labels(upstream=upstream).observe(time.perf_counter() - started)
+        UPSTREAM_REQUESTS.labels(upstream=upstream, outcome=outcome).inc()
+        tally = _upstream_tally.get()
+        if tally is not None:
+            tally[0] += 1
+
+
+@contextmanager
+def count_upstream_calls():
+    """Count upstream calls made inside the block; yields a one-item list."""
+    tally = [0]
+    token = _upstream_tally.set(tally)
+    try:
+        yield tally
+    finally:
+        _upstream_tally.reset(token)
+
+
+def cache_result(cache: str, result: str):
+    CACHE_REQUESTS.labels(cache=cache, result=result).inc()
+
+
+def register_scrape_collector(collector):
+    """Add a collector whose values are read at scrape time rather than recorded."""
+    _scrape_collectors.append(collector)
+    REGISTRY.register(collector)
+
+
+def render_latest() -> tuple[bytes, str]:
+    """Return (exposition body, content type), merging worker files if multiprocess."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        for collector in _scrape_collectors:
+            registry.register(collector)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,16 @@
+from django.db import models
+
+
+class UpstreamBudget(models.Model):
+    """
+    Shared token bucket for one external API, drawn from by every web and
+    Django-Q process.  See apps.core.ratelimit.
+    """
+
+    upstream = models.CharField(max_length=50, unique=True)
+    tokens = models.FloatField()  # negative while callers are queued for future tokens
+    updated_at = models.FloatField()  # Unix time of the last refill
+    version = models.PositiveBigIntegerField(default=0)  # optimistic concurrency check
+
+    def __str__(self):
+        return f"{self.upstream}: {self.tokens:.1f} tokens"
@@ -0,0 +1,17 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+Each page continues from the last row of the previous one (`WHERE key <
+last`) instead of skipping rows with OFFSET, so page 1000 costs the same as
+page 1 — provided the view's `ordering` matches a composite index that
+leads with the column the list is filtered on.  Cursors are opaque; clients
+follow the `next` / `previous` links.
+"""
+
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = "limit"
+    max_page_size = 200
@@ -0,0 +1,191 @@
+"""
+On-demand sampling profiler for API requests.
+
+A background thread snapshots the request thread's stack every
+PROFILING_INTERVAL seconds.  Each profiled request writes three files to
+PROFILING_DIR, named by a per-request id:
+
+    <id>.folded   collapsed stacks — feed to flamegraph.pl or speedscope
+    <id>.txt      indented call tree with inclusive sample percentages
+    <id>.json     view, status, wall time, query count, upstream call count
+
+Requests are picked either at random (PROFILING_SAMPLE_RATE) or explicitly
+with an `X-Profile: <PROFILING_TOKEN>` header.  With both unset the
+middleware removes itself at startup, so the off state costs nothing.
+"""
+
+import hmac
+import json
+import logging
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .metrics import count_upstream_calls
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "HTTP_X_PROFILE"
+TREE_MIN_SHARE = 0.005  # drop call-tree branches under 0.5% of samples
+
+
+class SamplingProfiler:
+    """Periodically samples one thread's Python stack into folded-stack counts."""
+
+    def __init__(self, thread_id: int, interval: float = 0.002):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[tuple[str, ...]] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="vespercast-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[tuple(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        """Brendan Gregg collapsed-stack format: `root;child;leaf count` per line."""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def call_tree(self) -> str:
+        total = self.samples
+        if not total:
+            return "(no samples)\n"
+        tree: dict = {}
+        for stack, count in self.stacks.items():
+            node = tree
+            for label in stack:
+                entry = node.setdefault(label, [0, {}])
+                entry[0] += count
+                node = entry[1]
+
+        lines = [f"{total} samples\n"]
+
+        def walk(node: dict, depth: int):
+            for label, (count, children) in sorted(node.items(), key=lambda kv: -kv[1][0]):
+                if count / total < TREE_MIN_SHARE:
+                    continue
+                lines.append(f"{count / total:6.1%}  {'  ' * depth}{label}\n")
+                walk(children, depth + 1)
+
+        walk(tree, 0)
+        return "".join(lines)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    for marker in ("site-packages/", "backend/"):
+        idx = filename.rfind(marker)
+        if idx != -1:
+            filename = filename[idx + len(marker):]
+            break
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class _QueryCounter:
+    """Connection execute_wrapper that counts SQL statements."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class ProfilingMiddleware:
+    """Profile a sampled share of requests, or any request carrying the profile token."""
+
+    def __init__(self, get_response):
+        self.sample_rate = getattr(settings, "PROFILING_SAMPLE_RATE", 0.0)
+        self.token = getattr(settings, "PROFILING_TOKEN", "")
+        if not self.sample_rate and not self.token:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.interval = getattr(settings, "PROFILING_INTERVAL", 0.002)
+        self.output_dir = Path(getattr(settings, "PROFILING_DIR", "profiles"))
+        self.path_prefix = getattr(settings, "PROFILING_PATH_PREFIX", "/api/")
+
+    def __call__(self, request):
+        if not self._should_profile(request):
+            return self.get_response(request)
+
+        profile_id = uuid.uuid4().hex[:12]
+        profiler = SamplingProfiler(threading.get_ident(), self.interval)
+        query_counter = _QueryCounter()
+
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(query_counter))
+            upstream = stack.enter_context(count_upstream_calls())
+            started = time.perf_counter()
+            profiler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.stop()
+                wall = time.perf_counter() - started
+
+        self._write(profile_id, request, response, profiler, wall, query_counter.count, upstream[0])
+        response["X-Profile-Id"] = profile_id
+        return response
+
+    def _should_profile(self, request) -> bool:
+        if not request.path.startswith(self.path_prefix):
+            return False
+        header = request.META.get(PROFILE_HEADER)
+        if header and self.token and hmac.compare_digest(header, self.token):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _write(self, profile_id, request, response, profiler, wall, queries, upstream_calls):
+        match = request.resolver_match
+        view = getattr(match.func, "cls", match.func).__name__ if match else ""
+        meta = {
+            "id": profile_id,
+            "method": request.method,
+            "path": request.get_full_path(),
+            "view": view,
+            "status": response.status_code,
+            "wall_ms": round(wall * 1000, 2),
+            "queries": queries,
+            "upstream_calls": upstream_calls,
+            "samples": profiler.samples,
+            "interval_ms": self.interval * 1000,
+        }
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            base = self.output_dir / f"{time.strftime('%Y%m%dT%H%M%S')}-{view or 'request'}-{profile_id}"
+            base.with_suffix(".folded").write_text(profiler.folded())
+            base.with_suffix(".txt").write_text(profiler.call_tree())
+            base.with_suffix(".json").write_text(json.dumps(meta, indent=2))
+        except OSError as exc:
+            logger.warning("Could not write profile %s: %s", profile_id, exc)
@@ -0,0 +1,212 @@
+"""
+Cross-process rate-limit budgets for external APIs.
+
+Each upstream in UPSTREAM_RATE_LIMITS gets a token bucket stored in the
+UpstreamBudget table, so every web worker and Django-Q worker draws from
+the same budget.  `acquire(upstream)` reserves the next token: if one is
+available the call proceeds at once, otherwise the caller is queued — the
+bucket goes negative by the reservation and the caller sleeps until its
+token would have refilled.  Reservations are first come, first served and
+cost one SELECT and one conditional UPDATE.
+
+A caller that would have to wait longer than its patience is deferred
+instead: no token is taken and UpstreamBudgetExceeded is raised.  Web
+requests wait up to UPSTREAM_BUDGET_MAX_WAIT; background tasks run inside
+`patience(UPSTREAM_BUDGET_TASK_MAX_WAIT)` and are retried by their lane if
+they still can't get through.  A 429 from the upstream drains the bucket
+for the Retry-After period so all processes back off together.
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+import httpx
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError
+from django.db.models import F
+from prometheus_client.core import GaugeMetricFamily
+
+from .metrics import BUDGET_REQUESTS, BUDGET_WAIT_SECONDS
+from .models import UpstreamBudget
+
+logger = logging.getLogger(__name__)
+
+MAX_WAIT = getattr(settings, "UPSTREAM_BUDGET_MAX_WAIT", 2.0)
+CAS_ATTEMPTS = 10
+
+
+@dataclass(frozen=True)
+class Budget:
+    rate: float  # tokens refilled per second
+    burst: int  # bucket capacity
+
+
+BUDGETS = {name: Budget(**options) for name, options in getattr(settings, "UPSTREAM_RATE_LIMITS", {}).items()}
+
+_patience: ContextVar[float] = ContextVar("upstream_budget_patience", default=MAX_WAIT)
+
+
+class UpstreamBudgetExceeded(httpx.HTTPError):
+    """
+    The upstream's budget can't serve this call within the caller's
+    patience.  An httpx.HTTPError so existing upstream-failure handling
+    (degraded responses, task retries) applies unchanged.
+    """
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(f"{upstream} rate-limit budget exhausted; retry in {retry_after:.1f}s")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+@contextmanager
+def patience(seconds: float):
+    """Let acquire() queue for up to `seconds` inside the block."""
+    token = _patience.set(seconds)
+    try:
+        yield
+    finally:
+        _patience.reset(token)
+
+
+def acquire(upstream: str) -> float:
+    """
+    Take one token for `upstream`, sleeping if the call has to queue.
+    Returns the seconds waited; raises UpstreamBudgetExceeded if the wait
+    would exceed the current patience.  Upstreams without a configured
+    budget pass straight through.
+    """
+    budget = BUDGETS.get(upstream)
+    if budget is None:
+        return 0.0
+
+    max_wait = _patience.get()
+    try:
+        wait = _reserve(upstream, budget, max_wait)
+    except DatabaseError as exc:
+        # Rate limiting must not take the site down with it
+        logger.warning("Upstream budget for %s unavailable, not limiting: %s", upstream, exc)
+        return 0.0
+
+    if wait is None:
+        BUDGET_REQUESTS.labels(upstream=upstream, result="deferred").inc()
+        raise UpstreamBudgetExceeded(upstream, _time_to_token(upstream, budget))
+
+    BUDGET_REQUESTS.labels(upstream=upstream, result="queued" if wait > 0 else "granted").inc()
+    BUDGET_WAIT_SECONDS.labels(upstream=upstream).observe(wait)
+    if wait > 0:
+        time.sleep(wait)
+    return wait
+
+
+def throttled(upstream: str, retry_after: float | None = None):
+    """Record a 429 and empty the bucket so no process calls again for `retry_after` seconds."""
+    budget = BUDGETS.get(upstream)
+    BUDGET_REQUESTS.labels(upstream=upstream, result="throttled").inc()
+    if budget is None:
+        return
+    retry_after = retry_after if retry_after is not None else 1.0 / budget.rate
+    logger.warning("%s returned 429; pausing all callers for %.1fs", upstream, retry_after)
+    try:
+        UpstreamBudget.objects.filter(upstream=upstream).update(
+            tokens=1.0 - budget.rate * retry_after,
+            updated_at=time.time(),
+            version=F("version") + 1,
+        )
+    except DatabaseError as exc:
+        logger.warning("Could not record 429 for %s: %s", upstream, exc)
+
+
+def retry_after_seconds(response: httpx.Response) -> float | None:
+    """Parse a numeric Retry-After header, if any."""
+    try:
+        return max(0.0, float(response.headers["Retry-After"]))
+    except (KeyError, ValueError):
+        return None
+
+
+def _refilled(budget: Budget, tokens: float, updated_at: float, now: float) -> float:
+    return min(float(budget.burst), tokens + (now - updated_at) * budget.rate)
+
+
+def _reserve(upstream: str, budget: Budget, max_wait: float) -> float | None:
+    """Reserve a token; returns the wait before it is usable, or None if that exceeds max_wait."""
+    for _ in range(CAS_ATTEMPTS):
+        row = UpstreamBudget.objects.filter(upstream=upstream).values("tokens", "updated_at", "version").first()
+        now = time.time()
+        if row is None:
+            try:
+                UpstreamBudget.objects.create(upstream=upstream, tokens=budget.burst - 1, updated_at=now)
+                return 0.0
+            except IntegrityError:
+                continue  # another process created it first
+
+        tokens = _refilled(budget, row["tokens"], row["updated_at"], now)
+        wait = max(0.0, (1.0 - tokens) / budget.rate)
+        if wait > max_wait:
+            return None
+        claimed = UpstreamBudget.objects.filter(upstream=upstream, version=row["version"]).update(
+            tokens=tokens - 1.0,
+            updated_at=now,
+            version=row["version"] + 1,
+        )
+        if claimed:
+            return wait
+
+    logger.warning("Upstream budget for %s under heavy contention, not limiting this call", upstream)
+    return 0.0
+
+
+def _time_to_token(upstream: str, budget: Budget) -> float:
+    row = UpstreamBudget.objects.filter(upstream=upstream).values("tokens", "updated_at").first()
+    if row is None:
+        return 0.0
+    tokens = _refilled(budget, row["tokens"], row["updated_at"], time.time())
+    return max(0.0, (1.0 - tokens) / budget.rate)
+
+
+class BudgetCollector:
+    """Scrape-time view of each upstream's bucket: tokens available, capacity and refill rate."""
+
+    def describe(self):
+        return list(self._families())
+
+    def collect(self):
+        available, capacity, rate = self._families()
+        rows = {
+            row["upstream"]: row
+            for row in UpstreamBudget.objects.filter(upstream__in=BUDGETS).values("upstream", "tokens", "updated_at")
+        }
+        now = time.time()
+        for upstream, budget in BUDGETS.items():
+            row = rows.get(upstream)
+            tokens = _refilled(budget, row["tokens"], row["updated_at"], now) if row else float(budget.burst)
+            available.add_metric([upstream], tokens)
+            capacity.add_metric([upstream], budget.burst)
+            rate.add_metric([upstream], budget.rate)
+        yield available
+        yield capacity
+        yield rate
+
+    @staticmethod
+    def _families():
+        return (
+            GaugeMetricFamily(
+                "vespercast_upstream_budget_tokens",
+                "Tokens currently available per upstream; negative while calls are queued.",
+                labels=["upstream"],
+            ),
+            GaugeMetricFamily(
+                "vespercast_upstream_budget_capacity",
+                "Bucket size (burst) per upstream.",
+                labels=["upstream"],
+            ),
+            GaugeMetricFamily(
+                "vespercast_upstream_budget_rate",
+                "Tokens refilled per second per upstream.",
+                labels=["upstream"],
+            ),
+        )
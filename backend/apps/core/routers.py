@@ -0,0 +1,172 @@
+"""
+Read-replica routing for the forecast tables.
+
+Reads of models in READ_REPLICA_APPS (forecasts, locations, ratings) go to a
+healthy alias from DATABASE_REPLICAS; everything else, and every write,
+goes to `default`.  With no replicas configured the router is a no-op.
+
+Read-your-writes: after a write to a routed model the current context is
+pinned to the primary for REPLICA_PIN_SECONDS, so a request that builds a
+forecast reads it back from `default` rather than a lagging replica.
+ReplicaPinMiddleware carries the pin across requests in a short-lived
+cookie, so a client's next request also sees its own writes.
+
+Replicas are probed at most every REPLICA_HEALTH_CHECK_SECONDS; one that
+can't be reached is skipped (falling back to the primary) until the next
+probe succeeds.
+"""
+
+import logging
+import math
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, connections
+from django.db.models.signals import post_delete, post_save
+from django.utils.cache import patch_cache_control
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = "default"
+PIN_COOKIE = "vc_pin_primary"
+
+REPLICAS = list(getattr(settings, "DATABASE_REPLICAS", []))
+REPLICA_APPS = frozenset(getattr(settings, "READ_REPLICA_APPS", ["forecasts", "locations", "ratings"]))
+PIN_SECONDS = getattr(settings, "REPLICA_PIN_SECONDS", 5.0)
+HEALTH_CHECK_SECONDS = getattr(settings, "REPLICA_HEALTH_CHECK_SECONDS", 30.0)
+
+# time.time() until which reads stay on the primary; 0 when unpinned
+_pinned_until: ContextVar[float] = ContextVar("replica_pinned_until", default=0.0)
+
+
+def pin_primary(seconds: float = PIN_SECONDS):
+    """Send routed reads in this context to the primary for the next `seconds`."""
+    _pinned_until.set(max(_pinned_until.get(), time.time() + seconds))
+
+
+def is_pinned() -> bool:
+    return _pinned_until.get() > time.time()
+
+
+class _ReplicaHealth:
+    """Process-wide cache of replica reachability, refreshed lazily."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked: dict[str, tuple[float, bool]] = {}
+
+    def healthy(self, alias: str) -> bool:
+        now = time.monotonic()
+        checked_at, ok = self._checked.get(alias, (float("-inf"), True))
+        if now - checked_at < HEALTH_CHECK_SECONDS:
+            return ok
+        with self._lock:
+            # Another thread may have refreshed it while we waited
+            checked_at, ok = self._checked.get(alias, (float("-inf"), True))
+            if now - checked_at < HEALTH_CHECK_SECONDS:
+                return ok
+            ok = self._probe(alias)
+            self._checked[alias] = (now, ok)
+        return ok
+
+    @staticmethod
+    def _probe(alias: str) -> bool:
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute("SELECT 1")
+        except DatabaseError as exc:
+            logger.warning("Replica %s failed health check, reading from primary: %s", alias, exc)
+            return False
+        return True
+
+
+replica_health = _ReplicaHealth()
+
+
+class ReplicaRouter:
+    """DATABASE_ROUTERS entry: replica reads for REPLICA_APPS, primary for the rest."""
+
+    def db_for_read(self, model, **hints):
+        if not REPLICAS or model._meta.app_label not in REPLICA_APPS or is_pinned():
+            return PRIMARY
+        healthy = [alias for alias in REPLICAS if replica_health.healthy(alias)]
+        return random.choice(healthy) if healthy else PRIMARY
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        pool = {PRIMARY, *REPLICAS}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in REPLICAS:
+            return False
+        return None
+
+
+def _pin_after_write(sender, **kwargs):
+    pin_primary()
+
+
+def connect_pin_signals(apps):
+    """
+    Pin after save()/delete() of routed models.  Connected per model so
+    fast deletes elsewhere stay fast; bulk_create and update() don't send
+    signals, so callers of those pin explicitly.
+    """
+    if not REPLICAS:
+        return
+    for model in apps.get_models():
+        if model._meta.app_label in REPLICA_APPS:
+            post_save.connect(_pin_after_write, sender=model, dispatch_uid=f"replica_pin_save_{model._meta.label}")
+            post_delete.connect(_pin_after_write, sender=model, dispatch_uid=f"replica_pin_delete_{model._meta.label}")
+
+
+class ReplicaPinMiddleware:
+    """
+    Scope the primary pin to the request, and carry it to the same client's
+    following requests via a cookie that expires with the pin.
+    """
+
+    def __init__(self, get_response):
+        if not REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            carried = float(request.COOKIES.get(PIN_COOKIE, 0))
+        except ValueError:
+            carried = 0.0
+        # The cookie is client-controlled: a pin further out than we could have
+        # set is forged (clamping it would still renew it on every request)
+        now = time.time()
+        if not now < carried <= now + PIN_SECONDS:
+            carried = 0.0
+        token = _pinned_until.set(carried)
+        try:
+            response = self.get_response(request)
+            pinned_until = _pinned_until.get()
+        finally:
+            _pinned_until.reset(token)
+
+        remaining = pinned_until - time.time()
+        if remaining > 0 and pinned_until != carried:
+            response.set_cookie(
+                PIN_COOKIE,
+                f"{pinned_until:.3f}",
+                max_age=math.ceil(remaining),
+                httponly=True,
+                samesite="Lax",
+            )
+            # A shared cache must not replay this client's pin to others
+            patch_cache_control(response, private=True)
+        return response
@@ -0,0 +1,183 @@
+"""
+Priority lanes for background work.
+
+Each lane is its own Django-Q2 cluster, with a separate ORM queue and worker
+pool: the default `interactive` lane is configured by Q_CLUSTER itself, the
+others under Q_CLUSTER["ALT_CLUSTERS"].  Start one qcluster per lane:
+
+    python manage.py qcluster                              # interactive
+    Q_CLUSTER_NAME=batch python manage.py qcluster
+    Q_CLUSTER_NAME=notifications python manage.py qcluster
+
+so bulk precompute and notification sends never occupy the workers that
+serve user-triggered refreshes.
+
+Queue work with `enqueue("apps.<app>.tasks.<func>", ...)`.  The function's
+BACKGROUND_TASKS entry picks its lane, timeout and retry policy; a failed
+attempt is re-queued on the same lane after an exponential backoff.  Retries
+go through a one-off Schedule, so task arguments must be Python literals
+(numbers, strings, lists, dicts).  A task killed for exceeding its timeout
+is recorded as failed by Django-Q and not retried.
+
+Wait time (enqueue to start), run time and outcome are recorded by the
+worker; queue depth and the age of the oldest queued task are read from the
+broker when /metrics is scraped.
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Count, Min
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from django_q.models import OrmQ, Schedule
+from django_q.tasks import async_task, schedule
+from prometheus_client.core import GaugeMetricFamily
+
+from .metrics import TASK_RUNS, TASK_SECONDS, TASK_WAIT_SECONDS
+from .ratelimit import patience
+
+logger = logging.getLogger(__name__)
+
+_Q_CLUSTER = getattr(settings, "Q_CLUSTER", {})
+DEFAULT_LANE = _Q_CLUSTER.get("cluster_name", _Q_CLUSTER.get("name", "default"))
+LANES = [DEFAULT_LANE, *_Q_CLUSTER.get("ALT_CLUSTERS", {})]
+# Background work can queue longer for an upstream rate-limit token than a request
+TASK_BUDGET_WAIT = getattr(settings, "UPSTREAM_BUDGET_TASK_MAX_WAIT", 30.0)
+
+
+@dataclass(frozen=True)
+class TaskPolicy:
+    lane: str = DEFAULT_LANE
+    timeout: int | None = None  # seconds; None uses the lane's timeout
+    max_attempts: int = 1
+    retry_delay: float = 30.0  # seconds before the second attempt, doubled after each failure
+
+
+POLICIES = {name: TaskPolicy(**options) for name, options in getattr(settings, "BACKGROUND_TASKS", {}).items()}
+
+for _name, _policy in POLICIES.items():
+    if _policy.lane not in LANES:
+        raise ValueError(f"BACKGROUND_TASKS[{_name!r}] uses unknown lane {_policy.lane!r}; lanes are {LANES}")
+
+
+def policy_for(func_path: str) -> TaskPolicy:
+    return POLICIES.get(func_path, TaskPolicy())
+
+
+def enqueue(func_path: str, *args, **kwargs) -> str:
+    """Queue `func_path(*args, **kwargs)` on its lane; returns the Django-Q task id."""
+    return _enqueue(func_path, 1, args, kwargs)
+
+
+def _enqueue(func_path: str, attempt: int, args, kwargs) -> str:
+    policy = policy_for(func_path)
+    options = {"cluster": policy.lane, "task_name": f"{func_path.rsplit('.', 1)[-1]}#{attempt}"}
+    if policy.timeout is not None:
+        options["timeout"] = policy.timeout
+    return async_task("apps.core.tasks.run_task", func_path, attempt, time.time(), list(args), kwargs, q_options=options)
+
+
+def run_task(func_path: str, attempt: int, enqueued_at: float | None, args: list, kwargs: dict):
+    """
+    Worker-side wrapper: time the task, and schedule a retry if it fails.
+    enqueued_at is None for repeating schedules, whose wait isn't known.
+    """
+    policy = policy_for(func_path)
+    labels = {"lane": policy.lane, "task": func_path}
+    if enqueued_at is not None:
+        TASK_WAIT_SECONDS.labels(**labels).observe(max(0.0, time.time() - enqueued_at))
+
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        with patience(TASK_BUDGET_WAIT):
+            result = import_string(func_path)(*args, **kwargs)
+        outcome = "ok"
+        return result
+    except Exception:
+        if attempt < policy.max_attempts:
+            outcome = "retry"
+            _schedule_retry(func_path, attempt + 1, args, kwargs, policy)
+        raise
+    finally:
+        TASK_SECONDS.labels(**labels).observe(time.perf_counter() - started)
+        TASK_RUNS.labels(**labels, outcome=outcome).inc()
+
+
+def _schedule_retry(func_path: str, attempt: int, args: list, kwargs: dict, policy: TaskPolicy):
+    delay = policy.retry_delay * 2 ** (attempt - 2)
+    next_run = timezone.now() + timedelta(seconds=delay)
+    logger.warning("%s failed, retrying in %.0fs (attempt %d of %d)", func_path, delay, attempt, policy.max_attempts)
+    q_options = {"task_name": f"{func_path.rsplit('.', 1)[-1]}#{attempt}"}
+    if policy.timeout is not None:
+        q_options["timeout"] = policy.timeout
+    schedule(
+        "apps.core.tasks.run_task",
+        func_path,
+        attempt,
+        next_run.timestamp(),
+        args,
+        kwargs,
+        schedule_type=Schedule.ONCE,
+        next_run=next_run,
+        cluster=policy.lane,
+        q_options=q_options,
+    )
+
+
+def install_daily(name: str, func_path: str, first_run: datetime):
+    """
+    Create or reset the named daily Schedule running `func_path()` through
+    run_task, on its lane with its timeout and retry policy.
+    """
+    policy = policy_for(func_path)
+    Schedule.objects.update_or_create(
+        name=name,
+        defaults={
+            "func": "apps.core.tasks.run_task",
+            "args": repr((func_path, 1, None, [], {})),
+            "kwargs": repr({"q_options": {"timeout": policy.timeout}} if policy.timeout else {}),
+            "schedule_type": Schedule.DAILY,
+            "repeats": -1,
+            "next_run": first_run,
+            "cluster": policy.lane,
+        },
+    )
+
+
+class LaneCollector:
+    """Scrape-time queue depth and oldest-task age per lane, read from the ORM broker."""
+
+    def describe(self):
+        # Lets the registry learn the metric names without querying the broker
+        return list(self._families())
+
+    def collect(self):
+        depth, oldest = self._families()
+        now = timezone.now()
+        for lane in LANES:
+            stats = OrmQ.objects.filter(key=lane, lock__lte=now).aggregate(queued=Count("id"), oldest=Min("lock"))
+            depth.add_metric([lane, "queued"], stats["queued"])
+            depth.add_metric([lane, "locked"], OrmQ.objects.filter(key=lane, lock__gt=now).count())
+            age = (now - stats["oldest"]).total_seconds() if stats["oldest"] else 0.0
+            oldest.add_metric([lane], age)
+        yield depth
+        yield oldest
+
+    @staticmethod
+    def _families():
+        depth = GaugeMetricFamily(
+            "vespercast_task_queue_depth",
+            "Tasks waiting in each background lane (queued) or being worked on (locked).",
+            labels=["lane", "state"],
+        )
+        oldest = GaugeMetricFamily(
+            "vespercast_task_queue_oldest_seconds",
+            "Age of the oldest task still waiting in each lane.",
+            labels=["lane"],
+        )
+        return depth, oldest
@@ -0,0 +1,115 @@
+from unittest import mock
+
+from django.db.models import F
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase
+
+from . import ratelimit, routers
+from .models import UpstreamBudget
+
+
+@mock.patch("apps.core.routers.REPLICAS", ["replica"])
+class ReplicaPinMiddlewareTests(SimpleTestCase):
+    def respond(self, view, **cookies):
+        request = RequestFactory().get("/api/v1/forecast/")
+        request.COOKIES.update(cookies)
+        return routers.ReplicaPinMiddleware(view)(request)
+
+    def test_pinning_response_is_private(self):
+        def view(request):
+            routers.pin_primary()
+            response = HttpResponse()
+            response["Cache-Control"] = "public, max-age=600"
+            return response
+
+        response = self.respond(view)
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+        self.assertEqual(response["Cache-Control"], "max-age=600, private")
+
+    def test_response_without_new_pin_keeps_caching(self):
+        def view(request):
+            response = HttpResponse()
+            response["Cache-Control"] = "public, max-age=600"
+            return response
+
+        response = self.respond(view)
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+        self.assertEqual(response["Cache-Control"], "public, max-age=600")
+
+
+@mock.patch("apps.core.ratelimit.BUDGETS", {"upstream": ratelimit.Budget(rate=10.0, burst=2)})
+class RateLimitTests(TestCase):
+    def setUp(self):
+        clock = mock.patch("apps.core.ratelimit.time")
+        self.time = clock.start()
+        self.addCleanup(clock.stop)
+        self.time.time.return_value = 1_000_000.0
+
+    def tokens(self) -> float:
+        return UpstreamBudget.objects.get(upstream="upstream").tokens
+
+    def test_burst_then_queues_into_negative_balance(self):
+        waits = [ratelimit.acquire("upstream") for _ in range(5)]
+
+        # First come, first served: each queued caller waits one refill longer
+        self.assertEqual(waits, [0.0, 0.0, 0.1, 0.2, 0.3])
+        self.assertEqual([c.args[0] for c in self.time.sleep.call_args_list], [0.1, 0.2, 0.3])
+        self.assertEqual(self.tokens(), -3.0)
+
+    def test_balance_refills_with_time(self):
+        for _ in range(4):
+            ratelimit.acquire("upstream")
+        self.time.time.return_value += 0.3
+        self.assertEqual(ratelimit.acquire("upstream"), 0.0)
+        self.assertAlmostEqual(self.tokens(), 0.0)
+
+    def test_wait_within_patience_is_queued(self):
+        for _ in range(2):
+            ratelimit.acquire("upstream")
+        with ratelimit.patience(0.1):
+            self.assertEqual(ratelimit.acquire("upstream"), 0.1)
+        self.time.sleep.assert_called_once_with(0.1)
+
+    def test_wait_beyond_patience_is_deferred_without_a_token(self):
+        for _ in range(3):
+            ratelimit.acquire("upstream")
+        with ratelimit.patience(0.15), self.assertRaises(ratelimit.UpstreamBudgetExceeded) as raised:
+            ratelimit.acquire("upstream")
+        self.assertAlmostEqual(raised.exception.retry_after, 0.2)
+        self.assertEqual(self.tokens(), -1.0)
+
+    def test_lost_race_retries_against_the_new_balance(self):
+        ratelimit.acquire("upstream")
+        refilled = ratelimit._refilled
+        competitors = []
+
+        def racing(*args):
+            # Another process reserves between this caller's read and its update
+            if not competitors:
+                competitors.append(None)
+                competitors[0] = ratelimit.acquire("upstream")
+            return refilled(*args)
+
+        with mock.patch("apps.core.ratelimit._refilled", side_effect=racing) as attempts:
+            wait = ratelimit.acquire("upstream")
+
+        # The competitor took the last token; this caller re-read and queued behind it
+        self.assertEqual((competitors, wait), ([0.0], 0.1))
+        self.assertEqual(attempts.call_count, 3)
+        budget = UpstreamBudget.objects.get(upstream="upstream")
+        self.assertEqual((budget.tokens, budget.version), (-1.0, 2))
+
+    def test_endless_contention_lets_the_call_through(self):
+        ratelimit.acquire("upstream")
+        refilled = ratelimit._refilled
+
+        def always_beaten(*args):
+            UpstreamBudget.objects.filter(upstream="upstream").update(version=F("version") + 1)
+            return refilled(*args)
+
+        with mock.patch("apps.core.ratelimit._refilled", side_effect=always_beaten) as attempts, self.assertLogs(
+            "apps.core.ratelimit", "WARNING"
+        ):
+            self.assertEqual(ratelimit.acquire("upstream"), 0.0)
+        self.assertEqual(attempts.call_count, ratelimit.CAS_ATTEMPTS)
+        self.assertEqual(self.tokens(), 1.0)
@@ -0,0 +1,29 @@
+"""
+Fanning work out to threads from inside a request or task.
+
+Django opens a database connection per thread on first use and only closes
+request threads' connections (on request_finished), so a pool thread that
+touches the ORM — the upstream rate limiter does on every call — would keep
+its connection open for good.  submit() closes them when the work is done.
+"""
+
+import contextvars
+from concurrent.futures import Executor, Future
+
+from django.db import connections
+
+
+def submit(pool: Executor, fn, *args, **kwargs) -> Future:
+    """
+    pool.submit(fn, ...) run in a copy of the caller's context, so per-request
+    upstream counting sees the call, closing the worker thread's database
+    connections afterwards.
+    """
+    return pool.submit(contextvars.copy_context().run, _closing_connections, fn, *args, **kwargs)
+
+
+def _closing_connections(fn, *args, **kwargs):
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        connections.close_all()
@@ -0,0 +1,12 @@
+from django.http import HttpResponse
+from django.views import View
+
+from .metrics import render_latest
+
+
+class MetricsView(View):
+    """GET /metrics — Prometheus exposition, aggregated across worker processes."""
+
+    def get(self, request):
+        body, content_type = render_latest()
+        return HttpResponse(body, content_type=content_type)
@@ -0,0 +1,151 @@
+"""
+Replay the current scorer over past weather and measure it against user
+ratings.
+
+Units of up to 50 locations (by id bucket) × one calendar year are fetched from the
+Open-Meteo archive across --concurrency worker processes, each sampled at
+sunset and checkpointed under --checkpoint-dir; a re-run skips finished
+units, so an interrupted backfill resumes.  Every checkpointed unit is
+then scored in vectorized batches and compared with SunsetRating, next to
+the forecasts users were actually shown.  --no-fetch re-scores what is
+already checkpointed, e.g. after a scorer change.
+
+    python manage.py backtest --start 2023-01-01 --end 2024-12-31 --concurrency 4
+"""
+
+import time
+from concurrent.futures import as_completed
+from dataclasses import asdict
+from datetime import date
+from pathlib import Path
+
+import orjson
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.ratelimit import patience
+from apps.core.tasks import TASK_BUDGET_WAIT
+from apps.locations.models import Location
+from apps.ratings.models import SunsetRating
+from ...services import backtest
+from ..workers import process_pool
+
+
+def _backfill(unit: backtest.Unit, directory: str) -> int:
+    with patience(TASK_BUDGET_WAIT):
+        return backtest.backfill_unit(unit, Path(directory))
+
+
+class Command(BaseCommand):
+    help = "Backfill historical weather, replay the scorer over it and report accuracy against ratings."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", type=date.fromisoformat, help="first date (default: earliest rated forecast)")
+        parser.add_argument("--end", type=date.fromisoformat, help="last date (default: latest rated forecast)")
+        parser.add_argument(
+            "--locations",
+            default="rated",
+            help="'rated' (locations with rated forecasts), 'all', or comma-separated ids",
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=backtest.BACKTEST.get("concurrency", 4), help="worker processes"
+        )
+        parser.add_argument("--checkpoint-dir", type=Path, default=backtest.CHECKPOINT_DIR)
+        parser.add_argument("--no-fetch", action="store_true", help="only score what is already checkpointed")
+        parser.add_argument("--json", action="store_true", help="print the report as JSON")
+
+    def handle(self, *args, **options):
+        if options["concurrency"] < 1:
+            raise CommandError("--concurrency must be at least 1")
+        location_ids = self._location_ids(options["locations"])
+        if not location_ids:
+            raise CommandError("No locations to backtest")
+
+        start, end = options["start"], options["end"]
+        if start is None or end is None:
+            span = backtest.rated_span()
+            if span is None:
+                raise CommandError("No rated forecasts; pass --start and --end")
+            start, end = start or span[0], end or span[1]
+        if end > backtest.latest_archived():
+            end = backtest.latest_archived()
+            self.stderr.write(f"  --end clipped to {end}, the archive trails real time")
+        if start > end:
+            raise CommandError("--start must not be after --end")
+
+        units = backtest.plan_units(location_ids, start, end)
+        directory = options["checkpoint_dir"]
+        pending = [u for u in units if not backtest.is_checkpointed(u, directory)]
+        self.stdout.write(
+            f"{len(location_ids)} locations × {start}…{end}: {len(units)} units, "
+            f"{len(units) - len(pending)} already checkpointed"
+        )
+
+        fetched, fetch_seconds, failed = 0, 0.0, 0
+        if pending and not options["no_fetch"]:
+            started = time.perf_counter()
+            with process_pool(min(options["concurrency"], len(pending))) as pool:
+                futures = {pool.submit(_backfill, unit, str(directory)): unit for unit in pending}
+                for future in as_completed(futures):
+                    try:
+                        fetched += future.result()
+                    except Exception as exc:
+                        failed += 1
+                        unit = futures[future]
+                        self.stderr.write(f"  unit {unit.key} ({len(unit.location_ids)} locations) failed: {exc}")
+            fetch_seconds = time.perf_counter() - started
+
+        evaluation = backtest.evaluate(units, directory)
+        report = {
+            "backfill": {
+                "location_days": fetched,
+                "seconds": round(fetch_seconds, 2),
+                "per_second": round(fetched / fetch_seconds, 1) if fetch_seconds else None,
+                "failed_units": failed,
+            },
+            "scoring": {
+                "location_days": evaluation.location_days,
+                "seconds": round(evaluation.scored_seconds, 2),
+                "per_second": (
+                    round(evaluation.location_days / evaluation.scored_seconds) if evaluation.scored_seconds else None
+                ),
+            },
+            "replayed": {**asdict(evaluation.replayed), "sunward": False},
+            "stored": {**asdict(evaluation.stored), "sunward": evaluation.stored_sunward},
+        }
+        if options["json"]:
+            self.stdout.write(orjson.dumps(report, option=orjson.OPT_INDENT_2).decode())
+            return
+
+        backfill, scoring = report["backfill"], report["scoring"]
+        if fetched:
+            self.stdout.write(
+                f"Backfilled {fetched} location-days in {backfill['seconds']}s ({backfill['per_second']}/s)"
+            )
+        self.stdout.write(
+            f"Scored {scoring['location_days']} location-days in {scoring['seconds']}s ({scoring['per_second']}/s)"
+        )
+        for name, label in (("replayed", "current scorer, past weather"), ("stored", "forecasts as shown")):
+            acc = report[name]
+            self.stdout.write(
+                f"  {label:<30} ratings {acc['ratings']:>6}  pearson {acc['pearson']}  "
+                f"spearman {acc['spearman']}  MAE {acc['mae_stars']} stars"
+            )
+        if evaluation.stored_sunward:
+            self.stdout.write(
+                "  The replay scores each observer's own point without sunward blending, "
+                "which the forecasts as shown include, so the two are not like for like"
+            )
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{failed} of {len(pending)} units failed; re-run to resume"))
+
+    def _location_ids(self, spec: str) -> list[int]:
+        if spec == "rated":
+            return list(
+                SunsetRating.objects.values_list("forecast__location_id", flat=True).distinct().order_by()
+            )
+        if spec == "all":
+            return list(Location.objects.values_list("pk", flat=True))
+        try:
+            return [int(pk) for pk in spec.split(",") if pk.strip()]
+        except ValueError:
+            raise CommandError("--locations must be 'rated', 'all' or comma-separated ids")
@@ -0,0 +1,27 @@
+"""
+Run forecast-history retention now, or with --schedule install the daily
+Schedule that runs it on the batch lane (idempotent; once per deploy).
+
+    python manage.py prune_forecast_history [--schedule]
+"""
+
+from django.core.management.base import BaseCommand
+
+from ...services import history
+
+
+class Command(BaseCommand):
+    help = "Downsample and expire old forecast snapshots."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--schedule", action="store_true", help="install the daily retention run instead")
+
+    def handle(self, *args, **options):
+        if options["schedule"]:
+            history.install_daily_prune()
+            self.stdout.write(self.style.SUCCESS("Daily forecast-history retention scheduled"))
+            return
+        result = history.prune()
+        self.stdout.write(
+            self.style.SUCCESS(f"Expired {result['expired']} snapshots, thinned {result['thinned']}")
+        )
@@ -0,0 +1,151 @@
+"""
+Pre-build forecasts for the most in-demand locations, so the first
+sunset-hour traffic after a deploy or cache flush doesn't all miss.
+
+Locations are ranked by recent demand — forecast requests served for them
+over the last --lookback-days, as counted by the forecast views (see
+services.demand; the warmer's own builds don't count) — plus
+WARM_FOLLOWER_WEIGHT per user who saved the location or has active alerts
+for it.  The top --top locations whose forecasts aren't all fresh are
+warmed for the next --days days in batches of --batch-size (one Open-Meteo
+request each), spread over --concurrency worker processes.  Upstream calls
+still draw from the shared rate-limit budgets, queueing like background
+tasks do.
+
+    python manage.py warm_forecasts --top 500 --days 3 --concurrency 4
+"""
+
+import time
+from collections import Counter
+from concurrent.futures import as_completed
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from apps.accounts.models import UserLocation
+from apps.core.ratelimit import patience
+from apps.core.tasks import TASK_BUDGET_WAIT
+from apps.notifications.models import NotificationPreference
+from ...models import LocationDemand, SunsetForecast, forecast_expires_at
+from ...services.builder import MAX_LOCATIONS_PER_REQUEST
+from ...tasks import refresh_forecasts
+from ..workers import process_pool
+
+WARM = getattr(settings, "FORECAST_WARM", {})
+WARM_FOLLOWER_WEIGHT = WARM.get("follower_weight", 5)
+
+
+def rank_locations(top: int, lookback_days: int) -> list[tuple[int, int]]:
+    """The `top` (location id, demand score) pairs, highest demand first."""
+    since = timezone.localdate() - timedelta(days=lookback_days)
+    demand = Counter()
+    recent = (
+        LocationDemand.objects.filter(day__gt=since)
+        .values("location")
+        .annotate(n=Sum("requests"))
+        .values_list("location", "n")
+    )
+    saved = UserLocation.objects.values("location").annotate(n=Count("id")).values_list("location", "n")
+    followed = (
+        NotificationPreference.objects.filter(is_active=True)
+        .values("location")
+        .annotate(n=Count("id"))
+        .values_list("location", "n")
+    )
+    for location_id, n in recent:
+        demand[location_id] += n
+    for rows in (saved, followed):
+        for location_id, n in rows:
+            demand[location_id] += n * WARM_FOLLOWER_WEIGHT
+    return demand.most_common(top)
+
+
+def stale_locations(location_ids: list[int], dates: list[date]) -> list[int]:
+    """The locations, in order, missing a fresh forecast for at least one of `dates`."""
+    now = timezone.now()
+    fresh = Counter(
+        location_id
+        for location_id, forecast_date, fetched_at in SunsetForecast.objects.filter(
+            location_id__in=location_ids, forecast_date__in=dates
+        ).values_list("location_id", "forecast_date", "fetched_at")
+        if now <= forecast_expires_at(fetched_at, forecast_date)
+    )
+    return [pk for pk in location_ids if fresh[pk] < len(dates)]
+
+
+def _warm_batch(location_ids: list[int], dates: list[str]) -> int:
+    with patience(TASK_BUDGET_WAIT):
+        return refresh_forecasts(location_ids, dates)
+
+
+class Command(BaseCommand):
+    help = "Warm the forecast cache for the most requested and most followed locations."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=WARM.get("top", 200), help="locations to warm")
+        parser.add_argument("--days", type=int, default=WARM.get("days", 3), help="days ahead, starting today")
+        parser.add_argument(
+            "--concurrency", type=int, default=WARM.get("concurrency", 4), help="worker processes"
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=MAX_LOCATIONS_PER_REQUEST, help="locations per upstream request"
+        )
+        parser.add_argument(
+            "--lookback-days", type=int, default=WARM.get("lookback_days", 7), help="window for recent demand"
+        )
+        parser.add_argument("--force", action="store_true", help="rebuild forecasts that are still fresh")
+        parser.add_argument("--dry-run", action="store_true", help="list what would be warmed and exit")
+
+    def handle(self, *args, **options):
+        for name in ("top", "days", "concurrency", "batch_size", "lookback_days"):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1")
+        if options["batch_size"] > MAX_LOCATIONS_PER_REQUEST:
+            raise CommandError(f"--batch-size can't exceed {MAX_LOCATIONS_PER_REQUEST}")
+
+        today = date.today()
+        dates = [today + timedelta(days=i) for i in range(options["days"])]
+        ranked = rank_locations(options["top"], options["lookback_days"])
+        location_ids = [pk for pk, _ in ranked]
+        if not options["force"]:
+            location_ids = stale_locations(location_ids, dates)
+
+        self.stdout.write(
+            f"{len(ranked)} top locations, {len(location_ids)} to warm for "
+            f"{dates[0]}…{dates[-1]} ({options['concurrency']} processes)"
+        )
+        if options["dry_run"]:
+            scores = dict(ranked)
+            for pk in location_ids:
+                self.stdout.write(f"  location {pk}  demand {scores[pk]}")
+            return
+        if not location_ids:
+            return
+
+        size = options["batch_size"]
+        batches = [location_ids[i:i + size] for i in range(0, len(location_ids), size)]
+        dates_iso = [d.isoformat() for d in dates]
+
+        started = time.perf_counter()
+        rows = failed = 0
+        with process_pool(min(options["concurrency"], len(batches))) as pool:
+            futures = {pool.submit(_warm_batch, batch, dates_iso): batch for batch in batches}
+            for future in as_completed(futures):
+                try:
+                    rows += future.result()
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f"  batch of {len(futures[future])} locations failed: {exc}")
+
+        elapsed = time.perf_counter() - started
+        summary = (
+            f"Warmed {rows} forecasts for {len(location_ids)} locations in {elapsed:.1f}s "
+            f"({rows / elapsed:.1f} rows/s)"
+        )
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{summary}; {failed} of {len(batches)} batches failed"))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,29 @@
+"""
+Worker processes for the forecast management commands that fan upstream
+fetches out over --concurrency processes (warm_forecasts, backtest).
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+
+def process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """A ProcessPoolExecutor whose workers each run their own configured Django."""
+    # Forked workers must not share the parent's database connections
+    connections.close_all()
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_worker,
+        initargs=(settings.SETTINGS_MODULE,),
+    )
+
+
+def _init_worker(settings_module: str):
+    # Spawned workers (the macOS default) start without Django configured
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    import django
+
+    django.setup()
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.15 on 2026-10-19 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecasts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sunsetforecast',
+            name='ensemble_members',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sunsetforecast',
+            name='ensemble_spread',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.15 on 2026-10-19 17:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecasts', '0002_sunsetforecast_ensemble'),
+        ('locations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('forecast_date', models.DateField()),
+                ('captured_at', models.DateTimeField()),
+                ('score', models.PositiveSmallIntegerField()),
+                ('spread', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('cloud_low', models.PositiveSmallIntegerField()),
+                ('cloud_mid', models.PositiveSmallIntegerField()),
+                ('cloud_high', models.PositiveSmallIntegerField()),
+                ('precipitation_probability', models.PositiveSmallIntegerField()),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='locations.location')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['forecast_date', 'location', 'captured_at'], name='snapshot_date_loc_time_idx')],
+            },
+        ),
+    ]
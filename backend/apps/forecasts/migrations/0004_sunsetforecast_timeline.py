@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecasts', '0003_forecastsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sunsetforecast',
+            name='timeline',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
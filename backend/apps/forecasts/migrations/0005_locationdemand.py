@@ -0,0 +1,27 @@
+# Generated by Django 5.1.15 on 2026-10-19 19:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecasts', '0004_sunsetforecast_timeline'),
+        ('locations', '0003_location_geohash_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationDemand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('requests', models.PositiveIntegerField(default=0)),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='demand', to='locations.location')),
+            ],
+            options={
+                'unique_together': {('location', 'day')},
+            },
+        ),
+    ]
@@ -1,6 +1,36 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from apps.locations.models import Location
 
+FORECAST_CACHE = getattr(settings, "FORECAST_CACHE", {})
+MODEL_CYCLE = timedelta(hours=FORECAST_CACHE.get("model_cycle_hours", 6))
+RUN_AVAILABLE_AFTER = timedelta(minutes=FORECAST_CACHE.get("run_available_after_minutes", 270))
+# Model runs a forecast is kept across, by lead time in whole days; the last
+# entry covers every longer lead (and past dates, whose weather is settled)
+RUNS_KEPT = FORECAST_CACHE.get("runs_kept", [1, 1, 2, 2, 4])
+
+_CYCLE_EPOCH = datetime(2000, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def next_model_run(after: datetime) -> datetime:
+    """When the first upstream model run not yet available at `after` becomes available."""
+    cycles = (after - RUN_AVAILABLE_AFTER - _CYCLE_EPOCH) // MODEL_CYCLE
+    return _CYCLE_EPOCH + (cycles + 1) * MODEL_CYCLE + RUN_AVAILABLE_AFTER
+
+
+def forecast_expires_at(fetched_at: datetime, forecast_date) -> datetime:
+    """
+    When a forecast fetched at `fetched_at` stops being served from cache:
+    as soon as the next model run is out for near dates, after a few more
+    runs for dates further ahead, which move less from run to run.
+    """
+    lead_days = (forecast_date - fetched_at.astimezone(dt_timezone.utc).date()).days
+    runs = RUNS_KEPT[-1] if lead_days < 0 else RUNS_KEPT[min(lead_days, len(RUNS_KEPT) - 1)]
+    return next_model_run(fetched_at) + (runs - 1) * MODEL_CYCLE
+
 
 QUALITY_LABELS = [
     ("poor", "Poor"),
@@ -34,6 +64,14 @@ class SunsetForecast(models.Model):
     quality_score = models.FloatField()
     quality_label = models.CharField(max_length=10, choices=QUALITY_LABELS)
 
+    # Multi-model ensemble (null when scored from a single model)
+    ensemble_spread = models.FloatField(null=True, blank=True)  # std dev of member scores
+    ensemble_members = models.PositiveSmallIntegerField(null=True, blank=True)
+
+    # Full-evening score curve from golden_hour_start_utc, scored from the
+    # same weather: {"step_minutes": n, "scores": [score or null, ...]}
+    timeline = models.JSONField(null=True, blank=True)
+
     fetched_at = models.DateTimeField(auto_now=True)
 
     class Meta:
@@ -42,3 +80,70 @@ class SunsetForecast(models.Model):
 
     def __str__(self):
         return f"{self.location} — {self.forecast_date} ({self.quality_label})"
+
+    @property
+    def expires_at(self) -> datetime:
+        return forecast_expires_at(self.fetched_at, self.forecast_date)
+
+    def is_fresh(self, now=None) -> bool:
+        """True until the model runs it was kept across have been superseded."""
+        return (now or timezone.now()) <= self.expires_at
+
+
+class ForecastSnapshot(models.Model):
+    """
+    One past prediction of a (location, date) sunset, appended whenever the
+    stored forecast materially changes and never updated.  Values are kept
+    as small integers: scores and spread in tenths of a point, cloud cover
+    and precipitation probability in whole percent.
+
+    Rows are laid out by forecast_date first, so one date's snapshots sit
+    together for retention, and one location's trajectory for a date is a
+    range of the (forecast_date, location, captured_at) index.
+    """
+
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name="snapshots")
+    forecast_date = models.DateField()
+    captured_at = models.DateTimeField()
+    score = models.PositiveSmallIntegerField()  # tenths
+    spread = models.PositiveSmallIntegerField(null=True, blank=True)  # tenths
+    cloud_low = models.PositiveSmallIntegerField()
+    cloud_mid = models.PositiveSmallIntegerField()
+    cloud_high = models.PositiveSmallIntegerField()
+    precipitation_probability = models.PositiveSmallIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["forecast_date", "location", "captured_at"], name="snapshot_date_loc_time_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.location_id} — {self.forecast_date} at {self.captured_at:%Y-%m-%d %H:%M} ({self.score / 10})"
+
+    @classmethod
+    def of(cls, forecast: SunsetForecast, captured_at: datetime) -> "ForecastSnapshot":
+        return cls(
+            location_id=forecast.location_id,
+            forecast_date=forecast.forecast_date,
+            captured_at=captured_at,
+            score=round(forecast.quality_score * 10),
+            spread=None if forecast.ensemble_spread is None else round(forecast.ensemble_spread * 10),
+            cloud_low=round(forecast.cloud_cover_low),
+            cloud_mid=round(forecast.cloud_cover_mid),
+            cloud_high=round(forecast.cloud_cover_high),
+            precipitation_probability=round(forecast.precipitation_probability),
+        )
+
+
+class LocationDemand(models.Model):
+    """Forecast requests served for a location on one day (see services.demand)."""
+
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name="demand")
+    day = models.DateField()
+    requests = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = [("location", "day")]
+
+    def __str__(self):
+        return f"{self.location_id} — {self.day}: {self.requests}"
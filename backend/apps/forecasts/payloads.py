@@ -0,0 +1,81 @@
+"""
+Fast path for forecast response bodies.
+
+Builds the same dict SunsetForecastSerializer produces, but straight from a
+`.values()` row (or a saved instance) with per-field converters resolved
+once at import, skipping DRF's field-by-field `to_representation` walk.
+The field list is taken from the serializer so the two can't drift apart;
+pair it with FastJSONRenderer for the encoding step.
+"""
+
+from django.db import models
+from django.utils import timezone
+
+from apps.locations.models import Location
+from apps.locations.serializers import LocationSerializer
+from .models import SunsetForecast
+from .serializers import SunsetForecastSerializer
+
+FORECAST_FIELDS = [f for f in SunsetForecastSerializer.Meta.fields if f != "location"]
+
+
+def _datetime(value):
+    """Match rest_framework.fields.DateTimeField with the default ISO 8601 format."""
+    if not value:
+        return None
+    value = value.astimezone(timezone.get_current_timezone()).isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+    return value
+
+
+def _date(value):
+    return value.isoformat() if value is not None else None
+
+
+def _float(value):
+    return float(value) if value is not None else None
+
+
+def _identity(value):
+    return value
+
+
+def _converter(model_field):
+    if isinstance(model_field, models.DateTimeField):
+        return _datetime
+    if isinstance(model_field, models.DateField):
+        return _date
+    if isinstance(model_field, models.FloatField):
+        return _float
+    return _identity
+
+
+# (field name, converter); the nested location is filled in separately
+_FORECAST_CONVERTERS = [
+    (name, None if name == "location" else _converter(SunsetForecast._meta.get_field(name)))
+    for name in SunsetForecastSerializer.Meta.fields
+]
+
+_LOCATION_CONVERTERS = [
+    (name, _float if name in ("lat", "lng") else _converter(Location._meta.get_field(name)))
+    for name in LocationSerializer.Meta.fields
+]
+
+
+def forecast_row(forecast: SunsetForecast) -> dict:
+    """The `.values(*FORECAST_FIELDS)` equivalent of a model instance."""
+    return {name: getattr(forecast, name) for name in FORECAST_FIELDS}
+
+
+def location_payload(location: Location) -> dict:
+    """Same output as LocationSerializer(location).data."""
+    return {name: convert(getattr(location, name)) for name, convert in _LOCATION_CONVERTERS}
+
+
+def forecast_payload(row: dict, location: dict) -> dict:
+    """Same output as SunsetForecastSerializer(forecast).data, given a values() row."""
+    return {
+        name: location if convert is None else convert(row[name])
+        for name, convert in _FORECAST_CONVERTERS
+    }
@@ -0,0 +1,26 @@
+import orjson
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_fallback = JSONEncoder()
+
+
+class FastJSONRenderer(BaseRenderer):
+    """
+    orjson-backed drop-in for DRF's JSONRenderer.
+
+    Output is compact UTF-8 like JSONRenderer's defaults; anything orjson
+    can't encode natively (lazy strings, Decimals, ...) goes through DRF's
+    encoder.  Floats print identically except in exponent notation
+    (orjson writes 1e-7 where json writes 1e-07), which forecast values
+    never reach.
+    """
+
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return orjson.dumps(data, default=_fallback.default)
@@ -25,5 +25,16 @@ class SunsetForecastSerializer(serializers.ModelSerializer):
             "wind_speed",
             "quality_score",
             "quality_label",
+            "ensemble_spread",
+            "ensemble_members",
             "fetched_at",
         ]
+
+
+class ForecastSummarySerializer(SunsetForecastSerializer):
+    """A forecast without its nested location, for payloads that already carry it."""
+
+    location = None
+
+    class Meta(SunsetForecastSerializer.Meta):
+        fields = [f for f in SunsetForecastSerializer.Meta.fields if f != "location"]
@@ -1,14 +1,13 @@
 """
 Astronomical calculations using the `astral` library.
-Computes sunset time, golden hour start, and solar angle.
+Computes sunset time, golden hour, civil dusk, and solar angle.
 """
 
 import logging
 from dataclasses import dataclass
 from datetime import date, datetime, timezone
 
-from astral import LocationInfo
-from astral.sun import sun, golden_hour
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +17,9 @@ class SunTimes:
     sunset_utc: datetime
     golden_hour_start_utc: datetime
     golden_hour_end_utc: datetime
+    civil_dusk_utc: datetime  # sun 6° below the horizon; the afterglow is over
     sunset_hour_local: int  # local hour (0–23) for weather lookup
+    sunset_azimuth: float  # degrees clockwise from north, where the sun sets
 
 
 def get_sun_times(lat: float, lng: float, target_date: date, timezone_name: str = "UTC") -> SunTimes | None:
@@ -26,6 +27,9 @@ def get_sun_times(lat: float, lng: float, target_date: date, timezone_name: str
     Calculate sunset and golden hour times for a given location and date.
     Returns None if the sun doesn't set (polar regions).
     """
+    from astral import LocationInfo, SunDirection
+    from astral.sun import azimuth, golden_hour, sun
+
     try:
         loc = LocationInfo(
             name="location",
@@ -35,7 +39,8 @@ def get_sun_times(lat: float, lng: float, target_date: date, timezone_name: str
             longitude=lng,
         )
         s = sun(loc.observer, date=target_date, tzinfo=loc.timezone)
-        gh = golden_hour(loc.observer, date=target_date, direction=1, tzinfo=loc.timezone)
+        gh = golden_hour(loc.observer, date=target_date, direction=SunDirection.SETTING, tzinfo=loc.timezone)
+        sunset_azimuth = azimuth(loc.observer, s["sunset"])
     except Exception as exc:
         logger.error("astral calculation failed for (%s, %s) on %s: %s", lat, lng, target_date, exc)
         return None
@@ -53,7 +58,9 @@ def get_sun_times(lat: float, lng: float, target_date: date, timezone_name: str
         sunset_utc=sunset_utc,
         golden_hour_start_utc=gh_start_utc,
         golden_hour_end_utc=gh_end_utc,
+        civil_dusk_utc=s["dusk"].astimezone(timezone.utc),
         sunset_hour_local=sunset_local_hour,
+        sunset_azimuth=sunset_azimuth,
     )
 
 
@@ -67,3 +74,46 @@ def estimate_timezone(lng: float) -> str:
         return f"Etc/GMT-{offset}"
     else:
         return f"Etc/GMT+{abs(offset)}"
+
+
+def sunset_hours_local(
+    lats: np.ndarray,
+    lngs: np.ndarray,
+    utc_offsets: np.ndarray,
+    start: date,
+    days: int,
+) -> np.ndarray:
+    """
+    Local sunset hour (fractional) for every location × day, in one
+    vectorized pass: NOAA's solar equations, which agree with astral to
+    within a few minutes (half a minute on average) away from the poles.
+    Rows follow the inputs, columns the days from `start`; NaN where the
+    sun doesn't set.  `utc_offsets` are each location's fixed offset from
+    UTC in hours.
+    """
+    lat = np.radians(np.asarray(lats, dtype=float))[:, None]
+    lng = np.asarray(lngs, dtype=float)[:, None]
+    offset = np.asarray(utc_offsets, dtype=float)[:, None]
+
+    days_since_new_year = np.arange(days) + start.timetuple().tm_yday - 1
+    year_days = 366 if start.year % 4 == 0 and (start.year % 100 or start.year % 400 == 0) else 365
+
+    # Solve at local noon, then once more at the sunset instant that gives
+    sunset_utc_hours = 12 - offset
+    for _ in range(2):
+        gamma = 2 * np.pi / year_days * (days_since_new_year + sunset_utc_hours / 24)
+        eqtime = 229.18 * (
+            0.000075 + 0.001868 * np.cos(gamma) - 0.032077 * np.sin(gamma)
+            - 0.014615 * np.cos(2 * gamma) - 0.040849 * np.sin(2 * gamma)
+        )
+        decl = (
+            0.006918 - 0.399912 * np.cos(gamma) + 0.070257 * np.sin(gamma)
+            - 0.006758 * np.cos(2 * gamma) + 0.000907 * np.sin(2 * gamma)
+            - 0.002697 * np.cos(3 * gamma) + 0.00148 * np.sin(3 * gamma)
+        )
+        # 90.833°: the sun's upper limb at the horizon, with standard refraction
+        cos_ha = np.cos(np.radians(90.833)) / (np.cos(lat) * np.cos(decl)) - np.tan(lat) * np.tan(decl)
+        with np.errstate(invalid="ignore"):
+            ha = np.degrees(np.arccos(np.where(np.abs(cos_ha) <= 1, cos_ha, np.nan)))
+        sunset_utc_hours = (720 - 4 * (lng - ha) - eqtime) / 60
+    return sunset_utc_hours + offset
@@ -0,0 +1,299 @@
+"""
+Historical backfill and backtesting.
+
+Replays the scorer over past weather so a scorer change can be judged
+against what users actually saw.  Work is split into units of up to
+MAX_LOCATIONS_PER_REQUEST locations × one calendar year, one Open-Meteo
+archive request each (OPEN_METEO_ARCHIVE_URL; the local stand-in serves
+/v1/archive too).
+
+backfill_unit() fetches a unit, samples every location-day at its sunset
+hour (sunsets from the vectorized NOAA solution, not astral per day) and
+checkpoints the raw samples to `<checkpoint dir>/<year>_<bucket>.npz`,
+where the bucket is location id // MAX_LOCATIONS_PER_REQUEST.  Units whose
+checkpoint covers them are skipped, so an interrupted backfill resumes
+where it stopped, and a newly rated location or a later end date refetches
+only the unit it falls in.  Scoring is not checkpointed: evaluate() scores every
+checkpointed sample with the current scorer in vectorized batches, so a
+scorer change is re-tested without another upstream call.
+
+Reanalysis has no precipitation probability or visibility: probability is
+taken as 0 (the measured precipitation carries the penalty) and visibility
+as missing, which the scorer already handles.
+
+The replay scores the observer's own grid point only, without the sunward
+blending (see sunward) that live forecasts get while FORECAST_SUNWARD is
+on.  The sunward cells follow the sunset azimuth through the year, so
+backfilling them would multiply the archive requests per unit.  The
+stored forecasts users were shown are blended, so their accuracy is not a
+like-for-like baseline for the replay; the report flags this.
+"""
+
+import os
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Max, Min
+
+from apps.locations.models import Location
+from apps.ratings.models import SunsetRating
+from .astro import estimate_timezone, sunset_hours_local
+from .builder import MAX_LOCATIONS_PER_REQUEST
+from . import sunward
+from .open_meteo import SERIES_COLUMNS, fetch_hourly_weather_batch
+from .scorer import compute_quality_scores
+
+BACKTEST = getattr(settings, "FORECAST_BACKTEST", {})
+CHECKPOINT_DIR = Path(BACKTEST.get("checkpoint_dir", "backtest"))
+SCORE_BATCH = BACKTEST.get("score_batch", 1_000_000)  # location-days per scorer call
+# The archive trails real time by a few days while reanalysis catches up
+ARCHIVE_LAG_DAYS = 5
+
+COLUMNS = list(SERIES_COLUMNS)
+
+
+@dataclass(frozen=True)
+class Unit:
+    """One archive request: the locations of one id bucket over a span within one year."""
+
+    bucket: int  # location id // MAX_LOCATIONS_PER_REQUEST
+    location_ids: tuple[int, ...]
+    start: date
+    end: date
+
+    @property
+    def days(self) -> int:
+        return (self.end - self.start).days + 1
+
+    @property
+    def location_days(self) -> int:
+        return len(self.location_ids) * self.days
+
+    @property
+    def key(self) -> str:
+        # Stable across runs, so a newly rated location or a later --end
+        # only invalidates the one unit it falls in
+        return f"{self.start.year}_{self.bucket}"
+
+
+def plan_units(location_ids: list[int], start: date, end: date) -> list[Unit]:
+    """Locations bucketed by id, one request per bucket × calendar year of [start, end]."""
+    buckets = defaultdict(list)
+    for pk in sorted(set(location_ids)):
+        buckets[pk // MAX_LOCATIONS_PER_REQUEST].append(pk)
+    units = []
+    for year in range(start.year, end.year + 1):
+        span_start, span_end = max(start, date(year, 1, 1)), min(end, date(year, 12, 31))
+        units.extend(Unit(bucket, tuple(ids), span_start, span_end) for bucket, ids in sorted(buckets.items()))
+    return units
+
+
+def checkpoint_path(unit: Unit, directory: Path = CHECKPOINT_DIR) -> Path:
+    return Path(directory) / f"{unit.key}.npz"
+
+
+def is_checkpointed(unit: Unit, directory: Path = CHECKPOINT_DIR) -> bool:
+    """Whether the unit's checkpoint exists and covers all of its locations and days."""
+    path = checkpoint_path(unit, directory)
+    if not path.exists():
+        return False
+    with np.load(path) as checkpoint:
+        if "start" not in checkpoint:
+            return False
+        start, end = date.fromordinal(int(checkpoint["start"])), date.fromordinal(int(checkpoint["end"]))
+        return (
+            start <= unit.start
+            and end >= unit.end
+            and set(unit.location_ids) <= set(checkpoint["location_ids"].tolist())
+        )
+
+
+def backfill_unit(unit: Unit, directory: Path = CHECKPOINT_DIR) -> int:
+    """
+    Fetch, sample and checkpoint one unit unless it already is; returns the
+    location-days fetched (0 when skipped).  A checkpoint missing some of the
+    unit's locations or days is replaced.  Raises httpx.HTTPError if the
+    archive is unavailable.
+    """
+    if is_checkpointed(unit, directory):
+        return 0
+    path = checkpoint_path(unit, directory)
+
+    by_id = Location.objects.in_bulk(unit.location_ids)
+    locations = [by_id[pk] for pk in unit.location_ids if pk in by_id]
+    lats = np.array([loc.lat for loc in locations])
+    lngs = np.array([loc.lng for loc in locations])
+    series = fetch_hourly_weather_batch(
+        list(zip(lats, lngs)),
+        unit.start,
+        unit.end,
+        [estimate_timezone(lng) for lng in lngs],
+        historical=True,
+    )
+
+    # estimate_timezone() is a whole-hour offset of round(lng / 15)
+    hours = sunset_hours_local(lats, lngs, np.round(lngs / 15), unit.start, unit.days)
+    samples = np.full((len(locations), len(COLUMNS), unit.days), np.nan, dtype=np.float32)
+    day_offsets = np.arange(unit.days) * 24
+    for i, s in enumerate(series):
+        if s.start is None:
+            continue
+        sets = ~np.isnan(hours[i])
+        # The hour nearest sunset on each day, as closest_to_hour() picks it
+        idx = day_offsets[sets] + np.clip(np.floor(hours[i, sets]), 0, 23).astype(int) - s.start.hour
+        in_range = idx < len(s)
+        grid = np.stack([getattr(s, column) for column in COLUMNS])
+        samples[i][:, np.flatnonzero(sets)[in_range]] = grid[:, idx[in_range]]
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        np.savez(
+            f,
+            location_ids=np.array([loc.pk for loc in locations], dtype=np.int64),
+            horizons=np.array([loc.horizon_elevation_west for loc in locations], dtype=np.float32),
+            samples=samples,
+            start=np.int64(unit.start.toordinal()),
+            end=np.int64(unit.end.toordinal()),
+        )
+    os.replace(tmp, path)  # a checkpoint is either complete or absent
+    return unit.location_days
+
+
+def score_samples(samples: np.ndarray, horizons: np.ndarray) -> np.ndarray:
+    """
+    Score (locations, columns, days) samples, in batches of SCORE_BATCH
+    location-days; returns (locations, days), NaN where nothing was sampled.
+    """
+    n_locations, _, n_days = samples.shape
+    flat = samples.transpose(1, 0, 2).reshape(len(COLUMNS), -1).astype(float)
+    horizon = np.repeat(np.asarray(horizons, dtype=float), n_days)
+    scores = np.full(flat.shape[1], np.nan)
+    for start in range(0, flat.shape[1], SCORE_BATCH):
+        block = dict(zip(COLUMNS, flat[:, start:start + SCORE_BATCH]))
+        sampled = ~np.isnan(block["cloud_cover_total"])
+        rh = block["relative_humidity"]
+        batch = compute_quality_scores(
+            cloud_low=np.nan_to_num(block["cloud_cover_low"]),
+            cloud_mid=np.nan_to_num(block["cloud_cover_mid"]),
+            cloud_high=np.nan_to_num(block["cloud_cover_high"]),
+            precipitation=np.nan_to_num(block["precipitation"]),
+            precipitation_probability=np.nan_to_num(block["precipitation_probability"]),
+            # Missing or 0% humidity counts as 50%, as in HourlySeries.at()
+            relative_humidity=np.where(np.isnan(rh) | (rh == 0), 50.0, rh),
+            visibility=block["visibility"],
+            wind_speed=block["wind_speed"],
+            horizon_elevation_west=horizon[start:start + SCORE_BATCH],
+        )
+        scores[start:start + SCORE_BATCH] = np.where(sampled, batch, np.nan)
+    return scores.reshape(n_locations, n_days)
+
+
+@dataclass
+class Accuracy:
+    """How well a set of scores tracks the 1–5 star ratings."""
+
+    ratings: int
+    pearson: float | None
+    spearman: float | None
+    mae_stars: float | None  # score mapped onto 1–5 stars
+
+
+@dataclass
+class Evaluation:
+    location_days: int
+    scored_seconds: float
+    replayed: Accuracy  # the current scorer on reanalysis weather, observer point only
+    stored: Accuracy  # the forecasts users were shown
+    stored_sunward: bool  # whether live forecasts blend sunward samples the replay leaves out
+
+
+def evaluate(units: list[Unit], directory: Path = CHECKPOINT_DIR) -> Evaluation:
+    """
+    Score every checkpointed unit with the current scorer (without sunward
+    blending) and compare with SunsetRating.
+    """
+    unit_of = {}
+    for unit in units:
+        for pk in unit.location_ids:
+            unit_of[(pk, unit.start.year)] = unit
+    wanted = defaultdict(list)
+    for location_id, forecast_date, stars, stored_score in SunsetRating.objects.values_list(
+        "forecast__location_id", "forecast__forecast_date", "score", "forecast__quality_score"
+    ).iterator():
+        unit = unit_of.get((location_id, forecast_date.year))
+        if unit is not None and unit.start <= forecast_date <= unit.end:
+            wanted[unit].append((location_id, forecast_date, stars, stored_score))
+
+    location_days = 0
+    started = time.perf_counter()
+    replayed, stored, stars = [], [], []
+    for unit in units:
+        if not is_checkpointed(unit, directory):
+            continue
+        with np.load(checkpoint_path(unit, directory)) as checkpoint:
+            scores = score_samples(checkpoint["samples"], checkpoint["horizons"])
+            row_of = {int(pk): row for row, pk in enumerate(checkpoint["location_ids"])}
+            # A checkpoint may span more days than this run asks for
+            first = date.fromordinal(int(checkpoint["start"]))
+        location_days += scores.size
+        for location_id, forecast_date, rating, stored_score in wanted.get(unit, []):
+            row, day = row_of.get(location_id), (forecast_date - first).days
+            if row is not None and not np.isnan(scores[row, day]):
+                replayed.append(scores[row, day])
+                stored.append(stored_score)
+                stars.append(rating)
+    elapsed = time.perf_counter() - started
+
+    return Evaluation(
+        location_days=location_days,
+        scored_seconds=elapsed,
+        replayed=_accuracy(replayed, stars),
+        stored=_accuracy(stored, stars),
+        stored_sunward=sunward.ENABLED,
+    )
+
+
+def _accuracy(scores: list[float], stars: list[int]) -> Accuracy:
+    if len(scores) < 2:
+        return Accuracy(len(scores), None, None, None)
+    x, y = np.asarray(scores, dtype=float), np.asarray(stars, dtype=float)
+    return Accuracy(
+        ratings=len(x),
+        pearson=_correlation(x, y),
+        spearman=_correlation(_ranks(x), _ranks(y)),
+        mae_stars=round(float(np.mean(np.abs(1 + x / 25 - y))), 3),
+    )
+
+
+def _correlation(x: np.ndarray, y: np.ndarray) -> float | None:
+    if x.std() == 0 or y.std() == 0:
+        return None
+    return round(float(np.corrcoef(x, y)[0, 1]), 3)
+
+
+def _ranks(values: np.ndarray) -> np.ndarray:
+    """Ranks with ties averaged, as Spearman's rho needs."""
+    _, inverse, counts = np.unique(values, return_inverse=True, return_counts=True)
+    first = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return (first + (counts - 1) / 2)[inverse]
+
+
+def rated_span() -> tuple[date, date] | None:
+    """The date span of rated forecasts, clipped to what the archive has."""
+    span = SunsetRating.objects.aggregate(
+        start=Min("forecast__forecast_date"), end=Max("forecast__forecast_date")
+    )
+    if span["start"] is None:
+        return None
+    return span["start"], min(span["end"], latest_archived())
+
+
+def latest_archived() -> date:
+    return date.today() - timedelta(days=ARCHIVE_LAG_DAYS)
@@ -0,0 +1,379 @@
+"""
+Turns astro + weather data into SunsetForecast rows.
+
+`build_forecasts` covers many locations and dates at once: one Open-Meteo
+request per MAX_LOCATIONS_PER_REQUEST locations spanning every date, and a
+single bulk upsert, so the query and upstream call counts don't grow with
+the number of places.
+
+With FORECAST_ENSEMBLE_MODELS set, every configured weather model is
+fetched concurrently, all members for all (location, date) pairs are
+scored in one vectorized pass, and each forecast stores the median score
+plus the members' spread.
+
+With FORECAST_SUNWARD sampling (see sunward), every member is also scored
+under the cloud layers sampled out along the sunset azimuth, in the same
+vectorized pass, and its score is the weighted blend.  If sampling fails, the
+forecasts are scored from the observer's own point alone.
+
+Each forecast's full-evening timeline is scored from the same fetched
+series (see timeline), again in one vectorized pass, and stored with it.
+
+Refreshes update rows in place, so forecast ids (and the ratings pointing at
+them) survive.  A refreshed forecast whose inputs all moved less than
+FORECAST_CHANGE_THRESHOLDS only has its fetched_at bumped; one whose score
+moved by FORECAST_SCORE_SWING or more is announced on forecast_score_swung.
+Every created or changed forecast is also appended to the snapshot history.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import httpx
+import numpy as np
+from django.conf import settings
+from django.db import router
+from django.utils import timezone
+
+from apps.core import threads
+from apps.core.metrics import FORECAST_WRITES, stage
+from apps.core.routers import pin_primary
+from apps.locations.models import Location
+from ..models import SunsetForecast
+from ..signals import forecast_score_swung
+from . import history, sunward, timeline
+from .astro import SunTimes, estimate_timezone, get_sun_times
+from .open_meteo import (
+    MAX_LOCATIONS_PER_REQUEST,
+    HourlyWeather,
+    closest_to_hour,
+    fetch_hourly_weather_batch,
+    fetch_hourly_weather_ensemble,
+)
+from .scorer import compute_quality_score, compute_quality_scores, label_from_score
+
+logger = logging.getLogger(__name__)
+
+ENSEMBLE_MODELS = getattr(settings, "FORECAST_ENSEMBLE_MODELS", [])
+# Largest change per field that still counts as "the same forecast"; fields
+# not listed (sunset times, label, member count) must match exactly
+CHANGE_THRESHOLDS = getattr(settings, "FORECAST_CHANGE_THRESHOLDS", {})
+SCORE_SWING = getattr(settings, "FORECAST_SCORE_SWING", 15.0)
+
+UPSERT_FIELDS = [
+    "sunset_time_utc",
+    "golden_hour_start_utc",
+    "cloud_cover_total",
+    "cloud_cover_low",
+    "cloud_cover_mid",
+    "cloud_cover_high",
+    "relative_humidity",
+    "precipitation_probability",
+    "precipitation",
+    "visibility",
+    "wind_speed",
+    "quality_score",
+    "quality_label",
+    "ensemble_spread",
+    "ensemble_members",
+    "timeline",
+    "fetched_at",
+]
+
+
+def forecast_from_weather(
+    location: Location,
+    target_date: date,
+    sun_times: SunTimes,
+    weather: HourlyWeather,
+) -> SunsetForecast:
+    """Score the sunset-hour weather and return an unsaved SunsetForecast."""
+    breakdown = compute_quality_score(
+        cloud_low=weather.cloud_cover_low,
+        cloud_mid=weather.cloud_cover_mid,
+        cloud_high=weather.cloud_cover_high,
+        precipitation=weather.precipitation,
+        precipitation_probability=weather.precipitation_probability,
+        relative_humidity=weather.relative_humidity,
+        visibility=weather.visibility,
+        wind_speed=weather.wind_speed,
+        horizon_elevation_west=location.horizon_elevation_west,
+    )
+    return _unsaved_forecast(location, target_date, sun_times, weather, breakdown.total, breakdown.label)
+
+
+def _unsaved_forecast(
+    location: Location,
+    target_date: date,
+    sun_times: SunTimes,
+    weather: HourlyWeather,
+    score: float,
+    label: str,
+    **extra,
+) -> SunsetForecast:
+    return SunsetForecast(
+        location=location,
+        forecast_date=target_date,
+        sunset_time_utc=sun_times.sunset_utc,
+        golden_hour_start_utc=sun_times.golden_hour_start_utc,
+        cloud_cover_total=weather.cloud_cover_total,
+        cloud_cover_low=weather.cloud_cover_low,
+        cloud_cover_mid=weather.cloud_cover_mid,
+        cloud_cover_high=weather.cloud_cover_high,
+        relative_humidity=weather.relative_humidity,
+        precipitation_probability=weather.precipitation_probability,
+        precipitation=weather.precipitation,
+        visibility=weather.visibility,
+        wind_speed=weather.wind_speed,
+        quality_score=score,
+        quality_label=label,
+        **extra,
+    )
+
+
+def score_members(members: list[HourlyWeather], horizons: list[float]) -> np.ndarray:
+    """Score many HourlyWeather rows in one vectorized call."""
+
+    def column(attr: str) -> np.ndarray:
+        return np.array([getattr(m, attr) for m in members], dtype=float)
+
+    return compute_quality_scores(
+        cloud_low=column("cloud_cover_low"),
+        cloud_mid=column("cloud_cover_mid"),
+        cloud_high=column("cloud_cover_high"),
+        precipitation=column("precipitation"),
+        precipitation_probability=column("precipitation_probability"),
+        relative_humidity=column("relative_humidity"),
+        visibility=column("visibility"),
+        wind_speed=column("wind_speed"),
+        horizon_elevation_west=np.array(horizons, dtype=float),
+    )
+
+
+def forecast_from_ensemble(
+    location: Location,
+    target_date: date,
+    sun_times: SunTimes,
+    members: list[HourlyWeather],
+    scores: np.ndarray,
+) -> SunsetForecast:
+    """
+    Median-score forecast from ensemble members.  Weather fields come from
+    the member closest to the median; ensemble_spread is the members'
+    standard deviation.
+    """
+    median = round(float(np.median(scores)), 1)
+    representative = members[int(np.argmin(np.abs(scores - median)))]
+    return _unsaved_forecast(
+        location,
+        target_date,
+        sun_times,
+        representative,
+        median,
+        label_from_score(median),
+        ensemble_spread=round(float(np.std(scores)), 1),
+        ensemble_members=len(members),
+    )
+
+
+def score_pending(pending: list[tuple], samples: dict[tuple, list]) -> list[np.ndarray]:
+    """
+    Member scores for each pending (location, date, sun times, members), all
+    in one vectorized call.  Where `samples` has sunward cloud layers for a
+    (location pk, date), each member's score is blended with its scores
+    under those layers.
+    """
+    rows, horizons, weights = [], [], []
+    for loc, d, st, members in pending:
+        present = [
+            (weight, clouds)
+            for weight, clouds in zip(sunward.WEIGHTS[1:], samples.get((loc.pk, d), []))
+            if clouds is not None
+        ]
+        w = np.array([sunward.WEIGHTS[0]] + [weight for weight, _ in present])
+        weights.append(w / w.sum())
+        for member in members:
+            rows.append(member)
+            rows.extend(sunward.under(member, clouds) for _, clouds in present)
+        horizons.extend([loc.horizon_elevation_west] * (len(members) * len(w)))
+
+    scores = score_members(rows, horizons)
+    blended, offset = [], 0
+    for (*_, members), w in zip(pending, weights):
+        block = scores[offset:offset + len(members) * len(w)].reshape(len(members), len(w))
+        blended.append(block @ w)
+        offset += block.size
+    return blended
+
+
+def build_forecasts(locations: list[Location], dates: list[date]) -> list[SunsetForecast]:
+    """
+    Fetch, score and upsert forecasts, with their timelines, for every
+    (location, date) pair.  Pairs where the sun doesn't set are skipped.
+    Raises httpx.HTTPError if Open-Meteo is unavailable.
+    """
+    dates = sorted(set(dates))
+    if not locations or not dates:
+        return []
+
+    tz_names = {loc.pk: estimate_timezone(loc.lng) for loc in locations}
+    with stage("forecast.astro"):
+        sun_times = {
+            (loc.pk, d): get_sun_times(loc.lat, loc.lng, d, tz_names[loc.pk])
+            for loc in locations
+            for d in dates
+        }
+
+    forecasts = []
+    for start in range(0, len(locations), MAX_LOCATIONS_PER_REQUEST):
+        chunk = locations[start:start + MAX_LOCATIONS_PER_REQUEST]
+        coords = [(loc.lat, loc.lng) for loc in chunk]
+        timezones = [tz_names[loc.pk] for loc in chunk]
+        with stage("forecast.weather"), ThreadPoolExecutor(max_workers=1, thread_name_prefix="sunward") as pool:
+            # The sunward samples' request, if any cell is uncached, runs alongside the observers'
+            sampling = None
+            if sunward.ENABLED:
+                points = {
+                    (loc.pk, d): (loc.lat, loc.lng, st)
+                    for loc in chunk
+                    for d in dates
+                    if (st := sun_times[(loc.pk, d)]) is not None
+                }
+                sampling = threads.submit(pool, sunward.sample, points)
+            if ENSEMBLE_MODELS:
+                by_model = fetch_hourly_weather_ensemble(coords, dates[0], dates[-1], timezones, ENSEMBLE_MODELS)
+            else:
+                by_model = {None: fetch_hourly_weather_batch(coords, dates[0], dates[-1], timezones)}
+            samples = {}
+            if sampling is not None:
+                try:
+                    samples = sampling.result()
+                except httpx.HTTPError as exc:
+                    # The samples only refine the score; without them it isn't blended
+                    logger.warning("Sunward sampling failed: %s", exc)
+
+        with stage("forecast.score"):
+            pending, evenings, built = [], [], len(forecasts)
+            for i, loc in enumerate(chunk):
+                for d in dates:
+                    st = sun_times[(loc.pk, d)]
+                    if st is None:
+                        continue
+                    # The timeline takes the same members as the score: a series
+                    # that doesn't reach this date would only add NaN
+                    used = [
+                        (series[i], weather)
+                        for series in by_model.values()
+                        if (weather := closest_to_hour(series[i], d, st.sunset_hour_local)) is not None
+                    ]
+                    if not used:
+                        continue
+                    members = [weather for _, weather in used]
+                    pending.append((loc, d, st, members))
+                    # estimate_timezone() is a whole-hour offset of round(lng / 15)
+                    conditions = [timeline.conditions(s, round(loc.lng / 15), st) for s, _ in used]
+                    evenings.append((st, loc.horizon_elevation_west, conditions, samples.get((loc.pk, d), [])))
+
+            if not ENSEMBLE_MODELS and not sunward.ENABLED:
+                forecasts.extend(forecast_from_weather(loc, d, st, members[0]) for loc, d, st, members in pending)
+            else:
+                for (loc, d, st, members), scores in zip(pending, score_pending(pending, samples)):
+                    if ENSEMBLE_MODELS:
+                        forecasts.append(forecast_from_ensemble(loc, d, st, members, scores))
+                    else:
+                        score = round(float(scores[0]), 1)
+                        forecasts.append(_unsaved_forecast(loc, d, st, members[0], score, label_from_score(score)))
+
+        if evenings:
+            with stage("forecast.timeline"):
+                # One evening per pending pair, so in step with this chunk's forecasts
+                for forecast, evening in zip(forecasts[built:], timeline.score_timelines(evenings)):
+                    forecast.timeline = evening.stored()
+
+    with stage("forecast.db_write"):
+        return save_forecasts(forecasts)
+
+
+def save_forecasts(forecasts: list[SunsetForecast]) -> list[SunsetForecast]:
+    """
+    Store freshly computed forecasts and return what is stored, in order.
+
+    Rows are compared with the primary's current ones: new or materially
+    changed forecasts are upserted on (location, forecast_date) in place,
+    unchanged ones only get fetched_at bumped (and the stored row is
+    returned in their place), plus their timeline if they had none.  New
+    and changed ones are appended to the snapshot history.  An upsert
+    rather than save() because the cache check may have read a replica
+    that hasn't seen a row the primary already has.  Reads are pinned to
+    the primary afterwards.
+    """
+    if not forecasts:
+        return []
+    db = router.db_for_write(SunsetForecast)
+    current = {
+        (f.location_id, f.forecast_date): f
+        for f in SunsetForecast.objects.using(db).filter(
+            location_id__in={f.location_id for f in forecasts},
+            forecast_date__in={f.forecast_date for f in forecasts},
+        )
+    }
+
+    now = timezone.now()
+    stored, changed, unchanged, completed, swings = [], [], [], [], []
+    for forecast in forecasts:
+        previous = current.get((forecast.location_id, forecast.forecast_date))
+        if previous is None or _differs(previous, forecast):
+            changed.append(forecast)
+            stored.append(forecast)
+            if previous is not None and abs(forecast.quality_score - previous.quality_score) >= SCORE_SWING:
+                swings.append((forecast, previous.quality_score))
+        else:
+            previous.fetched_at = now
+            if previous.timeline is None and forecast.timeline is not None:
+                previous.timeline = forecast.timeline
+                completed.append(previous)
+            else:
+                unchanged.append(previous.pk)
+            stored.append(previous)
+
+    if changed:
+        SunsetForecast.objects.bulk_create(
+            changed,
+            update_conflicts=True,
+            unique_fields=["location", "forecast_date"],
+            update_fields=UPSERT_FIELDS,
+        )
+        # Not every backend returns ids for updated rows
+        for forecast in changed:
+            if forecast.pk is None and (forecast.location_id, forecast.forecast_date) in current:
+                forecast.pk = current[(forecast.location_id, forecast.forecast_date)].pk
+    if unchanged:
+        SunsetForecast.objects.filter(pk__in=unchanged).update(fetched_at=now)
+    if completed:
+        SunsetForecast.objects.bulk_update(completed, ["timeline", "fetched_at"])
+    history.append(changed, now)
+    pin_primary()
+
+    created = sum(1 for f in changed if (f.location_id, f.forecast_date) not in current)
+    FORECAST_WRITES.labels(result="created").inc(created)
+    FORECAST_WRITES.labels(result="updated").inc(len(changed) - created)
+    FORECAST_WRITES.labels(result="unchanged").inc(len(unchanged) + len(completed))
+    if swings:
+        FORECAST_WRITES.labels(result="swing").inc(len(swings))
+        forecast_score_swung.send(sender=SunsetForecast, swings=swings)
+    return stored
+
+
+def _differs(previous: SunsetForecast, forecast: SunsetForecast) -> bool:
+    """True if any stored input moved by more than its change threshold."""
+    for field in UPSERT_FIELDS:
+        if field in ("timeline", "fetched_at"):
+            continue
+        old, new = getattr(previous, field), getattr(forecast, field)
+        if old == new:
+            continue
+        tolerance = CHANGE_THRESHOLDS.get(field)
+        if tolerance is None or old is None or new is None or abs(new - old) > tolerance:
+            return True
+    return False
@@ -0,0 +1,65 @@
+"""
+Request demand per location, for ranking what warm_forecasts pre-builds.
+
+The forecast views call record() for every request they serve, hit or
+miss.  Counts are buffered in process memory and flushed as increments of
+one LocationDemand row per (location, day) once FORECAST_DEMAND
+["flush_seconds"] have passed, so a request costs no write of its own.
+Counts still buffered when a process exits are lost, which a ranking can
+afford.  prune() drops days older than "keep_days".
+"""
+
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import LocationDemand
+
+DEMAND = getattr(settings, "FORECAST_DEMAND", {})
+FLUSH_SECONDS = DEMAND.get("flush_seconds", 30)
+KEEP_DAYS = DEMAND.get("keep_days", 30)
+
+_lock = threading.Lock()
+_pending: Counter = Counter()
+_flushed_at = time.monotonic()
+
+
+def record(location_id: int):
+    """Count one request for a location, flushing the buffer when it is due."""
+    global _flushed_at
+    with _lock:
+        _pending[location_id] += 1
+        if time.monotonic() - _flushed_at < FLUSH_SECONDS:
+            return
+        _flushed_at = time.monotonic()
+    flush()
+
+
+def flush():
+    """Add this process's buffered counts to today's rows."""
+    global _pending
+    with _lock:
+        counts, _pending = _pending, Counter()
+    day = timezone.localdate()
+    for location_id, n in counts.items():
+        rows = LocationDemand.objects.filter(location_id=location_id, day=day)
+        if rows.update(requests=F("requests") + n):
+            continue
+        try:
+            with transaction.atomic():
+                LocationDemand.objects.create(location_id=location_id, day=day, requests=n)
+        except IntegrityError:
+            # Another process created the row first
+            rows.update(requests=F("requests") + n)
+
+
+def prune(today=None) -> int:
+    """Delete counts older than KEEP_DAYS; returns how many rows went."""
+    cutoff = (today or timezone.localdate()) - timedelta(days=KEEP_DAYS)
+    return LocationDemand.objects.filter(day__lt=cutoff).delete()[0]
@@ -0,0 +1,113 @@
+"""
+Forecast history: the append-only ForecastSnapshot store.
+
+save_forecasts appends a snapshot for every forecast it creates or
+materially changes, so a (location, date)'s trajectory shows how the
+prediction drifted as sunset approached.  Refreshes that leave a forecast
+unchanged append nothing; the previous snapshot still stands.
+
+Retention runs daily on the batch lane, one forecast date at a time:
+snapshots for dates older than FORECAST_HISTORY["raw_days"] are thinned to
+the last one per location in each "bucket_hours" window, and dates older
+than "keep_days" are dropped.  Deletes go in batches of "batch" rows so no
+transaction holds many locks.
+"""
+
+import logging
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from apps.core.tasks import install_daily
+from ..models import ForecastSnapshot, SunsetForecast
+
+logger = logging.getLogger(__name__)
+
+HISTORY = getattr(settings, "FORECAST_HISTORY", {})
+RAW_DAYS = HISTORY.get("raw_days", 14)
+KEEP_DAYS = HISTORY.get("keep_days", 365)
+BUCKET_HOURS = HISTORY.get("bucket_hours", 6)
+BATCH = HISTORY.get("batch", 5000)
+# Dates just past raw_days that each run thins, so missed runs catch up
+CATCHUP_DAYS = 7
+
+PRUNE_SCHEDULE = "forecasts.prune_history"
+PRUNE_TASK = "apps.forecasts.tasks.prune_forecast_history"
+
+
+def append(forecasts: list[SunsetForecast], captured_at: datetime):
+    """Record the given forecasts as predicted at `captured_at`."""
+    if forecasts:
+        ForecastSnapshot.objects.bulk_create(
+            [ForecastSnapshot.of(f, captured_at) for f in forecasts], batch_size=BATCH
+        )
+
+
+def trajectory(location_id: int, forecast_date: date) -> list[tuple[datetime, float]]:
+    """(captured_at, score) for one location and date, oldest first."""
+    rows = (
+        ForecastSnapshot.objects.filter(forecast_date=forecast_date, location_id=location_id)
+        .order_by("captured_at")
+        .values_list("captured_at", "score")
+    )
+    return [(captured_at, score / 10) for captured_at, score in rows]
+
+
+def prune(today: date | None = None) -> dict[str, int]:
+    """Downsample and expire old snapshots; returns rows deleted per step."""
+    today = today or timezone.localdate()
+    raw_cutoff = today - timedelta(days=RAW_DAYS)
+    keep_cutoff = today - timedelta(days=KEEP_DAYS)
+
+    expired = 0
+    while True:
+        ids = list(
+            ForecastSnapshot.objects.filter(forecast_date__lt=keep_cutoff)
+            .order_by("forecast_date")
+            .values_list("id", flat=True)[:BATCH]
+        )
+        if not ids:
+            break
+        expired += ForecastSnapshot.objects.filter(pk__in=ids).delete()[0]
+
+    thinned = 0
+    for offset in range(CATCHUP_DAYS, 0, -1):
+        target_date = raw_cutoff - timedelta(days=offset)
+        if target_date >= keep_cutoff:
+            thinned += downsample(target_date)
+
+    if expired or thinned:
+        logger.info("Forecast history: %d snapshots expired, %d thinned", expired, thinned)
+    return {"expired": expired, "thinned": thinned}
+
+
+def downsample(forecast_date: date) -> int:
+    """
+    Keep only the last snapshot per location in each BUCKET_HOURS window of
+    one date; returns how many were deleted.  Already-thinned dates are a
+    no-op, so re-running is safe.
+    """
+    bucket = BUCKET_HOURS * 3600
+    rows = (
+        ForecastSnapshot.objects.filter(forecast_date=forecast_date)
+        .order_by("location", "captured_at")
+        .values_list("id", "location_id", "captured_at")
+    )
+    doomed = []
+    previous = None
+    for pk, location_id, captured_at in rows.iterator(chunk_size=BATCH):
+        key = (location_id, int(captured_at.timestamp()) // bucket)
+        if previous is not None and previous[1] == key:
+            doomed.append(previous[0])
+        previous = (pk, key)
+
+    for start in range(0, len(doomed), BATCH):
+        ForecastSnapshot.objects.filter(pk__in=doomed[start:start + BATCH]).delete()
+    return len(doomed)
+
+
+def install_daily_prune():
+    """Create or reset the daily Schedule that runs retention."""
+    first_run = timezone.now().replace(hour=3, minute=30, second=0, microsecond=0) + timedelta(days=1)
+    install_daily(PRUNE_SCHEDULE, PRUNE_TASK, first_run)
@@ -2,29 +2,61 @@
 Open-Meteo weather data fetcher.
 Free API, no key required.
 Docs: https://open-meteo.com/en/docs
+
+Responses are parsed column-wise into an HourlySeries (one NumPy array per
+variable); hours are located by index arithmetic on the hourly grid and
+HourlyWeather objects are built only for the hours a caller asks for.
+
+Multi-location batches can run to tens of megabytes, so they are streamed:
+the body is split into per-location objects as it arrives (see
+apps.core.jsonstream) and each is parsed straight into its slot of one
+preallocated array, so only one location's JSON is ever held in memory.
+
+Past weather comes from the archive (reanalysis) endpoint at
+OPEN_METEO_ARCHIVE_URL through the same batch path, with historical=True.
+It has no precipitation_probability or visibility; those columns are NaN.
 """
 
 import logging
+import math
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from datetime import date
+from datetime import date, datetime, timedelta
 
 import httpx
+import numpy as np
+import orjson
+from django.conf import settings
+
+from apps.core import archive, threads
+from apps.core.jsonstream import iter_items
+from apps.core.metrics import stage, upstream_call
+from apps.core.ratelimit import acquire, retry_after_seconds, throttled
 
 logger = logging.getLogger(__name__)
 
-OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+OPEN_METEO_URL = getattr(settings, "OPEN_METEO_URL", "https://api.open-meteo.com/v1/forecast")
+OPEN_METEO_ARCHIVE_URL = getattr(settings, "OPEN_METEO_ARCHIVE_URL", "https://archive-api.open-meteo.com/v1/archive")
+STREAM_CHUNK_SIZE = 64 * 1024
+# Coordinates per multi-location request
+MAX_LOCATIONS_PER_REQUEST = 50
 
-HOURLY_VARS = [
-    "cloudcover",
-    "cloudcover_low",
-    "cloudcover_mid",
-    "cloudcover_high",
-    "relativehumidity_2m",
-    "precipitation_probability",
-    "precipitation",
-    "visibility",
-    "windspeed_10m",
-]
+# HourlySeries / HourlyWeather field → Open-Meteo hourly variable
+SERIES_COLUMNS = {
+    "cloud_cover_total": "cloudcover",
+    "cloud_cover_low": "cloudcover_low",
+    "cloud_cover_mid": "cloudcover_mid",
+    "cloud_cover_high": "cloudcover_high",
+    "relative_humidity": "relativehumidity_2m",
+    "precipitation_probability": "precipitation_probability",
+    "precipitation": "precipitation",
+    "visibility": "visibility",
+    "wind_speed": "windspeed_10m",
+}
+HOURLY_VARS = list(SERIES_COLUMNS.values())
+# Forecast-only variables; the archive endpoint rejects them
+HISTORICAL_VARS = [v for v in HOURLY_VARS if v not in ("precipitation_probability", "visibility")]
 
 
 @dataclass
@@ -47,51 +79,274 @@ def fetch_hourly_weather(
     lng: float,
     target_date: date,
     timezone: str = "UTC",
-) -> list[HourlyWeather]:
+) -> "HourlySeries":
     """
-    Fetch hourly weather for a given location and date.
-    Returns a list of HourlyWeather objects for each hour of the day.
+    Fetch hourly weather for a given location and date, as an HourlySeries
+    covering each hour of the day.
     """
-    params = {
+    data = _request({
         "latitude": lat,
         "longitude": lng,
-        "hourly": ",".join(HOURLY_VARS),
         "start_date": target_date.isoformat(),
         "end_date": target_date.isoformat(),
         "timezone": timezone,
+    })
+    with stage("weather.parse"):
+        return _parse_hourly(data)
+
+
+def fetch_hourly_weather_batch(
+    coords: list[tuple[float, float]],
+    start_date: date,
+    end_date: date,
+    timezones: list[str],
+    model: str | None = None,
+    historical: bool = False,
+) -> list["HourlySeries"]:
+    """
+    Fetch hourly weather for many (lat, lng) points over a date span in one
+    request.  Returns one HourlySeries per coordinate, in input order.
+    `model` selects a specific Open-Meteo weather model (default: best match);
+    `historical` reads past weather from the archive endpoint instead.
+    """
+    params = {
+        "latitude": ",".join(str(lat) for lat, _ in coords),
+        "longitude": ",".join(str(lng) for _, lng in coords),
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "timezone": ",".join(timezones),
+    }
+    if model:
+        params["models"] = model
+
+    # One (variable, hour) slab per location, filled as each location's
+    # object arrives; the returned series are views into it
+    n_hours = ((end_date - start_date).days + 1) * 24
+    block = np.full((len(coords), len(SERIES_COLUMNS), n_hours), np.nan)
+    starts: list[datetime | None] = [None] * len(coords)
+    lengths = [0] * len(coords)
+    with stage("weather.fetch"):
+        # A single coordinate comes back as a bare object, several as a list
+        if historical:
+            # Years of hours per location take the archive a while to assemble
+            chunks = _stream(_with_standard_params(params, HISTORICAL_VARS), OPEN_METEO_ARCHIVE_URL, timeout=120.0)
+        else:
+            chunks = _stream(_with_standard_params(params))
+        for position, raw in enumerate(iter_items(chunks)):
+            data = orjson.loads(raw)
+            i = data.get("location_id", position)
+            starts[i], lengths[i] = _fill_hourly(data, block[i])
+
+    return [
+        HourlySeries(
+            start=starts[i],
+            **{field: block[i, c, :lengths[i]] for c, field in enumerate(SERIES_COLUMNS)},
+        )
+        for i in range(len(coords))
+    ]
+
+
+def fetch_hourly_weather_ensemble(
+    coords: list[tuple[float, float]],
+    start_date: date,
+    end_date: date,
+    timezones: list[str],
+    models: list[str],
+) -> dict[str, list["HourlySeries"]]:
+    """
+    fetch_hourly_weather_batch for several weather models at once, one
+    request per model issued concurrently, so the whole fan-out takes about
+    as long as the slowest member.  Members that fail are logged and left
+    out; raises only if every member fails.
+    """
+    results: dict[str, list[HourlySeries]] = {}
+    errors = []
+    with ThreadPoolExecutor(max_workers=len(models), thread_name_prefix="open-meteo") as pool:
+        futures = {
+            model: threads.submit(pool, fetch_hourly_weather_batch, coords, start_date, end_date, timezones, model)
+            for model in models
+        }
+        for model, future in futures.items():
+            try:
+                results[model] = future.result()
+            except httpx.HTTPError as exc:
+                logger.warning("Ensemble member %s failed: %s", model, exc)
+                errors.append(exc)
+
+    if not results and errors:
+        raise errors[0]
+    return results
+
+
+def _with_standard_params(params: dict, variables: list[str] = HOURLY_VARS) -> dict:
+    """Add the standard hourly variables and units to a forecast query."""
+    return {
+        **params,
+        "hourly": ",".join(variables),
         "windspeed_unit": "kmh",
         "precipitation_unit": "mm",
     }
 
+
+def _request(params: dict):
+    """
+    GET the forecast endpoint with the standard hourly variables and units,
+    going through the upstream archive (see apps.core.archive) first.
+    """
+    params = _with_standard_params(params)
+    with stage("weather.archive_read"):
+        archived = archive.lookup("open_meteo", OPEN_METEO_URL, params)
+    if archived is not None:
+        return archived
+
+    try:
+        with stage("weather.fetch"):
+            acquire("open_meteo")
+            with upstream_call("open_meteo"):
+                resp = httpx.get(OPEN_METEO_URL, params=params, timeout=15.0)
+                resp.raise_for_status()
+    except httpx.HTTPError as exc:
+        _request_failed(exc)
+        raise
+    archive.record("open_meteo", OPEN_METEO_URL, params, resp)
+    return resp.json()
+
+
+def _stream(params: dict, url: str = OPEN_METEO_URL, timeout: float = 15.0) -> Iterator[bytes | memoryview]:
+    """
+    The response body in chunks, from the archive if it has the request,
+    otherwise streamed from the network (and recorded as it goes).
+    """
+    with archive.open_body("open_meteo", url, params) as body:
+        if body is not None:
+            for offset in range(0, len(body), STREAM_CHUNK_SIZE):
+                # Released as soon as the consumer moves on, so the mapping can close
+                with body[offset:offset + STREAM_CHUNK_SIZE] as chunk:
+                    yield chunk
+            return
+
     try:
-        resp = httpx.get(OPEN_METEO_URL, params=params, timeout=15.0)
-        resp.raise_for_status()
+        acquire("open_meteo")
+        with upstream_call("open_meteo"), httpx.stream("GET", url, params=params, timeout=timeout) as resp:
+            resp.raise_for_status()
+            recording = archive.recorder("open_meteo", url, params, resp.headers)
+            try:
+                for chunk in resp.iter_bytes(STREAM_CHUNK_SIZE):
+                    if recording is not None:
+                        recording.write(chunk)
+                    yield chunk
+            except BaseException:
+                if recording is not None:
+                    recording.discard()
+                raise
+            if recording is not None:
+                recording.commit()
     except httpx.HTTPError as exc:
-        logger.error("Open-Meteo request failed: %s", exc)
+        _request_failed(exc)
         raise
 
-    data = resp.json()
+
+def _request_failed(exc: httpx.HTTPError):
+    if isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code == 429:
+        throttled("open_meteo", retry_after_seconds(exc.response))
+    logger.error("Open-Meteo request failed: %s", exc)
+
+
+def _parse_hourly(data: dict) -> "HourlySeries":
+    """One column per hourly variable, straight into float arrays (None → NaN)."""
+    block = np.full((len(SERIES_COLUMNS), len(data.get("hourly", {}).get("time", []))), np.nan)
+    start, _ = _fill_hourly(data, block)
+    return HourlySeries(start=start, **dict(zip(SERIES_COLUMNS, block)))
+
+
+def _fill_hourly(data: dict, out: np.ndarray) -> tuple[datetime | None, int]:
+    """
+    Write each hourly variable into its row of `out` (variables × hours,
+    prefilled with NaN), None → NaN.  Returns the local start time and the
+    number of hours written.
+    """
     hourly = data.get("hourly", {})
     times = hourly.get("time", [])
+    if not times:
+        return None, 0
+    if len(times) > out.shape[1]:
+        raise ValueError(f"Open-Meteo returned {len(times)} hours, expected at most {out.shape[1]}")
 
-    results = []
-    for i, time_str in enumerate(times):
-        results.append(
-            HourlyWeather(
-                time=time_str,
-                cloud_cover_total=float(hourly["cloudcover"][i] or 0),
-                cloud_cover_low=float(hourly["cloudcover_low"][i] or 0),
-                cloud_cover_mid=float(hourly["cloudcover_mid"][i] or 0),
-                cloud_cover_high=float(hourly["cloudcover_high"][i] or 0),
-                relative_humidity=float(hourly["relativehumidity_2m"][i] or 50),
-                precipitation_probability=float(hourly["precipitation_probability"][i] or 0),
-                precipitation=float(hourly["precipitation"][i] or 0),
-                visibility=float(hourly["visibility"][i]) if hourly["visibility"][i] is not None else None,
-                wind_speed=float(hourly["windspeed_10m"][i]) if hourly["windspeed_10m"][i] is not None else None,
-            )
+    for row, var in zip(out, SERIES_COLUMNS.values()):
+        values = hourly.get(var)
+        if values:
+            column = np.array(values[:len(row)], dtype=float)
+            row[:len(column)] = column
+
+    start = datetime.fromisoformat(times[0])
+    # Open-Meteo applies one utc_offset to the whole response, so the grid is
+    # regular; check the last stamp rather than trusting it blindly
+    if datetime.fromisoformat(times[-1]) != start + timedelta(hours=len(times) - 1):
+        raise ValueError(f"Open-Meteo hourly times are not contiguous: {times[0]} … {times[-1]} ({len(times)})")
+    return start, len(times)
+
+
+@dataclass
+class HourlySeries:
+    """
+    Struct-of-arrays hourly weather for one location: a float array per
+    variable on a contiguous hourly grid starting at `start` (local time).
+    Missing values are NaN.  HourlyWeather objects are only built, via
+    at(), for the hours actually used.
+    """
+    start: datetime | None
+    cloud_cover_total: np.ndarray
+    cloud_cover_low: np.ndarray
+    cloud_cover_mid: np.ndarray
+    cloud_cover_high: np.ndarray
+    relative_humidity: np.ndarray
+    precipitation_probability: np.ndarray
+    precipitation: np.ndarray
+    visibility: np.ndarray
+    wind_speed: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.cloud_cover_total)
+
+    def index_of(self, target_date: date, hour: int) -> int | None:
+        """
+        Index of the hour on target_date nearest to `hour`, by arithmetic on
+        the grid; None if the series doesn't cover that date.
+        """
+        if self.start is None:
+            return None
+        day_start = (target_date - self.start.date()).days * 24 - self.start.hour
+        first = max(day_start, 0)
+        last = min(day_start + 23, len(self) - 1)
+        if first > last:
+            return None
+        return min(max(day_start + hour, first), last)
+
+    def at(self, i: int) -> HourlyWeather:
+        """The HourlyWeather for index i, with the usual defaults for missing values."""
+        def value(column, default):
+            v = float(column[i])
+            return default if math.isnan(v) else v
+
+        return HourlyWeather(
+            time=(self.start + timedelta(hours=i)).isoformat(timespec="minutes"),
+            cloud_cover_total=value(self.cloud_cover_total, 0.0),
+            cloud_cover_low=value(self.cloud_cover_low, 0.0),
+            cloud_cover_mid=value(self.cloud_cover_mid, 0.0),
+            cloud_cover_high=value(self.cloud_cover_high, 0.0),
+            # A reported 0% humidity is treated as missing too, as it always has been
+            relative_humidity=value(self.relative_humidity, 50.0) or 50.0,
+            precipitation_probability=value(self.precipitation_probability, 0.0),
+            precipitation=value(self.precipitation, 0.0),
+            visibility=value(self.visibility, None),
+            wind_speed=value(self.wind_speed, None),
         )
 
-    return results
+
+def closest_to_hour(series: HourlySeries, target_date: date, hour: int) -> HourlyWeather | None:
+    """Return the entry on target_date whose local hour is nearest to `hour`."""
+    i = series.index_of(target_date, hour)
+    return series.at(i) if i is not None else None
 
 
 def get_weather_at_sunset(
@@ -103,11 +358,8 @@ def get_weather_at_sunset(
 ) -> HourlyWeather | None:
     """Return the HourlyWeather closest to the sunset hour."""
     hourly = fetch_hourly_weather(lat, lng, target_date, timezone)
-    if not hourly:
+    if not len(hourly):
         return None
 
-    # Find the entry closest to the sunset hour
-    def hour_of(hw: HourlyWeather) -> int:
-        return int(hw.time.split("T")[1].split(":")[0])
-
-    return min(hourly, key=lambda hw: abs(hour_of(hw) - sunset_hour))
+    with stage("weather.select_hour"):
+        return closest_to_hour(hourly, target_date, sunset_hour)
@@ -20,6 +20,12 @@ Score → label: 0–20 poor, 21–45 fair, 46–65 good, 66–85 great, 86–10
 import math
 from dataclasses import dataclass
 
+import numpy as np
+
+
+# Bump whenever scoring changes so cached responses (ETags) are invalidated
+SCORER_VERSION = "2"
+
 
 @dataclass
 class ScoreBreakdown:
@@ -195,3 +201,79 @@ def compute_quality_score(
         wind_score=round(sub_scores["wind"] * 100, 1),
         horizon_score=round(sub_scores["horizon"] * 100, 1),
     )
+
+
+def compute_quality_scores(
+    cloud_low: np.ndarray,
+    cloud_mid: np.ndarray,
+    cloud_high: np.ndarray,
+    precipitation: np.ndarray,
+    precipitation_probability: np.ndarray,
+    relative_humidity: np.ndarray,
+    visibility: np.ndarray,
+    wind_speed: np.ndarray,
+    horizon_elevation_west: np.ndarray | float = 0.0,
+) -> np.ndarray:
+    """
+    Vectorized compute_quality_score: element-wise totals (0–100) for arrays
+    of conditions.  Missing visibility / wind are NaN.  Mirrors the scalar
+    sub-scores branch for branch, so totals agree with compute_quality_score.
+    """
+    low = np.asarray(cloud_low, dtype=float)
+    mid = np.asarray(cloud_mid, dtype=float)
+    high = np.asarray(cloud_high, dtype=float)
+    mm = np.asarray(precipitation, dtype=float)
+    prob = np.asarray(precipitation_probability, dtype=float)
+    rh = np.asarray(relative_humidity, dtype=float)
+    vis = np.asarray(visibility, dtype=float)
+    wind = np.asarray(wind_speed, dtype=float)
+    horizon = np.broadcast_to(np.asarray(horizon_elevation_west, dtype=float), low.shape)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        low_score = np.maximum(0.0, 1.0 - (low / 10.0) ** 1.5)
+        mid_score = np.select([mid <= 20, mid <= 50, mid <= 80], [mid / 20.0, 1.0, 1.0 - (mid - 50) / 30.0], 0.1)
+        high_score = np.select([high <= 15, high <= 60, high <= 90], [high / 15.0, 1.0, 1.0 - (high - 60) / 30.0], 0.05)
+        cloud = np.where(low >= 90, 0.0, low_score * 0.5 + mid_score * 0.3 + high_score * 0.2)
+
+        wet = (mm > 0.2) | (prob > 40)
+        penalty = np.maximum(mm / 5.0, prob / 100.0)
+        precip = np.where(
+            wet,
+            np.maximum(0.0, 1.0 - penalty ** 0.5),
+            np.maximum(0.0, 1.0 - (prob / 100.0) * 0.5),
+        )
+
+        humidity = np.select(
+            [(rh >= 30) & (rh <= 55), rh < 30, rh <= 70, rh <= 85],
+            [1.0, 0.85 + (rh / 30.0) * 0.15, 1.0 - (rh - 55) / 15.0 * 0.3, 0.7 - (rh - 70) / 15.0 * 0.5],
+            np.maximum(0.0, 0.2 - (rh - 85) / 15.0 * 0.2),
+        )
+
+        visibility_s = np.select(
+            [np.isnan(vis), vis >= 20, vis >= 10, vis >= 2],
+            [0.75, 1.0, 0.75 + (vis - 10) / 10.0 * 0.25, (vis - 2) / 8.0 * 0.75],
+            0.0,
+        )
+
+        wind_s = np.select(
+            [np.isnan(wind), wind <= 20, wind <= 40],
+            [0.75, 0.7 + (wind / 20.0) * 0.3, 1.0 - (wind - 20) / 20.0 * 0.3],
+            np.maximum(0.3, 0.7 - (wind - 40) / 40.0),
+        )
+
+        horizon_s = np.select(
+            [horizon <= 0, horizon <= 5, horizon <= 15],
+            [1.0, 1.0 - horizon / 5.0 * 0.3, 0.7 - (horizon - 5) / 10.0 * 0.5],
+            np.maximum(0.0, 0.2 - (horizon - 15) / 10.0 * 0.2),
+        )
+
+    sub_scores = {
+        "cloud": cloud,
+        "precipitation": precip,
+        "humidity": humidity,
+        "visibility": visibility_s,
+        "wind": wind_s,
+        "horizon": horizon_s,
+    }
+    log_sum = sum(WEIGHTS[k] * np.log(np.maximum(s, 1e-9)) for k, s in sub_scores.items())
+    return np.round(np.exp(log_sum) * 100, 1)
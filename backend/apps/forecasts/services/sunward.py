@@ -0,0 +1,139 @@
+"""
+Direction-aware cloud sampling along the sunset azimuth.
+
+Sunset colour depends on the sky toward the sun, not just overhead: low
+cloud on the western horizon cuts the light off before it reaches the
+clouds above the observer.  So besides the observer's own grid point, each
+forecast samples the cloud layers at FORECAST_SUNWARD["distances_km"] out
+along the sunset azimuth, at the sunset hour.
+
+Sample points are snapped to geohash cells of "cell_precision" (about
+5 km at 5 characters, near the weather-model grid), and each cell's hourly
+cloud layers for a UTC date are cached until the next model run, so
+neighbouring observers share their samples.  The cells a batch still needs
+are fetched in multi-coordinate requests of up to MAX_LOCATIONS_PER_REQUEST;
+when all are cached there is no request at all.
+
+Each sample is scored as the observer's conditions under that point's
+cloud layers, and the forecast score blends the observer's own score with
+its samples' by "weights" (observer first), renormalized over the samples
+that have data.
+"""
+
+import math
+from dataclasses import replace
+from datetime import date, datetime
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from apps.core.metrics import cache_result
+from apps.locations.services import geohash
+from ..models import next_model_run
+from .astro import SunTimes
+from .open_meteo import MAX_LOCATIONS_PER_REQUEST, HourlyWeather, fetch_hourly_weather_batch
+
+SUNWARD = getattr(settings, "FORECAST_SUNWARD", {})
+DISTANCES_KM = SUNWARD.get("distances_km", [25, 50, 100])
+WEIGHTS = SUNWARD.get("weights", [0.4, 0.25, 0.2, 0.15])
+CELL_PRECISION = SUNWARD.get("cell_precision", 5)
+ENABLED = bool(DISTANCES_KM)
+
+if ENABLED and len(WEIGHTS) != len(DISTANCES_KM) + 1:
+    raise ValueError("FORECAST_SUNWARD needs one weight for the observer plus one per distance")
+
+CLOUD_FIELDS = ["cloud_cover_total", "cloud_cover_low", "cloud_cover_mid", "cloud_cover_high"]
+EARTH_RADIUS_KM = 6371.0
+
+
+def destination(lat: float, lng: float, bearing: float, km: float) -> tuple[float, float]:
+    """The point `km` from (lat, lng) along the great circle at `bearing` degrees."""
+    phi, lam, theta = math.radians(lat), math.radians(lng), math.radians(bearing)
+    delta = km / EARTH_RADIUS_KM
+    phi2 = math.asin(math.sin(phi) * math.cos(delta) + math.cos(phi) * math.sin(delta) * math.cos(theta))
+    lam2 = lam + math.atan2(
+        math.sin(theta) * math.sin(delta) * math.cos(phi), math.cos(delta) - math.sin(phi) * math.sin(phi2)
+    )
+    return math.degrees(phi2), (math.degrees(lam2) + 540) % 360 - 180
+
+
+def sample_cells(lat: float, lng: float, azimuth: float) -> list[str]:
+    """The geohash cell of each sample point, nearest first."""
+    return [geohash.encode(*destination(lat, lng, azimuth, km), CELL_PRECISION) for km in DISTANCES_KM]
+
+
+def sample(points: dict[tuple, tuple[float, float, SunTimes]]) -> dict[tuple, list[np.ndarray | None]]:
+    """
+    Cloud layers (CLOUD_FIELDS) at each sample point at sunset, for every
+    (lat, lng, sun times) in `points`; None where a point has no data.
+    Keys are passed through.
+    """
+    cells = {key: sample_cells(lat, lng, st.sunset_azimuth) for key, (lat, lng, st) in points.items()}
+    layers = _cloud_layers(
+        {cell for row in cells.values() for cell in row},
+        sorted({st.sunset_utc.date() for _, _, st in points.values()}),
+    )
+    return {
+        key: [_clouds_at(layers, cell, points[key][2].sunset_utc) for cell in row]
+        for key, row in cells.items()
+    }
+
+
+def under(weather: HourlyWeather, clouds: np.ndarray) -> HourlyWeather:
+    """The observer's conditions with a sample point's cloud layers."""
+    return replace(weather, **{field: float(value) for field, value in zip(CLOUD_FIELDS, clouds)})
+
+
+def _cache_key(cell: str, day: date) -> str:
+    return f"forecast.sunward:{cell}:{day.isoformat()}"
+
+
+def _cloud_layers(cells: set[str], days: list[date]) -> dict[tuple[str, date], np.ndarray]:
+    """(cell, UTC date) → CLOUD_FIELDS × 24 UTC hours, from the cache or batched requests for the rest."""
+    if not cells or not days:
+        return {}
+    keys = {_cache_key(cell, day): (cell, day) for cell in cells for day in days}
+    layers = {keys[k]: v for k, v in cache.get_many(list(keys)).items()}
+    for key in keys.values():
+        cache_result("sunward", "hit" if key in layers else "miss")
+    missing = sorted({cell for cell, day in keys.values() if (cell, day) not in layers})
+    if not missing:
+        return layers
+
+    series = []
+    for start in range(0, len(missing), MAX_LOCATIONS_PER_REQUEST):
+        batch = missing[start:start + MAX_LOCATIONS_PER_REQUEST]
+        series.extend(
+            fetch_hourly_weather_batch([geohash.decode(cell) for cell in batch], days[0], days[-1], ["GMT"] * len(batch))
+        )
+    fetched = {}
+    for cell, s in zip(missing, series):
+        if s.start is None:
+            continue
+        for day in days:
+            start = (day - s.start.date()).days * 24
+            block = np.full((len(CLOUD_FIELDS), 24), np.nan, dtype=np.float32)
+            for row, field in zip(block, CLOUD_FIELDS):
+                column = getattr(s, field)[start:start + 24]
+                row[:len(column)] = column
+            fetched[(cell, day)] = block
+
+    # Until the next model run, which may move them
+    now = timezone.now()
+    cache.set_many(
+        {_cache_key(cell, day): block for (cell, day), block in fetched.items()},
+        timeout=max(60, int((next_model_run(now) - now).total_seconds())),
+    )
+    layers.update(fetched)
+    return layers
+
+
+def _clouds_at(layers: dict, cell: str, instant: datetime) -> np.ndarray | None:
+    """A cell's cloud layers at the hour containing `instant` (UTC), as the observer's hour is picked."""
+    block = layers.get((cell, instant.date()))
+    if block is None:
+        return None
+    clouds = block[:, instant.hour]
+    return None if np.isnan(clouds).any() else clouds
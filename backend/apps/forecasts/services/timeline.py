@@ -0,0 +1,156 @@
+"""
+Full-evening timelines: the score minute by minute from the start of
+golden hour to civil dusk, rather than only at the hour nearest sunset.
+
+The hourly series already fetched for a forecast is interpolated linearly
+onto STEP_MINUTES steps across the window, and every step of every
+(location, date), member and sunward sample is scored in one vectorized
+call, blended as the forecast itself is (see builder.score_pending).  The
+sunward samples stay at their sunset-hour clouds across the window.
+Steps outside the fetched series are missing (None).
+
+Every forecast build scores its timeline too, and the curve is stored on
+the SunsetForecast row (see Timeline.stored), so a fresh forecast's
+timeline is served whichever process or path built it.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.conf import settings
+
+from . import sunward
+from .astro import SunTimes
+from .open_meteo import SERIES_COLUMNS, HourlySeries
+from .scorer import compute_quality_scores
+
+STEP_MINUTES = getattr(settings, "FORECAST_TIMELINE_STEP_MINUTES", 1)
+
+# Filled in for missing hours as HourlySeries.at() does; visibility and
+# wind stay NaN, which the scorer treats as unknown
+DEFAULTS = {
+    "cloud_cover_total": 0.0,
+    "cloud_cover_low": 0.0,
+    "cloud_cover_mid": 0.0,
+    "cloud_cover_high": 0.0,
+    "relative_humidity": 50.0,
+    "precipitation_probability": 0.0,
+    "precipitation": 0.0,
+}
+
+
+@dataclass
+class Timeline:
+    start_utc: datetime
+    step_minutes: int
+    scores: list[float | None]  # one per step from start_utc
+    peak_utc: datetime | None
+    peak_score: float | None
+
+    def payload(self) -> dict:
+        return {
+            "start_utc": self.start_utc.isoformat(),
+            "step_minutes": self.step_minutes,
+            "scores": self.scores,
+            "peak_utc": self.peak_utc.isoformat() if self.peak_utc else None,
+            "peak_score": self.peak_score,
+        }
+
+    def stored(self) -> dict:
+        """The SunsetForecast.timeline value; the row's golden_hour_start_utc is the start."""
+        return {"step_minutes": self.step_minutes, "scores": self.scores}
+
+    @classmethod
+    def from_stored(cls, start_utc: datetime, stored: dict) -> "Timeline":
+        curve = np.array([np.nan if s is None else s for s in stored["scores"]], dtype=float)
+        return _timeline(start_utc, stored["step_minutes"], curve)
+
+
+def conditions(series: HourlySeries, utc_offset: float, sun_times: SunTimes) -> dict[str, np.ndarray]:
+    """
+    Every SERIES_COLUMNS variable linearly interpolated onto the window's
+    steps; NaN outside the series.  `utc_offset` is the hours the series'
+    local times are ahead of UTC.
+    """
+    n_steps = int((sun_times.civil_dusk_utc - sun_times.golden_hour_start_utc) / timedelta(minutes=STEP_MINUTES)) + 1
+    if series.start is None:
+        return {column: np.full(n_steps, np.nan) for column in SERIES_COLUMNS}
+
+    local_start = (sun_times.golden_hour_start_utc + timedelta(hours=utc_offset)).replace(tzinfo=None)
+    first = (local_start - series.start) / timedelta(hours=1)
+    positions = first + np.arange(n_steps) * STEP_MINUTES / 60
+    outside = (positions < 0) | (positions > len(series) - 1)
+    hours = np.arange(len(series))
+
+    interpolated = {}
+    for column in SERIES_COLUMNS:
+        values = getattr(series, column)
+        if column in DEFAULTS:
+            values = np.nan_to_num(values, nan=DEFAULTS[column])
+        if column == "relative_humidity":
+            # A reported 0% counts as missing, as in HourlySeries.at()
+            values = np.where(values == 0, DEFAULTS[column], values)
+        interpolated[column] = np.where(outside, np.nan, np.interp(positions, hours, values))
+    return interpolated
+
+
+def score_timelines(pending: list[tuple]) -> list[Timeline]:
+    """
+    Timelines for each pending (sun times, horizon, members' conditions,
+    sunward clouds), all scored in one vectorized call.  Members' scores are
+    blended with their sunward samples' by sunward.WEIGHTS and, with more
+    than one member, the timeline is their median per step.
+    """
+    blocks, shapes = [], []
+    for sun_times, horizon, members, clouds in pending:
+        present = [(weight, c) for weight, c in zip(sunward.WEIGHTS[1:], clouds) if c is not None]
+        w = np.array([sunward.WEIGHTS[0]] + [weight for weight, _ in present])
+        for member in members:
+            member = {**member, "horizon": np.full(len(member["cloud_cover_low"]), horizon)}
+            blocks.append(member)
+            for _, c in present:
+                # Sample clouds only where the observer's own steps have data
+                missing = np.isnan(member["cloud_cover_low"])
+                blocks.append({
+                    **member,
+                    **{field: np.where(missing, np.nan, value) for field, value in zip(sunward.CLOUD_FIELDS, c)},
+                })
+        shapes.append((len(members), w / w.sum()))
+
+    def column(name: str) -> np.ndarray:
+        return np.concatenate([b[name] for b in blocks]) if blocks else np.empty(0)
+
+    scores = compute_quality_scores(
+        cloud_low=column("cloud_cover_low"),
+        cloud_mid=column("cloud_cover_mid"),
+        cloud_high=column("cloud_cover_high"),
+        precipitation=column("precipitation"),
+        precipitation_probability=column("precipitation_probability"),
+        relative_humidity=column("relative_humidity"),
+        visibility=column("visibility"),
+        wind_speed=column("wind_speed"),
+        horizon_elevation_west=column("horizon"),
+    )
+    # Steps the series didn't cover score as missing, not as clear sky
+    scores = np.where(np.isnan(column("cloud_cover_low")), np.nan, scores)
+
+    timelines, offset = [], 0
+    for (sun_times, _, members, _), (n_members, w) in zip(pending, shapes):
+        n_steps = len(members[0]["cloud_cover_low"])
+        block = scores[offset:offset + n_members * len(w) * n_steps].reshape(n_members, len(w), n_steps)
+        offset += block.size
+        curve = np.round(np.median(np.einsum("msn,s->mn", block, w), axis=0), 1)
+        timelines.append(_timeline(sun_times.golden_hour_start_utc, STEP_MINUTES, curve))
+    return timelines
+
+
+def _timeline(start_utc: datetime, step_minutes: int, curve: np.ndarray) -> Timeline:
+    peak = None if np.isnan(curve).all() else int(np.nanargmax(curve))
+    return Timeline(
+        start_utc=start_utc,
+        step_minutes=step_minutes,
+        scores=[None if np.isnan(s) else float(s) for s in curve],
+        peak_utc=None if peak is None else start_utc + timedelta(minutes=peak * step_minutes),
+        peak_score=None if peak is None else float(curve[peak]),
+    )
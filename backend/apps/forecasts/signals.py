@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent by save_forecasts with swings=[(forecast, previous_score), ...] for
+# refreshed forecasts whose score moved by FORECAST_SCORE_SWING or more
+forecast_score_swung = Signal()
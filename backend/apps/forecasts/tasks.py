@@ -0,0 +1,21 @@
+"""
+Background forecast work, queued through apps.core.tasks.enqueue.  Arguments
+are plain literals (ids, ISO dates) so failed runs can be retried.
+"""
+
+from datetime import date
+
+from apps.locations.models import Location
+from .services import demand, history
+from .services.builder import build_forecasts
+
+
+def refresh_forecasts(location_ids: list[int], dates: list[str]) -> int:
+    """Rebuild forecasts for the given locations and ISO dates; returns how many were written."""
+    locations = list(Location.objects.filter(pk__in=location_ids))
+    return len(build_forecasts(locations, [date.fromisoformat(d) for d in dates]))
+
+
+def prune_forecast_history() -> dict[str, int]:
+    """Downsample and expire old forecast snapshots and drop old request counts; run daily."""
+    return {**history.prune(), "demand": demand.prune()}
@@ -0,0 +1,324 @@
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+import httpx
+import numpy as np
+from django.core.cache import cache
+from django.test import TestCase
+
+from apps.locations.models import Location
+from .management.commands.warm_forecasts import rank_locations
+from .models import ForecastSnapshot, LocationDemand, SunsetForecast, forecast_expires_at, next_model_run
+from .services import backtest, demand, sunward
+from .services.builder import _differs, build_forecasts, save_forecasts
+from .services.open_meteo import SERIES_COLUMNS, HourlySeries
+from .services.timeline import Timeline
+from .signals import forecast_score_swung
+
+FORECAST_DATE = date(2026, 6, 21)
+
+
+def make_forecast(location: Location, forecast_date: date = FORECAST_DATE, **fields) -> SunsetForecast:
+    """An unsaved forecast, as build_forecasts produces them."""
+    values = {
+        "sunset_time_utc": datetime(2026, 6, 21, 20, 30, tzinfo=dt_timezone.utc),
+        "golden_hour_start_utc": datetime(2026, 6, 21, 19, 45, tzinfo=dt_timezone.utc),
+        "cloud_cover_total": 40.0,
+        "cloud_cover_low": 10.0,
+        "cloud_cover_mid": 30.0,
+        "cloud_cover_high": 50.0,
+        "relative_humidity": 60.0,
+        "precipitation_probability": 5.0,
+        "precipitation": 0.0,
+        "visibility": 20.0,
+        "wind_speed": 10.0,
+        "quality_score": 62.0,
+        "quality_label": "good",
+        **fields,
+    }
+    return SunsetForecast(location=location, forecast_date=forecast_date, **values)
+
+
+def utc(day: int, hour: int, minute: int = 0, second: int = 0) -> datetime:
+    return datetime(2026, 6, day, hour, minute, second, tzinfo=dt_timezone.utc)
+
+
+@mock.patch("apps.forecasts.models.MODEL_CYCLE", timedelta(hours=6))
+@mock.patch("apps.forecasts.models.RUN_AVAILABLE_AFTER", timedelta(minutes=270))
+@mock.patch("apps.forecasts.models.RUNS_KEPT", [1, 1, 2, 2, 4])
+class ExpiryTests(TestCase):
+    def test_next_model_run(self):
+        # Runs start at 00, 06, 12 and 18 UTC and are out 4½ hours later
+        self.assertEqual(next_model_run(utc(21, 10)), utc(21, 10, 30))
+        self.assertEqual(next_model_run(utc(21, 10, 29, 59)), utc(21, 10, 30))
+        self.assertEqual(next_model_run(utc(21, 10, 30)), utc(21, 16, 30))
+        self.assertEqual(next_model_run(utc(21, 23)), utc(22, 4, 30))
+
+    def test_next_model_run_of_local_time(self):
+        after = datetime(2026, 6, 21, 12, 0, tzinfo=dt_timezone(timedelta(hours=2)))
+        self.assertEqual(next_model_run(after), utc(21, 10, 30))
+
+    def test_later_dates_are_kept_across_more_runs(self):
+        fetched = utc(21, 10)
+        expiries = [forecast_expires_at(fetched, FORECAST_DATE + timedelta(days=lead)) for lead in range(7)]
+        self.assertEqual(
+            expiries,
+            [utc(21, 10, 30), utc(21, 10, 30), utc(21, 16, 30), utc(21, 16, 30)] + [utc(22, 4, 30)] * 3,
+        )
+
+    def test_past_dates_use_the_longest_keep(self):
+        self.assertEqual(forecast_expires_at(utc(21, 10), FORECAST_DATE - timedelta(days=1)), utc(22, 4, 30))
+
+    def test_lead_days_count_in_utc(self):
+        # Still the 20th locally, already the 21st in UTC: a same-day forecast
+        fetched = datetime(2026, 6, 20, 23, 0, tzinfo=dt_timezone(timedelta(hours=-5)))
+        self.assertEqual(forecast_expires_at(fetched, FORECAST_DATE), utc(21, 4, 30))
+
+    def test_is_fresh_until_expiry(self):
+        forecast = make_forecast(None, fetched_at=utc(21, 10))
+        self.assertTrue(forecast.is_fresh(utc(21, 10, 30)))
+        self.assertFalse(forecast.is_fresh(utc(21, 10, 30, 1)))
+
+
+class DiffersTests(TestCase):
+    def setUp(self):
+        self.location, _ = Location.objects.get_or_create_for_point(51.5, -0.12)
+
+    @mock.patch("apps.forecasts.services.builder.CHANGE_THRESHOLDS", {"cloud_cover_low": 5.0})
+    def test_within_threshold_is_unchanged(self):
+        previous = make_forecast(self.location)
+        self.assertFalse(_differs(previous, make_forecast(self.location, cloud_cover_low=15.0)))
+        self.assertFalse(_differs(previous, make_forecast(self.location, cloud_cover_low=5.0)))
+
+    @mock.patch("apps.forecasts.services.builder.CHANGE_THRESHOLDS", {"cloud_cover_low": 5.0})
+    def test_beyond_threshold_differs(self):
+        previous = make_forecast(self.location)
+        self.assertTrue(_differs(previous, make_forecast(self.location, cloud_cover_low=15.5)))
+
+    @mock.patch("apps.forecasts.services.builder.CHANGE_THRESHOLDS", {"cloud_cover_low": 5.0})
+    def test_fields_without_threshold_must_match(self):
+        previous = make_forecast(self.location)
+        self.assertTrue(_differs(previous, make_forecast(self.location, cloud_cover_mid=30.1)))
+        self.assertTrue(_differs(previous, make_forecast(self.location, quality_label="great")))
+
+    @mock.patch("apps.forecasts.services.builder.CHANGE_THRESHOLDS", {"visibility": 5.0})
+    def test_value_appearing_or_vanishing_differs(self):
+        previous = make_forecast(self.location)
+        self.assertTrue(_differs(previous, make_forecast(self.location, visibility=None)))
+        self.assertTrue(_differs(make_forecast(self.location, visibility=None), previous))
+
+    def test_fetched_at_is_ignored(self):
+        previous = make_forecast(self.location, fetched_at=datetime(2026, 6, 20, tzinfo=dt_timezone.utc))
+        self.assertFalse(_differs(previous, make_forecast(self.location, fetched_at=None)))
+
+
+@mock.patch("apps.forecasts.services.builder.CHANGE_THRESHOLDS", {"cloud_cover_low": 5.0, "quality_score": 2.0})
+class SaveForecastsTests(TestCase):
+    def setUp(self):
+        self.location, _ = Location.objects.get_or_create_for_point(51.5, -0.12)
+        [self.first] = save_forecasts([make_forecast(self.location)])
+
+    def test_creates_row_and_snapshot(self):
+        self.assertIsNotNone(self.first.pk)
+        self.assertEqual(SunsetForecast.objects.count(), 1)
+        self.assertEqual(ForecastSnapshot.objects.count(), 1)
+
+    def test_unchanged_refresh_only_bumps_fetched_at(self):
+        fetched_at = SunsetForecast.objects.get().fetched_at
+        [stored] = save_forecasts([make_forecast(self.location, cloud_cover_low=13.0, quality_score=63.0)])
+
+        row = SunsetForecast.objects.get()
+        self.assertEqual(stored.pk, self.first.pk)
+        self.assertGreater(row.fetched_at, fetched_at)
+        self.assertEqual(stored.fetched_at, row.fetched_at)
+        # The stored values stand; the near-identical refresh is not written
+        self.assertEqual(row.cloud_cover_low, 10.0)
+        self.assertEqual(row.quality_score, 62.0)
+        self.assertEqual(ForecastSnapshot.objects.count(), 1)
+
+    def test_changed_refresh_updates_in_place(self):
+        [stored] = save_forecasts([make_forecast(self.location, cloud_cover_low=40.0, quality_score=55.0)])
+
+        row = SunsetForecast.objects.get()
+        self.assertEqual(stored.pk, self.first.pk)
+        self.assertEqual(row.pk, self.first.pk)
+        self.assertEqual(row.cloud_cover_low, 40.0)
+        self.assertEqual(row.quality_score, 55.0)
+        self.assertEqual(ForecastSnapshot.objects.count(), 2)
+
+    def test_unchanged_refresh_fills_in_missing_timeline(self):
+        evening = {"step_minutes": 1, "scores": [40.0, 55.5, None]}
+        [stored] = save_forecasts([make_forecast(self.location, cloud_cover_low=12.0, timeline=evening)])
+
+        row = SunsetForecast.objects.get()
+        self.assertEqual(stored.pk, self.first.pk)
+        self.assertEqual(row.timeline, evening)
+        self.assertEqual(row.cloud_cover_low, 10.0)
+        self.assertEqual(ForecastSnapshot.objects.count(), 1)
+
+    def test_unchanged_refresh_keeps_stored_timeline(self):
+        evening = {"step_minutes": 1, "scores": [40.0, 55.5, None]}
+        save_forecasts([make_forecast(self.location, cloud_cover_low=40.0, timeline=evening)])
+        refreshed = make_forecast(self.location, cloud_cover_low=41.0, timeline={"step_minutes": 1, "scores": []})
+        save_forecasts([refreshed])
+        self.assertEqual(SunsetForecast.objects.get().timeline, evening)
+
+    def test_ids_survive_repeated_refreshes(self):
+        for cloud_low in (40.0, 41.0, 80.0, 10.0):
+            [stored] = save_forecasts([make_forecast(self.location, cloud_cover_low=cloud_low)])
+            self.assertEqual(stored.pk, self.first.pk)
+        self.assertEqual(SunsetForecast.objects.get().pk, self.first.pk)
+
+    def test_score_swing_is_signalled(self):
+        receiver = mock.Mock()
+        forecast_score_swung.connect(receiver)
+        self.addCleanup(forecast_score_swung.disconnect, receiver)
+
+        save_forecasts([make_forecast(self.location, quality_score=70.0)])
+        receiver.assert_not_called()
+
+        [stored] = save_forecasts([make_forecast(self.location, quality_score=90.0)])
+        receiver.assert_called_once()
+        self.assertEqual(receiver.call_args.kwargs["swings"], [(stored, 70.0)])
+
+    def test_mixed_batch_returns_rows_in_order(self):
+        other, _ = Location.objects.get_or_create_for_point(48.85, 2.35)
+        forecasts = [
+            make_forecast(other),
+            make_forecast(self.location, cloud_cover_low=11.0),
+            make_forecast(other, forecast_date=FORECAST_DATE + timedelta(days=1)),
+        ]
+        stored = save_forecasts(forecasts)
+
+        self.assertEqual([(f.location_id, f.forecast_date) for f in stored], [
+            (other.pk, FORECAST_DATE),
+            (self.location.pk, FORECAST_DATE),
+            (other.pk, FORECAST_DATE + timedelta(days=1)),
+        ])
+        self.assertEqual(stored[1].pk, self.first.pk)
+        self.assertEqual(SunsetForecast.objects.count(), 3)
+
+
+class TimelineTests(TestCase):
+    def test_from_stored_finds_peak(self):
+        start = datetime(2026, 6, 21, 19, 45, tzinfo=dt_timezone.utc)
+        evening = Timeline.from_stored(start, {"step_minutes": 2, "scores": [None, 40.0, 71.5, 60.0, None]})
+        self.assertEqual(evening.peak_utc, start + timedelta(minutes=4))
+        self.assertEqual(evening.peak_score, 71.5)
+        self.assertEqual(evening.stored(), {"step_minutes": 2, "scores": [None, 40.0, 71.5, 60.0, None]})
+
+    def test_from_stored_without_scores_has_no_peak(self):
+        start = datetime(2026, 6, 21, 19, 45, tzinfo=dt_timezone.utc)
+        evening = Timeline.from_stored(start, {"step_minutes": 1, "scores": [None, None]})
+        self.assertIsNone(evening.peak_utc)
+        self.assertIsNone(evening.peak_score)
+
+
+def make_series(start: date, days: int = 1, cloud_low: float = 10.0) -> HourlySeries:
+    """A flat HourlySeries of `days` whole days from local midnight on `start`."""
+    values = {field: np.full(days * 24, 20.0) for field in SERIES_COLUMNS}
+    values["cloud_cover_low"] = np.full(days * 24, cloud_low)
+    return HourlySeries(start=datetime(start.year, start.month, start.day), **values)
+
+
+@mock.patch("apps.forecasts.services.builder.ENSEMBLE_MODELS", [])
+class SunwardTests(TestCase):
+    def setUp(self):
+        self.location, _ = Location.objects.get_or_create_for_point(51.5, -0.12)
+        cache.clear()
+
+    @mock.patch("apps.forecasts.services.sunward.sample", side_effect=httpx.ConnectError("unreachable"))
+    @mock.patch("apps.forecasts.services.builder.fetch_hourly_weather_batch")
+    def test_failed_sampling_scores_observer_alone(self, fetch, sample):
+        fetch.side_effect = lambda coords, start, end, timezones: [make_series(start)] * len(coords)
+        with self.assertLogs("apps.forecasts.services.builder", "WARNING"):
+            [forecast] = build_forecasts([self.location], [FORECAST_DATE])
+        self.assertIsNotNone(forecast.pk)
+        self.assertIsNotNone(forecast.timeline)
+
+    @mock.patch("apps.forecasts.services.sunward.fetch_hourly_weather_batch")
+    def test_uncached_cells_are_fetched_in_batches(self, fetch):
+        fetch.side_effect = lambda coords, start, end, timezones: [make_series(start)] * len(coords)
+        cells = {f"gcpv{a}{b}" for a in "0123456789bc" for b in "0123456789"}
+        layers = sunward._cloud_layers(cells, [FORECAST_DATE])
+        self.assertEqual([len(call.args[0]) for call in fetch.call_args_list], [50, 50, 20])
+        self.assertEqual(len(layers), 120)
+
+
+
+@mock.patch("apps.forecasts.services.builder.ENSEMBLE_MODELS", ["covering", "stale"])
+@mock.patch("apps.forecasts.services.sunward.ENABLED", False)
+class EnsembleTimelineTests(TestCase):
+    def setUp(self):
+        self.location, _ = Location.objects.get_or_create_for_point(51.5, -0.12)
+
+    @mock.patch("apps.forecasts.services.builder.fetch_hourly_weather_ensemble")
+    def test_timeline_leaves_out_members_missing_the_date(self, fetch):
+        fetch.side_effect = lambda coords, start, end, timezones, models: {
+            "covering": [make_series(start)] * len(coords),
+            "stale": [make_series(start - timedelta(days=3))] * len(coords),
+        }
+        [forecast] = build_forecasts([self.location], [FORECAST_DATE])
+        self.assertTrue(all(score is not None for score in forecast.timeline["scores"]))
+
+@mock.patch("apps.forecasts.services.demand.FLUSH_SECONDS", 3600)
+class DemandTests(TestCase):
+    def setUp(self):
+        demand.flush()
+        self.location, _ = Location.objects.get_or_create_for_point(51.5, -0.12)
+        self.other, _ = Location.objects.get_or_create_for_point(48.85, 2.35)
+
+    def test_buffered_requests_are_added_on_flush(self):
+        for _ in range(3):
+            demand.record(self.location.pk)
+        self.assertFalse(LocationDemand.objects.exists())
+
+        demand.flush()
+        demand.record(self.location.pk)
+        demand.record(self.other.pk)
+        demand.flush()
+        self.assertEqual(
+            dict(LocationDemand.objects.values_list("location_id", "requests")),
+            {self.location.pk: 4, self.other.pk: 1},
+        )
+
+    def test_ranking_counts_requests_not_refreshes(self):
+        today = date.today()
+        LocationDemand.objects.create(location=self.location, day=today, requests=40)
+        LocationDemand.objects.create(location=self.location, day=today - timedelta(days=30), requests=1000)
+        LocationDemand.objects.create(location=self.other, day=today, requests=3)
+        # A freshly (re)built forecast is not a request
+        save_forecasts([make_forecast(self.other, today)])
+
+        self.assertEqual(rank_locations(top=10, lookback_days=7), [(self.location.pk, 40), (self.other.pk, 3)])
+
+    def test_prune_drops_old_days(self):
+        today = date.today()
+        LocationDemand.objects.create(location=self.location, day=today, requests=1)
+        expired = today - timedelta(days=demand.KEEP_DAYS + 1)
+        LocationDemand.objects.create(location=self.location, day=expired, requests=1)
+        self.assertEqual(demand.prune(today), 1)
+        self.assertEqual(LocationDemand.objects.count(), 1)
+
+
+class PlanUnitsTests(TestCase):
+    def test_keys_are_stable_buckets_per_year(self):
+        units = backtest.plan_units([3, 49, 50, 120], date(2023, 11, 1), date(2024, 2, 28))
+        self.assertEqual(
+            [(u.key, u.location_ids, u.start, u.end) for u in units],
+            [
+                ("2023_0", (3, 49), date(2023, 11, 1), date(2023, 12, 31)),
+                ("2023_1", (50,), date(2023, 11, 1), date(2023, 12, 31)),
+                ("2023_2", (120,), date(2023, 11, 1), date(2023, 12, 31)),
+                ("2024_0", (3, 49), date(2024, 1, 1), date(2024, 2, 28)),
+                ("2024_1", (50,), date(2024, 1, 1), date(2024, 2, 28)),
+                ("2024_2", (120,), date(2024, 1, 1), date(2024, 2, 28)),
+            ],
+        )
+
+    def test_new_location_or_later_end_keeps_other_keys(self):
+        before = {u.key: u for u in backtest.plan_units([3, 49, 50], date(2023, 1, 1), date(2024, 3, 1))}
+        after = {u.key: u for u in backtest.plan_units([3, 49, 50, 51], date(2023, 1, 1), date(2024, 4, 1))}
+        self.assertEqual(before.keys(), after.keys())
+        changed = {key for key in before if before[key] != after[key]}
+        self.assertEqual(changed, {"2023_1", "2024_0", "2024_1"})
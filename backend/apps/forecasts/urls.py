@@ -1,6 +1,8 @@
 from django.urls import path
-from .views import ForecastView
+from .views import ForecastHistoryView, ForecastTimelineView, ForecastView
 
 urlpatterns = [
     path("", ForecastView.as_view(), name="forecast-detail"),
+    path("timeline/", ForecastTimelineView.as_view(), name="forecast-timeline"),
+    path("history/", ForecastHistoryView.as_view(), name="forecast-history"),
 ]
@@ -1,136 +1,253 @@
+import hashlib
 import logging
+import math
 from datetime import date, datetime, timezone
 
-from django.conf import settings
-from django.contrib.gis.geos import Point
+from django.http import HttpResponseNotModified
 from django.utils import timezone as django_tz
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
 from rest_framework import status
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from apps.core.metrics import cache_result, stage
+from apps.core.pagination import KeysetPagination
+from apps.core.ratelimit import UpstreamBudgetExceeded
 from apps.locations.models import Location
-from .models import SunsetForecast
-from .serializers import SunsetForecastSerializer
-from .services.astro import get_sun_times, estimate_timezone
-from .services.open_meteo import get_weather_at_sunset
-from .services.scorer import compute_quality_score
+from .models import SunsetForecast, forecast_expires_at
+from .payloads import FORECAST_FIELDS, forecast_payload, forecast_row, location_payload
+from .renderers import FastJSONRenderer
+from .services import demand, timeline
+from .services.builder import build_forecasts
+from .services.scorer import SCORER_VERSION
 
 logger = logging.getLogger(__name__)
 
-CACHE_HOURS = getattr(settings, "FORECAST_CACHE_HOURS", 3)
-
 
 class ForecastView(APIView):
     """
     GET /api/v1/forecasts/?lat=&lng=&date=YYYY-MM-DD
 
     Returns a SunsetForecast, fetching from Open-Meteo if the cached
-    version is older than FORECAST_CACHE_HOURS.
+    version has expired (see forecast_expires_at).  Responses carry a strong
+    ETag and Last-Modified derived from fetched_at, and Cache-Control
+    max-age set to the remaining TTL; matching conditional requests get a
+    304 without the forecast being serialized.
+
+    Bodies are built by the payloads fast path from a values() row and
+    encoded with orjson rather than going through SunsetForecastSerializer.
     """
 
-    def get(self, request):
-        lat_str = request.query_params.get("lat")
-        lng_str = request.query_params.get("lng")
-        date_str = request.query_params.get("date")
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
 
-        if not lat_str or not lng_str:
-            return Response({"error": "lat and lng are required."}, status=status.HTTP_400_BAD_REQUEST)
+    def get(self, request):
+        query = _point_and_date(request)
+        if isinstance(query, Response):
+            return query
+        lat, lng, target_date = query
+
+        with stage("forecast.db_read"):
+            # Get or create location (deduplicated by geohash cell)
+            location, _ = Location.objects.get_or_create_for_point(lat, lng)
+            demand.record(location.pk)
+
+            # Check cache
+            row = _get_cached_forecast(location, target_date)
+
+        if row:
+            headers = _cache_headers(location.pk, target_date, row["fetched_at"])
+            if _not_modified(request, row["fetched_at"], headers["ETag"]):
+                return _not_modified_response(headers)
+            with stage("forecast.serialize"):
+                data = forecast_payload(row, location_payload(location))
+            return Response(data, headers=headers)
 
+        # Fetch fresh forecast
         try:
-            lat = float(lat_str)
-            lng = float(lng_str)
-        except ValueError:
-            return Response({"error": "lat and lng must be numeric."}, status=status.HTTP_400_BAD_REQUEST)
+            forecast = _build_forecast(location, target_date)
+        except UpstreamBudgetExceeded as exc:
+            return _upstream_busy(exc)
+        if forecast is None:
+            return _no_forecast()
 
-        if date_str:
-            try:
-                target_date = date.fromisoformat(date_str)
-            except ValueError:
-                return Response({"error": "date must be YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
-        else:
-            target_date = date.today()
+        with stage("forecast.serialize"):
+            data = forecast_payload(forecast_row(forecast), location_payload(location))
+        return Response(data, headers=_cache_headers(location.pk, target_date, forecast.fetched_at))
 
-        # Get or create location
-        point = Point(lng, lat, srid=4326)
-        location, _ = Location.objects.get_or_create(point=point)
 
-        # Check cache
-        forecast = _get_cached_forecast(location, target_date)
-        if forecast:
-            return Response(SunsetForecastSerializer(forecast).data)
+class ForecastTimelineView(APIView):
+    """
+    GET /api/v1/forecasts/timeline/?lat=&lng=&date=YYYY-MM-DD
 
-        # Fetch fresh forecast
-        forecast = _build_forecast(location, target_date)
-        if forecast is None:
-            return Response(
-                {"error": "Could not compute forecast. Sun may not set at this location/date."},
-                status=status.HTTP_503_SERVICE_UNAVAILABLE,
-            )
+    The forecast plus its full-evening timeline: the score every
+    FORECAST_TIMELINE_STEP_MINUTES from the start of golden hour to civil
+    dusk, and the peak.  The timeline is stored with the forecast, so a fresh
+    forecast serves both; otherwise they are rebuilt from one weather fetch.
+    Caching headers follow the forecast's, as the timeline is tied to it.
+    """
 
-        return Response(SunsetForecastSerializer(forecast).data)
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
 
+    def get(self, request):
+        query = _point_and_date(request)
+        if isinstance(query, Response):
+            return query
+        lat, lng, target_date = query
+
+        with stage("forecast.db_read"):
+            location, _ = Location.objects.get_or_create_for_point(lat, lng)
+            demand.record(location.pk)
+            row = _get_cached_forecast(location, target_date, [*FORECAST_FIELDS, "timeline"])
+
+        # Rows stored before timelines were kept have none; rebuilding fills it in
+        if row is None or row["timeline"] is None:
+            try:
+                forecast = _build_forecast(location, target_date)
+            except UpstreamBudgetExceeded as exc:
+                return _upstream_busy(exc)
+            if forecast is None or forecast.timeline is None:
+                return _no_forecast()
+            row = {**forecast_row(forecast), "timeline": forecast.timeline}
+        evening = timeline.Timeline.from_stored(row["golden_hour_start_utc"], row["timeline"])
+
+        headers = _cache_headers(location.pk, target_date, row["fetched_at"])
+        if _not_modified(request, row["fetched_at"], headers["ETag"]):
+            return _not_modified_response(headers)
+        with stage("forecast.serialize"):
+            data = {**forecast_payload(row, location_payload(location)), "timeline": evening.payload()}
+        return Response(data, headers=headers)
+
+
+def _point_and_date(request) -> tuple[float, float, date] | Response:
+    """(lat, lng, date) from the query string, or a 400 response."""
+    lat_str = request.query_params.get("lat")
+    lng_str = request.query_params.get("lng")
+    date_str = request.query_params.get("date")
+
+    if not lat_str or not lng_str:
+        return Response({"error": "lat and lng are required."}, status=status.HTTP_400_BAD_REQUEST)
 
-def _get_cached_forecast(location: Location, target_date: date) -> SunsetForecast | None:
-    """Return a cached forecast if it exists and was fetched within CACHE_HOURS."""
     try:
-        forecast = SunsetForecast.objects.get(location=location, forecast_date=target_date)
-    except SunsetForecast.DoesNotExist:
-        return None
+        lat = float(lat_str)
+        lng = float(lng_str)
+    except ValueError:
+        return Response({"error": "lat and lng must be numeric."}, status=status.HTTP_400_BAD_REQUEST)
 
-    age_hours = (django_tz.now() - forecast.fetched_at).total_seconds() / 3600
-    if age_hours <= CACHE_HOURS:
-        return forecast
+    if date_str:
+        try:
+            target_date = date.fromisoformat(date_str)
+        except ValueError:
+            return Response({"error": "date must be YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+    else:
+        target_date = date.today()
+    return lat, lng, target_date
 
-    # Stale — delete and re-fetch
-    forecast.delete()
-    return None
+
+def _upstream_busy(exc: UpstreamBudgetExceeded) -> Response:
+    return Response(
+        {"error": "Weather provider is busy, try again shortly."},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": str(math.ceil(exc.retry_after))},
+    )
 
 
-def _build_forecast(location: Location, target_date: date) -> SunsetForecast | None:
-    """Fetch weather + astro data and compute quality score, saving to DB."""
-    tz_name = estimate_timezone(location.lng)
+def _no_forecast() -> Response:
+    return Response(
+        {"error": "Could not compute forecast. Sun may not set at this location/date."},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
 
-    sun_times = get_sun_times(location.lat, location.lng, target_date, tz_name)
-    if sun_times is None:
-        return None
 
-    weather = get_weather_at_sunset(
-        location.lat,
-        location.lng,
-        target_date,
-        sun_times.sunset_hour_local,
-        tz_name,
+class ForecastHistoryPagination(KeysetPagination):
+    # Served by the (location, forecast_date) unique index, scanned backwards
+    ordering = ("-forecast_date",)
+
+
+class ForecastHistoryView(APIView):
+    """
+    GET /api/v1/forecasts/history/?location=<id>
+
+    A location's stored forecasts, latest date first, keyset-paginated so
+    deep pages cost the same as the first.  Bodies use the same fast path
+    as ForecastView.
+    """
+
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def get(self, request):
+        try:
+            location_id = int(request.query_params["location"])
+        except (KeyError, ValueError):
+            return Response({"error": "location must be a location id."}, status=status.HTTP_400_BAD_REQUEST)
+        location = Location.objects.filter(pk=location_id).first()
+        if location is None:
+            return Response({"error": "Location not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        paginator = ForecastHistoryPagination()
+        rows = paginator.paginate_queryset(
+            SunsetForecast.objects.filter(location=location).values(*FORECAST_FIELDS), request, view=self
+        )
+        with stage("forecast.serialize"):
+            location_data = location_payload(location)
+            data = [forecast_payload(row, location_data) for row in rows]
+        return paginator.get_paginated_response(data)
+
+
+def _cache_headers(location_id: int, target_date: date, fetched_at: datetime) -> dict[str, str]:
+    """ETag, Last-Modified and Cache-Control for a forecast response."""
+    key = f"{location_id}:{target_date}:{fetched_at.isoformat()}:{SCORER_VERSION}"
+    expires_at = forecast_expires_at(fetched_at, target_date)
+    max_age = max(0, int((expires_at - django_tz.now()).total_seconds()))
+    return {
+        "ETag": quote_etag(hashlib.sha1(key.encode()).hexdigest()),
+        "Last-Modified": http_date(fetched_at.timestamp()),
+        "Cache-Control": f"public, max-age={max_age}",
+    }
+
+
+def _not_modified(request, fetched_at: datetime, etag: str) -> bool:
+    """Evaluate If-None-Match (preferred) or If-Modified-Since against the forecast."""
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match:
+        # If-None-Match uses weak comparison, so W/"x" matches "x"
+        etags = {e.removeprefix("W/") for e in parse_etags(if_none_match)}
+        return "*" in etags or etag in etags
+
+    if_modified_since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+    if if_modified_since is not None:
+        return int(fetched_at.timestamp()) <= if_modified_since
+    return False
+
+
+def _not_modified_response(headers: dict[str, str]) -> HttpResponseNotModified:
+    response = HttpResponseNotModified()
+    for name, value in headers.items():
+        response[name] = value
+    return response
+
+
+def _get_cached_forecast(location: Location, target_date: date, fields=FORECAST_FIELDS) -> dict | None:
+    """Return the cached forecast's values() row if it is still within its TTL."""
+    row = (
+        SunsetForecast.objects.filter(location=location, forecast_date=target_date)
+        .values(*fields)
+        .first()
     )
-    if weather is None:
+    if row is None:
+        cache_result("forecast", "miss")
         return None
 
-    breakdown = compute_quality_score(
-        cloud_low=weather.cloud_cover_low,
-        cloud_mid=weather.cloud_cover_mid,
-        cloud_high=weather.cloud_cover_high,
-        precipitation=weather.precipitation,
-        precipitation_probability=weather.precipitation_probability,
-        relative_humidity=weather.relative_humidity,
-        visibility=weather.visibility,
-        wind_speed=weather.wind_speed,
-        horizon_elevation_west=location.horizon_elevation_west,
-    )
+    if django_tz.now() <= forecast_expires_at(row["fetched_at"], target_date):
+        cache_result("forecast", "hit")
+        return row
 
-    forecast = SunsetForecast.objects.create(
-        location=location,
-        forecast_date=target_date,
-        sunset_time_utc=sun_times.sunset_utc,
-        golden_hour_start_utc=sun_times.golden_hour_start_utc,
-        cloud_cover_total=weather.cloud_cover_total,
-        cloud_cover_low=weather.cloud_cover_low,
-        cloud_cover_mid=weather.cloud_cover_mid,
-        cloud_cover_high=weather.cloud_cover_high,
-        relative_humidity=weather.relative_humidity,
-        precipitation_probability=weather.precipitation_probability,
-        precipitation=weather.precipitation,
-        visibility=weather.visibility,
-        wind_speed=weather.wind_speed,
-        quality_score=breakdown.total,
-        quality_label=breakdown.label,
-    )
-    return forecast
+    # Stale — re-fetch; the refresh updates this row in place, keeping its id
+    cache_result("forecast", "stale")
+    return None
+
+
+def _build_forecast(location: Location, target_date: date) -> SunsetForecast | None:
+    """Fetch weather + astro data and compute quality score and timeline, saving to DB."""
+    forecasts = build_forecasts([location], [target_date])
+    return forecasts[0] if forecasts else None
@@ -4,5 +4,5 @@ from .models import Location
 
 @admin.register(Location)
 class LocationAdmin(admin.ModelAdmin):
-    list_display = ["id", "name", "lat", "lng", "elevation", "created_at"]
-    search_fields = ["name"]
+    list_display = ["id", "name", "lat", "lng", "geohash", "elevation", "created_at"]
+    search_fields = ["name", "geohash"]
@@ -0,0 +1,85 @@
+"""
+Add Location.geohash and merge existing near-duplicate Locations.
+
+The unique constraint is added in 0003 so the schema change runs in its own
+transaction after the data rewrite (PostgreSQL refuses to ALTER a table with
+pending deferred-constraint events).
+
+Locations whose points fall in the same geohash cell are folded into the
+oldest one.  Their forecasts, saved places and notification preferences
+move to the survivor; where the survivor already has a forecast for the
+same date (or the user already saved / subscribed to it) the duplicate's
+row is dropped instead, after moving its ratings onto the surviving
+forecast.
+"""
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+from apps.locations.services import geohash
+
+# Frozen here so later changes to LOCATION_GEOHASH_PRECISION don't rewrite history
+PRECISION = 7
+
+
+def merge_near_duplicates(apps, schema_editor):
+    Location = apps.get_model("locations", "Location")
+    SunsetForecast = apps.get_model("forecasts", "SunsetForecast")
+    SunsetRating = apps.get_model("ratings", "SunsetRating")
+    UserLocation = apps.get_model("accounts", "UserLocation")
+    NotificationPreference = apps.get_model("notifications", "NotificationPreference")
+
+    cells = defaultdict(list)
+    for location in Location.objects.order_by("pk").only("pk", "point").iterator():
+        cells[geohash.encode(location.point.y, location.point.x, PRECISION)].append(location.pk)
+
+    for cell, pks in cells.items():
+        keeper, duplicates = pks[0], pks[1:]
+        if duplicates:
+            kept_forecasts = {
+                f.forecast_date: f.pk for f in SunsetForecast.objects.filter(location_id=keeper)
+            }
+            for forecast in SunsetForecast.objects.filter(location_id__in=duplicates).order_by("-fetched_at"):
+                target = kept_forecasts.get(forecast.forecast_date)
+                if target is None:
+                    forecast.location_id = keeper
+                    forecast.save(update_fields=["location"])
+                    kept_forecasts[forecast.forecast_date] = forecast.pk
+                else:
+                    SunsetRating.objects.filter(forecast_id=forecast.pk).update(forecast_id=target)
+                    forecast.delete()
+
+            for model in (UserLocation, NotificationPreference):
+                owners = set(model.objects.filter(location_id=keeper).values_list("user_id", flat=True))
+                for row in model.objects.filter(location_id__in=duplicates).order_by("pk"):
+                    if row.user_id in owners:
+                        row.delete()
+                    else:
+                        row.location_id = keeper
+                        row.save(update_fields=["location"])
+                        owners.add(row.user_id)
+
+            Location.objects.filter(pk__in=duplicates).delete()
+
+        Location.objects.filter(pk=keeper).update(geohash=cell)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0001_initial'),
+        ('forecasts', '0002_sunsetforecast_ensemble'),
+        ('ratings', '0001_initial'),
+        ('accounts', '0001_initial'),
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='geohash',
+            field=models.CharField(max_length=12, null=True),
+        ),
+        migrations.RunPython(merge_near_duplicates, migrations.RunPython.noop),
+    ]
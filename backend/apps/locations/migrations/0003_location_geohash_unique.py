@@ -0,0 +1,22 @@
+# Generated by Django 5.1.15 on 2026-10-19 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0002_location_geohash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='location',
+            name='geohash',
+            field=models.CharField(max_length=12, unique=True),
+        ),
+        migrations.RemoveIndex(
+            model_name='location',
+            name='locations_l_point_835bb1_idx',
+        ),
+    ]
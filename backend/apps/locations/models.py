@@ -1,4 +1,31 @@
+from django.conf import settings
 from django.contrib.gis.db import models
+from django.contrib.gis.geos import Point
+
+from .services import geohash
+
+GEOHASH_PRECISION = getattr(settings, "LOCATION_GEOHASH_PRECISION", 7)
+
+
+class LocationManager(models.Manager):
+    def get_or_create_for_point(self, lat: float, lng: float, defaults: dict | None = None):
+        """
+        get_or_create keyed on the point's geohash cell rather than the exact
+        coordinates, so slightly different floats for the same spot share a
+        Location.  The unique index makes this an indexed lookup and keeps
+        concurrent creates from duplicating the row.
+
+        Existing cells are looked up with a plain read first, since
+        get_or_create always queries the primary database.
+        """
+        cell = geohash.encode(lat, lng, GEOHASH_PRECISION)
+        location = self.filter(geohash=cell).first()
+        if location is not None:
+            return location, False
+        return self.get_or_create(
+            geohash=cell,
+            defaults={"point": Point(lng, lat, srid=4326), **(defaults or {})},
+        )
 
 
 class Location(models.Model):
@@ -6,16 +33,21 @@ class Location(models.Model):
 
     name = models.CharField(max_length=255, blank=True)
     point = models.PointField(geography=True, srid=4326)
+    geohash = models.CharField(max_length=12, unique=True)
     elevation = models.FloatField(null=True, blank=True)  # metres
     horizon_elevation_west = models.FloatField(default=0.0)  # degrees above flat
     created_at = models.DateTimeField(auto_now_add=True)
 
-    class Meta:
-        indexes = [models.Index(fields=["point"])]
+    objects = LocationManager()
 
     def __str__(self):
         return self.name or f"({self.point.y:.4f}, {self.point.x:.4f})"
 
+    def save(self, *args, **kwargs):
+        if not self.geohash:
+            self.geohash = geohash.encode(self.lat, self.lng, GEOHASH_PRECISION)
+        super().save(*args, **kwargs)
+
     @property
     def lat(self):
         return self.point.y
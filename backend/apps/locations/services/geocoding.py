@@ -1,18 +1,25 @@
 """
 Geocoding service using Nominatim (OpenStreetMap) via geopy.
 No API key required.
+
+geopy is imported on first use: it is slow to import and only the geocode
+endpoint needs it.
 """
 
 import logging
 from dataclasses import dataclass
 
 import httpx
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+from django.conf import settings
+
+from apps.core.metrics import stage, upstream_call
+from apps.core.ratelimit import acquire, retry_after_seconds, throttled
 
 logger = logging.getLogger(__name__)
 
-OPEN_ELEVATION_URL = "https://api.open-elevation.com/api/v1/lookup"
+OPEN_ELEVATION_URL = getattr(settings, "OPEN_ELEVATION_URL", "https://api.open-elevation.com/api/v1/lookup")
+NOMINATIM_DOMAIN = getattr(settings, "NOMINATIM_DOMAIN", "nominatim.openstreetmap.org")
+NOMINATIM_SCHEME = getattr(settings, "NOMINATIM_SCHEME", "https")
 
 
 @dataclass
@@ -24,10 +31,23 @@ class GeocodingResult:
 
 
 def geocode_address(address: str) -> GeocodingResult | None:
-    """Convert a freeform address string to lat/lng + elevation."""
-    geocoder = Nominatim(user_agent="vespercast/1.0")
+    """
+    Convert a freeform address string to lat/lng + elevation.  Raises
+    UpstreamBudgetExceeded if the Nominatim budget can't serve the call in time.
+    """
+    from geopy.exc import GeocoderRateLimited, GeocoderServiceError, GeocoderTimedOut
+    from geopy.geocoders import Nominatim
+
+    geocoder = Nominatim(user_agent="vespercast/1.0", domain=NOMINATIM_DOMAIN, scheme=NOMINATIM_SCHEME)
     try:
-        location = geocoder.geocode(address, exactly_one=True, timeout=10)
+        with stage("geocode.nominatim"):
+            acquire("nominatim")
+            with upstream_call("nominatim"):
+                location = geocoder.geocode(address, exactly_one=True, timeout=10)
+    except GeocoderRateLimited as exc:
+        throttled("nominatim", exc.retry_after)
+        logger.error("Geocoding rate-limited for %r: %s", address, exc)
+        return None
     except (GeocoderTimedOut, GeocoderServiceError) as exc:
         logger.error("Geocoding failed for %r: %s", address, exc)
         return None
@@ -36,7 +56,8 @@ def geocode_address(address: str) -> GeocodingResult | None:
         return None
 
     lat, lng = location.latitude, location.longitude
-    elevation = _fetch_elevation(lat, lng)
+    with stage("geocode.elevation"):
+        elevation = _fetch_elevation(lat, lng)
 
     return GeocodingResult(
         name=location.address,
@@ -49,12 +70,16 @@ def geocode_address(address: str) -> GeocodingResult | None:
 def _fetch_elevation(lat: float, lng: float) -> float | None:
     """Fetch elevation in metres from open-elevation.com."""
     try:
-        resp = httpx.get(
-            OPEN_ELEVATION_URL,
-            params={"locations": f"{lat},{lng}"},
-            timeout=8.0,
-        )
-        resp.raise_for_status()
+        acquire("open_elevation")
+        with upstream_call("open_elevation"):
+            resp = httpx.get(
+                OPEN_ELEVATION_URL,
+                params={"locations": f"{lat},{lng}"},
+                timeout=8.0,
+            )
+            if resp.status_code == 429:
+                throttled("open_elevation", retry_after_seconds(resp))
+            resp.raise_for_status()
         results = resp.json().get("results", [])
         if results:
             return float(results[0]["elevation"])
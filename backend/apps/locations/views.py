@@ -1,10 +1,11 @@
 import logging
+import math
 
-from django.contrib.gis.geos import Point
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from apps.core.ratelimit import UpstreamBudgetExceeded
 from .models import Location
 from .serializers import GeocodeRequestSerializer, GeocodeResponseSerializer, LocationSerializer
 from .services.geocoding import geocode_address
@@ -19,7 +20,14 @@ class GeocodeView(APIView):
         req_ser = GeocodeRequestSerializer(data=request.data)
         req_ser.is_valid(raise_exception=True)
 
-        result = geocode_address(req_ser.validated_data["address"])
+        try:
+            result = geocode_address(req_ser.validated_data["address"])
+        except UpstreamBudgetExceeded as exc:
+            return Response(
+                {"error": "Geocoder is busy, try again shortly."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(math.ceil(exc.retry_after))},
+            )
         if result is None:
             return Response({"error": "Address not found."}, status=status.HTTP_404_NOT_FOUND)
 
@@ -46,8 +54,9 @@ class LocationListCreateView(APIView):
         except (TypeError, ValueError):
             return Response({"error": "lat and lng must be numeric."}, status=status.HTTP_400_BAD_REQUEST)
 
-        location, _ = Location.objects.get_or_create(
-            point=Point(lng, lat, srid=4326),
+        location, _ = Location.objects.get_or_create_for_point(
+            lat,
+            lng,
             defaults={
                 "name": name,
                 "elevation": float(elevation) if elevation is not None else None,
@@ -1,7 +1,32 @@
 from django.apps import AppConfig
+from django.db import transaction
+from django.db.models.signals import post_save
 
 
 class NotificationsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.notifications"
 
+    def ready(self):
+        from apps.forecasts.signals import forecast_score_swung
+
+        post_save.connect(
+            _replan_on_save,
+            sender=self.get_model("NotificationPreference"),
+            dispatch_uid="notifications.replan_on_save",
+        )
+        forecast_score_swung.connect(_reconsider_swings, dispatch_uid="notifications.reconsider_swings")
+
+
+def _replan_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .services.scheduler import replan_preference
+
+    transaction.on_commit(lambda: replan_preference(instance))
+
+
+def _reconsider_swings(sender, swings, **kwargs):
+    from .services.scheduler import reconsider_swings
+
+    transaction.on_commit(lambda: reconsider_swings(swings))
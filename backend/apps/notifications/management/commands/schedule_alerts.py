@@ -0,0 +1,20 @@
+"""
+Install the daily alert-planning Schedule and plan the upcoming alerts now.
+Run once per deploy; it is idempotent.
+
+    python manage.py schedule_alerts
+"""
+
+from django.core.management.base import BaseCommand
+
+from ...services import scheduler
+from ...tasks import plan_alerts
+
+
+class Command(BaseCommand):
+    help = "Plan pre-sunset alerts now and schedule the daily planning run."
+
+    def handle(self, *args, **options):
+        scheduler.install_daily_plan()
+        planned = plan_alerts()
+        self.stdout.write(self.style.SUCCESS(f"Planned {planned} alerts; daily planning scheduled"))
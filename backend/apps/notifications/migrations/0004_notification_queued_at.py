@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-19 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_pushsubscription'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='queued_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
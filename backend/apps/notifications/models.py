@@ -24,22 +24,40 @@ class NotificationPreference(models.Model):
 
 
 class Notification(models.Model):
-    """A sent notification record."""
+    """One planned alert: pending until due_at, then queued, and finally sent, failed or skipped."""
 
     STATUS_CHOICES = [
         ("pending", "Pending"),
+        ("queued", "Queued"),
         ("sent", "Sent"),
         ("failed", "Failed"),
+        ("skipped", "Skipped"),
     ]
 
     preference = models.ForeignKey(NotificationPreference, on_delete=models.CASCADE, related_name="notifications")
     forecast_date = models.DateField()
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    due_at = models.DateTimeField(null=True, blank=True)
+    queued_at = models.DateTimeField(null=True, blank=True)  # when dispatch last claimed it
     sent_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         unique_together = [("preference", "forecast_date")]
+        indexes = [models.Index(fields=["status", "due_at"], name="notification_status_due_idx")]
 
     def __str__(self):
         return f"Notification for {self.preference} on {self.forecast_date}"
+
+
+class PushSubscription(models.Model):
+    """A browser's Web Push subscription (PushSubscription.toJSON() from the client)."""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="push_subscriptions")
+    endpoint = models.URLField(max_length=1024, unique=True)
+    p256dh = models.CharField(max_length=128)  # client public key, base64url
+    auth = models.CharField(max_length=32)  # client auth secret, base64url
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Push subscription for {self.user}"
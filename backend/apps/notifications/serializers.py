@@ -0,0 +1,22 @@
+from rest_framework import serializers
+
+from .services import webpush
+
+
+class PushKeysSerializer(serializers.Serializer):
+    p256dh = serializers.CharField(max_length=128)
+    auth = serializers.CharField(max_length=32)
+
+
+class PushSubscriptionSerializer(serializers.Serializer):
+    """The browser's PushSubscription.toJSON()."""
+
+    endpoint = serializers.URLField(max_length=1024)
+    keys = PushKeysSerializer()
+
+    def validate_endpoint(self, value):
+        try:
+            webpush.check_endpoint(value)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+        return value
@@ -0,0 +1,193 @@
+"""
+Sending a batch of due alerts.
+
+Each alert is checked against its forecast at send time, since forecasts
+change between planning and sunset: below the preference's threshold it is
+`skipped`, otherwise delivered on the preference's channels (email, and Web
+Push to each of the user's subscriptions) and `sent` if any channel got it
+through.  Forecasts missing from the cache or past their expiry are built
+for the whole batch in one go, and subscriptions the push service reports
+as gone are deleted in one query.
+
+Each alert's outcome is written as soon as it is known (the first channel
+through, or the last one failing), so a batch cut short by a timeout or
+crash leaves only the alerts not yet delivered `queued`.  A retry of the
+batch sends just those, and the scheduler's reaper returns them to
+`pending` if no retry does.
+"""
+
+import logging
+from collections import Counter, defaultdict
+from collections.abc import Iterator
+from itertools import chain
+
+import orjson
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from apps.forecasts.models import SunsetForecast
+from apps.forecasts.services.builder import build_forecasts
+from ..models import Notification, PushSubscription
+from . import webpush
+
+logger = logging.getLogger(__name__)
+
+
+def send_batch(notification_ids: list[int]) -> dict[str, int]:
+    """Deliver the queued alerts among `notification_ids`; returns a count per outcome."""
+    alerts = list(
+        Notification.objects.filter(pk__in=notification_ids, status="queued")
+        .select_related("preference__user", "preference__location")
+        .order_by("pk")
+    )
+    if not alerts:
+        return {}
+
+    forecasts = _forecasts_for(alerts)
+    skipped, due = [], []
+    for alert in alerts:
+        pref = alert.preference
+        forecast = forecasts.get((pref.location_id, alert.forecast_date))
+        if forecast is None or forecast.quality_score < pref.minimum_score_threshold:
+            alert.status = "skipped"
+            skipped.append(alert.pk)
+        else:
+            due.append((alert, forecast))
+    if skipped:
+        Notification.objects.filter(pk__in=skipped).update(status="skipped")
+
+    emails = [
+        (alert, forecast)
+        for alert, forecast in due
+        if alert.preference.notify_via_email and alert.preference.user.email
+    ]
+    pushes = _push_messages([(alert, forecast) for alert, forecast in due if alert.preference.notify_via_push])
+    remaining = Counter(alert.pk for alert, _ in emails) + Counter(alert_id for alert_id, _ in pushes)
+    by_id = {alert.pk: alert for alert, _ in due}
+
+    for alert, _ in due:
+        if not remaining[alert.pk]:
+            _record(alert, "failed")  # no channel to try
+    # Sent once any channel gets through; failed once the last one doesn't
+    for alert_id, ok in chain(_send_emails(emails), _send_pushes(pushes)):
+        remaining[alert_id] -= 1
+        alert = by_id[alert_id]
+        if ok and alert.status != "sent":
+            _record(alert, "sent")
+        elif not remaining[alert_id] and alert.status != "sent":
+            _record(alert, "failed")
+
+    outcomes: dict[str, int] = {}
+    for alert in alerts:
+        outcomes[alert.status] = outcomes.get(alert.status, 0) + 1
+    return outcomes
+
+
+def _record(alert: Notification, status: str):
+    """Write one alert's outcome straight away."""
+    alert.status = status
+    alert.sent_at = timezone.now() if status == "sent" else None
+    Notification.objects.filter(pk=alert.pk).update(status=alert.status, sent_at=alert.sent_at)
+
+
+def _forecasts_for(alerts: list[Notification]) -> dict[tuple, SunsetForecast]:
+    """The current forecast for each alert's (location, date), building any that are missing or expired."""
+    pairs = {(alert.preference.location_id, alert.forecast_date) for alert in alerts}
+    now = timezone.now()
+    found = {
+        (f.location_id, f.forecast_date): f
+        for f in SunsetForecast.objects.filter(
+            location_id__in={loc for loc, _ in pairs}, forecast_date__in={d for _, d in pairs}
+        )
+        if f.is_fresh(now)
+    }
+    missing = pairs - found.keys()
+    if missing:
+        locations = {
+            alert.preference.location
+            for alert in alerts
+            if (alert.preference.location_id, alert.forecast_date) in missing
+        }
+        for forecast in build_forecasts(list(locations), sorted({d for _, d in missing})):
+            found.setdefault((forecast.location_id, forecast.forecast_date), forecast)
+    return found
+
+
+def _send_emails(batch: list[tuple[Notification, SunsetForecast]]) -> Iterator[tuple[int, bool]]:
+    """
+    One SMTP connection for the whole batch; each message succeeds or fails
+    on its own.  Yields (alert id, delivered) as each message is done.
+    """
+    if not batch:
+        return
+    with get_connection() as connection:
+        for alert, forecast in batch:
+            try:
+                connection.send_messages([_email(alert, forecast)])
+            except Exception as exc:
+                logger.warning("Alert %s email failed: %s", alert.pk, exc)
+                yield alert.pk, False
+            else:
+                yield alert.pk, True
+
+
+def _push_messages(batch: list[tuple[Notification, SunsetForecast]]) -> list[tuple[int, webpush.PushMessage]]:
+    """(alert id, message) for each alert and each of its user's push subscriptions."""
+    if not batch or not webpush.ENABLED:
+        return []
+    subscriptions = defaultdict(list)
+    for sub in PushSubscription.objects.filter(user_id__in={alert.preference.user_id for alert, _ in batch}):
+        subscriptions[sub.user_id].append(sub)
+
+    messages = []
+    for alert, forecast in batch:
+        payload = _push_payload(alert, forecast)
+        ttl = max(60, int((forecast.sunset_time_utc - timezone.now()).total_seconds()))
+        messages.extend(
+            (alert.pk, webpush.PushMessage(sub.pk, sub.endpoint, sub.p256dh, sub.auth, payload, ttl=ttl))
+            for sub in subscriptions[alert.preference.user_id]
+        )
+    return messages
+
+
+def _send_pushes(messages: list[tuple[int, webpush.PushMessage]]) -> Iterator[tuple[int, bool]]:
+    """
+    Send every message concurrently, yielding (alert id, delivered) as each
+    completes, then delete the subscriptions that have expired.
+    """
+    expired = set()
+    for position, result in webpush.send_all([message for _, message in messages]):
+        if result.outcome == "expired":
+            expired.add(result.message.subscription_id)
+        yield messages[position][0], result.outcome == "sent"
+    if expired:
+        PushSubscription.objects.filter(pk__in=expired).delete()
+        logger.info("Pruned %d expired push subscriptions", len(expired))
+
+
+def _push_payload(alert: Notification, forecast: SunsetForecast) -> bytes:
+    """What the service worker shows; kept small to fit one push record."""
+    return orjson.dumps({
+        "title": f"{forecast.get_quality_label_display()} sunset at {alert.preference.location}",
+        "body": f"Scores {forecast.quality_score:.0f}/100, sunset at {forecast.sunset_time_utc:%H:%M} UTC",
+        "forecast_id": forecast.pk,
+        "location_id": alert.preference.location_id,
+        "date": alert.forecast_date.isoformat(),
+    })
+
+
+def _email(alert: Notification, forecast: SunsetForecast) -> EmailMessage:
+    location = alert.preference.location
+    minutes = max(0, round((forecast.sunset_time_utc - timezone.now()).total_seconds() / 60))
+    return EmailMessage(
+        subject=f"{forecast.get_quality_label_display()} sunset at {location} in {minutes} min",
+        body=(
+            f"Tonight's sunset at {location} scores {forecast.quality_score:.0f}/100 "
+            f"({forecast.get_quality_label_display().lower()}).\n"
+            f"Sunset: {forecast.sunset_time_utc:%H:%M} UTC, golden hour from "
+            f"{forecast.golden_hour_start_utc:%H:%M} UTC.\n"
+        ),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[alert.preference.user.email],
+    )
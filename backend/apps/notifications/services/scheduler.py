@@ -0,0 +1,235 @@
+"""
+Pre-sunset alert scheduling.
+
+Rather than polling every preference every minute, each day's alerts are
+planned ahead: every active preference gets a `pending` Notification whose
+`due_at` is its location's sunset minus `notify_minutes_before`, rounded
+down to an ALERT_SLOT_SECONDS slot so alerts due within the same minute go
+out together.  The pending rows, indexed on (status, due_at), are the
+persistent queue; nothing is held in memory, so a restart loses nothing.
+
+A single named one-off Django-Q Schedule (the "wake") is armed for the
+earliest pending slot.  When it fires, dispatch_due() claims everything
+due, hands it to send tasks in batches of ALERT_SEND_BATCH on the
+notifications lane, and re-arms the wake for the next slot.  Between slots
+no code runs beyond the Q cluster's own schedule check.
+
+A send task that times out or dies mid-batch leaves its undelivered alerts
+`queued`.  Each dispatch first returns alerts queued more than
+ALERT_REQUEUE_SECONDS ago (past every retry of their batch) to `pending`,
+and the wake is also armed for the earliest such deadline.
+
+Sunset times come from the day's SunsetForecast rows where they exist and
+are computed with astral otherwise.
+"""
+
+import logging
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+from django_q.models import Schedule
+
+from apps.core.tasks import enqueue, install_daily, policy_for
+from apps.forecasts.models import SunsetForecast
+from apps.forecasts.services.astro import estimate_timezone, get_sun_times
+from apps.locations.models import Location
+from ..models import Notification, NotificationPreference
+
+logger = logging.getLogger(__name__)
+
+SLOT_SECONDS = getattr(settings, "ALERT_SLOT_SECONDS", 60)
+SEND_BATCH = getattr(settings, "ALERT_SEND_BATCH", 500)
+REQUEUE_AFTER = timedelta(seconds=getattr(settings, "ALERT_REQUEUE_SECONDS", 900))
+PLAN_DAYS = 2  # today and tomorrow, so a daily run always covers the next sunset
+PLAN_CHUNK = 5000
+
+WAKE_SCHEDULE = "notifications.wake"
+PLAN_SCHEDULE = "notifications.plan"
+PLAN_TASK = "apps.notifications.tasks.plan_alerts"
+DISPATCH_TASK = "apps.notifications.tasks.dispatch_due"
+SEND_TASK = "apps.notifications.tasks.send_alerts"
+
+
+def slot_of(moment: datetime) -> datetime:
+    """Round down to the start of its timing-wheel slot."""
+    return datetime.fromtimestamp(moment.timestamp() // SLOT_SECONDS * SLOT_SECONDS, tz=moment.tzinfo)
+
+
+def plan(dates: list[date], preferences=None) -> int:
+    """
+    Create or move the pending alert for each active preference (all of
+    them, or the given queryset) on each date, then arm the wake.  Alerts
+    whose sunset has already passed are not planned.  Returns how many
+    alerts were written.
+    """
+    if preferences is None:
+        preferences = NotificationPreference.objects.all()
+    preferences = preferences.filter(is_active=True).filter(Q(notify_via_email=True) | Q(notify_via_push=True))
+    now = timezone.now()
+
+    rows = preferences.values_list("id", "location_id", "notify_minutes_before").order_by("id")
+    written = 0
+    for target_date in dates:
+        sunsets = dict(
+            SunsetForecast.objects.filter(forecast_date=target_date).values_list("location_id", "sunset_time_utc")
+        )
+        chunk = []
+        for row in rows.iterator(chunk_size=PLAN_CHUNK):
+            chunk.append(row)
+            if len(chunk) >= PLAN_CHUNK:
+                written += _plan_chunk(chunk, target_date, sunsets, now)
+                chunk = []
+        written += _plan_chunk(chunk, target_date, sunsets, now)
+
+    next_due = Notification.objects.filter(status="pending", due_at__isnull=False).aggregate(t=Min("due_at"))["t"]
+    if next_due is not None:
+        arm(next_due)
+    return written
+
+
+def replan_preference(preference: NotificationPreference):
+    """Bring one preference's upcoming alerts in line after it was edited."""
+    Notification.objects.filter(preference=preference, status="pending").delete()
+    today = timezone.localdate()
+    plan(
+        [today + timedelta(days=i) for i in range(PLAN_DAYS)],
+        NotificationPreference.objects.filter(pk=preference.pk),
+    )
+
+
+def _plan_chunk(rows: list[tuple], target_date: date, sunsets: dict, now: datetime) -> int:
+    """Upsert the alerts for one chunk of (preference, location, minutes) rows."""
+    missing = {location_id for _, location_id, _ in rows if location_id not in sunsets}
+    if missing:
+        sunsets.update(_computed_sunsets(missing, target_date))
+    alerts = [
+        Notification(
+            preference_id=pref_id,
+            forecast_date=target_date,
+            due_at=slot_of(sunsets[location_id] - timedelta(minutes=minutes)),
+        )
+        for pref_id, location_id, minutes in rows
+        if sunsets[location_id] is not None and sunsets[location_id] > now
+    ]
+    return _upsert(alerts)
+
+
+def _computed_sunsets(location_ids: set[int], target_date: date) -> dict[int, datetime | None]:
+    """Sunset instants from astral, for locations with no forecast that day."""
+    sunsets = {}
+    for location in Location.objects.filter(pk__in=location_ids):
+        sun_times = get_sun_times(location.lat, location.lng, target_date, estimate_timezone(location.lng))
+        sunsets[location.pk] = sun_times.sunset_utc if sun_times else None
+    for location_id in location_ids:
+        sunsets.setdefault(location_id, None)
+    return sunsets
+
+
+def _upsert(alerts: list[Notification]) -> int:
+    """Insert new alerts; existing ones only have their due time moved."""
+    if not alerts:
+        return 0
+    Notification.objects.bulk_create(
+        alerts,
+        update_conflicts=True,
+        unique_fields=["preference", "forecast_date"],
+        update_fields=["due_at"],
+    )
+    return len(alerts)
+
+
+def arm(at: datetime):
+    """Make sure the wake fires no later than `at`."""
+    lane = policy_for(DISPATCH_TASK).lane
+    args = repr((DISPATCH_TASK, 1, at.timestamp(), [], {}))
+    with transaction.atomic(using="default"):
+        wake = Schedule.objects.select_for_update().filter(name=WAKE_SCHEDULE).first()
+        if wake is None:
+            Schedule.objects.create(
+                name=WAKE_SCHEDULE,
+                func="apps.core.tasks.run_task",
+                args=args,
+                schedule_type=Schedule.ONCE,
+                # A ONCE schedule with repeats left is kept (with repeats=0)
+                # after firing, so the one row is re-armed rather than recreated
+                repeats=1,
+                next_run=at,
+                cluster=lane,
+            )
+        elif wake.repeats == 0 or wake.next_run > at:
+            wake.next_run = at
+            wake.repeats = 1
+            wake.args = args
+            wake.save(update_fields=["next_run", "repeats", "args"])
+
+
+def install_daily_plan():
+    """Create or reset the daily Schedule that plans the coming alerts."""
+    first_run = timezone.now().replace(hour=0, minute=5, second=0, microsecond=0) + timedelta(days=1)
+    install_daily(PLAN_SCHEDULE, PLAN_TASK, first_run)
+
+
+def reconsider_swings(swings: list[tuple]):
+    """
+    A forecast whose score jumped after its alerts were skipped as below
+    threshold gets those alerts re-queued to go out now, while the sunset
+    is still ahead.  Alerts not yet sent need nothing: they are checked
+    against the forecast when they go out.
+    """
+    now = timezone.now()
+    requeued = 0
+    for forecast, previous_score in swings:
+        if forecast.quality_score <= previous_score or forecast.sunset_time_utc <= now:
+            continue
+        requeued += Notification.objects.filter(
+            preference__location_id=forecast.location_id,
+            preference__is_active=True,
+            preference__minimum_score_threshold__lte=forecast.quality_score,
+            forecast_date=forecast.forecast_date,
+            status="skipped",
+        ).update(status="pending", due_at=slot_of(now))
+    if requeued:
+        logger.info("Re-queued %d skipped alerts after forecast score swings", requeued)
+        arm(now)
+
+
+def dispatch_due() -> int:
+    """
+    Return stuck alerts to pending, claim every alert due by now and queue
+    them for sending in batches, then re-arm the wake for the next slot (or
+    the next stuck-alert deadline).  Returns how many were queued.
+    """
+    now = timezone.now()
+    reaped = Notification.objects.filter(status="queued", queued_at__lt=now - REQUEUE_AFTER).update(status="pending")
+    if reaped:
+        logger.warning("Re-queued %d alerts whose send batch never finished", reaped)
+    queued = 0
+    while True:
+        # Claim and enqueue in one transaction (the broker is this database),
+        # so an overlapping dispatch can't queue an alert twice and a crash
+        # can't leave one claimed but never sent
+        with transaction.atomic(using="default"):
+            ids = list(
+                Notification.objects.select_for_update(skip_locked=True)
+                .filter(status="pending", due_at__lte=now)
+                .order_by("due_at")
+                .values_list("id", flat=True)[:SEND_BATCH]
+            )
+            if not ids:
+                break
+            Notification.objects.filter(pk__in=ids).update(status="queued", queued_at=now)
+            enqueue(SEND_TASK, ids)
+        queued += len(ids)
+
+    next_due = Notification.objects.filter(status="pending", due_at__gt=now).aggregate(t=Min("due_at"))["t"]
+    oldest_queued = Notification.objects.filter(status="queued").aggregate(t=Min("queued_at"))["t"]
+    if oldest_queued is not None:
+        next_due = min(filter(None, [next_due, oldest_queued + REQUEUE_AFTER]))
+    if next_due is not None:
+        arm(next_due)
+    if queued:
+        logger.info("Queued %d alerts due by %s", queued, now.isoformat(timespec="seconds"))
+    return queued
@@ -0,0 +1,271 @@
+"""
+Web Push delivery (RFC 8030) with aes128gcm payload encryption (RFC 8291)
+and VAPID authentication (RFC 8292).
+
+send_all() fans a batch of messages out over one shared HTTP/2 client, so
+each push service (FCM, Mozilla autopush, Apple …) gets a few pooled
+connections with many concurrent streams rather than a TLS handshake per
+message.  Up to WEBPUSH_CONCURRENCY messages are in flight at once.  A 429,
+5xx or transport error is retried with exponential backoff (honoring
+Retry-After); a 404 or 410 means the subscription has expired and is
+reported so the caller can prune it; any other 4xx fails the message.
+
+Keys: WEBPUSH_VAPID_PRIVATE_KEY is the raw P-256 private key, base64url
+encoded, as printed by the usual VAPID key generators (e.g.
+`npx web-push generate-vapid-keys`); the matching public key is what the
+browser needs as applicationServerKey, see vapid_public_key().
+"""
+
+import base64
+import ipaddress
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+import httpx
+import orjson
+from django.conf import settings
+
+from apps.core.metrics import upstream_call
+from apps.core.ratelimit import retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+VAPID_PRIVATE_KEY = getattr(settings, "WEBPUSH_VAPID_PRIVATE_KEY", "")
+ENABLED = bool(VAPID_PRIVATE_KEY)
+VAPID_SUBJECT = getattr(settings, "WEBPUSH_VAPID_SUBJECT", "mailto:alerts@vespercast.local")
+CONCURRENCY = getattr(settings, "WEBPUSH_CONCURRENCY", 32)
+MAX_ATTEMPTS = getattr(settings, "WEBPUSH_MAX_ATTEMPTS", 3)
+DEV_ENDPOINT_HOSTS = set(getattr(settings, "WEBPUSH_DEV_ENDPOINT_HOSTS", []))
+BACKOFF_SECONDS = 0.5  # before the second attempt, doubled after each failure
+MAX_BACKOFF_SECONDS = 10.0
+TOKEN_LIFETIME = 12 * 3600  # VAPID tokens may live up to 24h
+RECORD_SIZE = 4096
+MAX_PAYLOAD = RECORD_SIZE - 16 - 1 - 86  # tag, delimiter, header: one record per message
+
+
+def check_endpoint(endpoint: str) -> None:
+    """
+    Raise ValueError unless the endpoint is https on a host that resolves only
+    to public addresses, so a subscription can't aim the sender at loopback,
+    private or link-local services.  WEBPUSH_DEV_ENDPOINT_HOSTS (e.g. the
+    local stand-in) are exempt.
+    """
+    try:
+        parts = urlsplit(endpoint)
+        host, port = parts.hostname or "", parts.port or 443
+    except ValueError as exc:
+        raise ValueError("Invalid push endpoint.") from exc
+    if host in DEV_ENDPOINT_HOSTS:
+        return
+    if parts.scheme != "https":
+        raise ValueError("Push endpoints must use https.")
+    try:
+        resolved = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError) as exc:
+        raise ValueError("Push endpoint host does not resolve.") from exc
+    for *_, sockaddr in resolved:
+        address = ipaddress.ip_address(sockaddr[0].split("%")[0])
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global:
+            raise ValueError("Push endpoints must be on a public host.")
+
+
+@dataclass(frozen=True)
+class PushMessage:
+    subscription_id: int
+    endpoint: str
+    p256dh: str
+    auth: str
+    payload: bytes
+    ttl: int = 3600  # seconds the push service may hold the message for an offline device
+    urgency: str = "high"
+
+
+@dataclass(frozen=True)
+class PushResult:
+    message: PushMessage
+    outcome: str  # sent / expired / failed
+    status: int | None = None
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def _b64encode(value: bytes) -> str:
+    return base64.urlsafe_b64encode(value).rstrip(b"=").decode()
+
+
+def encrypt(payload: bytes, p256dh: str, auth: str) -> bytes:
+    """The aes128gcm-encoded body for `payload` to the subscription's keys (RFC 8291)."""
+    from cryptography.hazmat.primitives import hashes, hmac, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError(f"Push payload is {len(payload)} bytes, at most {MAX_PAYLOAD} fit in one record")
+
+    def hmac_sha256(key: bytes, data: bytes) -> bytes:
+        h = hmac.HMAC(key, hashes.SHA256())
+        h.update(data)
+        return h.finalize()
+
+    ua_public = _b64decode(p256dh)
+    auth_secret = _b64decode(auth)
+    as_private = ec.generate_private_key(ec.SECP256R1())
+    as_public = as_private.public_key().public_bytes(
+        serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint
+    )
+    shared = as_private.exchange(ec.ECDH(), ec.EllipticCurvePublicKey.from_encoded_point(ec.SECP256R1(), ua_public))
+
+    # HKDF by hand: each output here is a single SHA-256 block
+    ikm = hmac_sha256(hmac_sha256(auth_secret, shared), b"WebPush: info\x00" + ua_public + as_public + b"\x01")
+    salt = os.urandom(16)
+    prk = hmac_sha256(salt, ikm)
+    cek = hmac_sha256(prk, b"Content-Encoding: aes128gcm\x00\x01")[:16]
+    nonce = hmac_sha256(prk, b"Content-Encoding: nonce\x00\x01")[:12]
+
+    ciphertext = AESGCM(cek).encrypt(nonce, payload + b"\x02", None)  # \x02: last record, no padding
+    header = salt + RECORD_SIZE.to_bytes(4, "big") + bytes([len(as_public)]) + as_public
+    return header + ciphertext
+
+
+class _Vapid:
+    """Signs VAPID tokens, caching one per push-service origin until it nears expiry."""
+
+    def __init__(self, private_key: str, subject: str):
+        self._raw_key = private_key
+        self.subject = subject
+        self._key = None
+        self._public_key = None
+        self._tokens: dict[str, tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def key(self):
+        if self._key is None:
+            if not self._raw_key:
+                raise ValueError("WEBPUSH_VAPID_PRIVATE_KEY is not set")
+            from cryptography.hazmat.primitives.asymmetric import ec
+
+            self._key = ec.derive_private_key(int.from_bytes(_b64decode(self._raw_key), "big"), ec.SECP256R1())
+        return self._key
+
+    def public_key(self) -> str:
+        if self._public_key is None:
+            from cryptography.hazmat.primitives import serialization
+
+            self._public_key = _b64encode(
+                self.key.public_key().public_bytes(
+                    serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint
+                )
+            )
+        return self._public_key
+
+    def authorization(self, endpoint: str) -> str:
+        parts = urlsplit(endpoint)
+        audience = f"{parts.scheme}://{parts.netloc}"
+        now = time.time()
+        with self._lock:
+            token, expires = self._tokens.get(audience, ("", 0.0))
+            if expires - now < TOKEN_LIFETIME / 2:
+                expires = now + TOKEN_LIFETIME
+                token = self._sign({"aud": audience, "exp": int(expires), "sub": self.subject})
+                self._tokens[audience] = (token, expires)
+        return f"vapid t={token}, k={self.public_key()}"
+
+    def _sign(self, claims: dict) -> str:
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import ec
+        from cryptography.hazmat.primitives.asymmetric.utils import decode_dss_signature
+
+        signing_input = (
+            _b64encode(orjson.dumps({"typ": "JWT", "alg": "ES256"})) + "." + _b64encode(orjson.dumps(claims))
+        )
+        r, s = decode_dss_signature(self.key.sign(signing_input.encode(), ec.ECDSA(hashes.SHA256())))
+        return signing_input + "." + _b64encode(r.to_bytes(32, "big") + s.to_bytes(32, "big"))
+
+
+_vapid = _Vapid(VAPID_PRIVATE_KEY, VAPID_SUBJECT)
+_client: httpx.Client | None = None
+_client_lock = threading.Lock()
+
+
+def vapid_public_key() -> str:
+    """The applicationServerKey browsers subscribe with (base64url)."""
+    return _vapid.public_key()
+
+
+def _get_client() -> httpx.Client:
+    """One HTTP/2 client per process, so connections to each push service are reused across batches."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = httpx.Client(
+                http2=True,
+                timeout=10.0,
+                limits=httpx.Limits(max_connections=CONCURRENCY, max_keepalive_connections=CONCURRENCY),
+            )
+        return _client
+
+
+def send_all(messages: list[PushMessage]) -> Iterator[tuple[int, PushResult]]:
+    """Deliver every message concurrently, yielding (position in `messages`, result) as each completes."""
+    if not messages:
+        return
+    client = _get_client()
+    with ThreadPoolExecutor(max_workers=min(CONCURRENCY, len(messages)), thread_name_prefix="webpush") as pool:
+        futures = {pool.submit(_send_one, client, message): position for position, message in enumerate(messages)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def _send_one(client: httpx.Client, message: PushMessage) -> PushResult:
+    status = None
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        retry_after = None
+        try:
+            with upstream_call("web_push"):
+                resp = client.post(
+                    message.endpoint,
+                    content=encrypt(message.payload, message.p256dh, message.auth),
+                    headers={
+                        "Authorization": _vapid.authorization(message.endpoint),
+                        "Content-Encoding": "aes128gcm",
+                        "Content-Type": "application/octet-stream",
+                        "TTL": str(message.ttl),
+                        "Urgency": message.urgency,
+                    },
+                )
+                status = resp.status_code
+                if status >= 500 or status == 429:
+                    retry_after = retry_after_seconds(resp)
+                    resp.raise_for_status()
+        except httpx.HTTPError as exc:
+            if attempt == MAX_ATTEMPTS:
+                logger.warning("Push to subscription %s failed: %s", message.subscription_id, exc)
+                break
+            delay = retry_after if retry_after is not None else BACKOFF_SECONDS * 2 ** (attempt - 1)
+            time.sleep(min(MAX_BACKOFF_SECONDS, delay) * random.uniform(1.0, 1.25))
+            continue
+        except ValueError as exc:
+            # Malformed subscription keys or an oversized payload; retrying won't help
+            logger.warning("Push to subscription %s not sent: %s", message.subscription_id, exc)
+            break
+
+        if status in (404, 410):
+            return PushResult(message, "expired", status)
+        if 200 <= status < 300:
+            return PushResult(message, "sent", status)
+        logger.warning("Push to subscription %s rejected with %s", message.subscription_id, status)
+        break
+    return PushResult(message, "failed", status)
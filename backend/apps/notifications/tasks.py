@@ -0,0 +1,27 @@
+"""
+Background alert work, queued through apps.core.tasks.enqueue or fired by
+the scheduler's wake.  Arguments are plain literals so failed runs can be
+retried.
+"""
+
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .services import delivery, scheduler
+
+
+def plan_alerts(days: int = scheduler.PLAN_DAYS) -> int:
+    """Plan alerts for today and the following days; run daily."""
+    today = timezone.localdate()
+    return scheduler.plan([today + timedelta(days=i) for i in range(days)])
+
+
+def dispatch_due() -> int:
+    """Queue every alert that is due; fired by the scheduler's wake."""
+    return scheduler.dispatch_due()
+
+
+def send_alerts(notification_ids: list[int]) -> dict[str, int]:
+    """Deliver one batch of claimed alerts."""
+    return delivery.send_batch(notification_ids)
@@ -0,0 +1,308 @@
+import ast
+import base64
+import os
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django_q.models import Schedule
+
+from apps.core.tasks import run_task
+from apps.forecasts.models import SunsetForecast
+from apps.forecasts.services.builder import save_forecasts
+from apps.forecasts.tests import make_forecast
+from apps.locations.models import Location
+from .models import Notification, NotificationPreference, PushSubscription
+from .services import delivery, scheduler, webpush
+
+
+class SlotOfTests(TestCase):
+    @mock.patch("apps.notifications.services.scheduler.SLOT_SECONDS", 60)
+    def test_rounds_down_to_slot(self):
+        moment = datetime(2026, 6, 21, 20, 14, 59, 999999, tzinfo=dt_timezone.utc)
+        self.assertEqual(scheduler.slot_of(moment), datetime(2026, 6, 21, 20, 14, tzinfo=dt_timezone.utc))
+
+    @mock.patch("apps.notifications.services.scheduler.SLOT_SECONDS", 60)
+    def test_slot_start_is_its_own_slot(self):
+        moment = datetime(2026, 6, 21, 20, 14, tzinfo=dt_timezone.utc)
+        self.assertEqual(scheduler.slot_of(moment), moment)
+
+    @mock.patch("apps.notifications.services.scheduler.SLOT_SECONDS", 300)
+    def test_keeps_timezone(self):
+        tz = dt_timezone(timedelta(hours=2))
+        slot = scheduler.slot_of(datetime(2026, 6, 21, 22, 9, 30, tzinfo=tz))
+        self.assertEqual(slot, datetime(2026, 6, 21, 22, 5, tzinfo=tz))
+        self.assertEqual(slot.tzinfo, tz)
+
+
+class AlertTestCase(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="watcher", email="watcher@example.com", password="x"
+        )
+        self.location, _ = Location.objects.get_or_create_for_point(51.5, -0.12)
+        self.preference = NotificationPreference.objects.create(
+            user=self.user, location=self.location, minimum_score_threshold=60.0
+        )
+        self.now = timezone.now()
+        self.today = timezone.localdate()
+
+    def alert(self, days: int = 0, **fields) -> Notification:
+        preference = fields.pop("preference", self.preference)
+        return Notification.objects.create(
+            preference=preference, forecast_date=self.today + timedelta(days=days), **fields
+        )
+
+    def forecast(self, score: float, sunset_in: timedelta = timedelta(hours=2)) -> SunsetForecast:
+        sunset = self.now + sunset_in
+        return make_forecast(
+            self.location,
+            self.today,
+            sunset_time_utc=sunset,
+            golden_hour_start_utc=sunset - timedelta(minutes=45),
+            quality_score=score,
+        )
+
+
+@mock.patch("apps.notifications.services.scheduler.enqueue")
+class DispatchDueTests(AlertTestCase):
+    def test_claims_due_alerts_once(self, enqueue):
+        due = [self.alert(days=0, due_at=self.now - timedelta(minutes=1))]
+        other = NotificationPreference.objects.create(user=self.user, location=self.second_location())
+        due.append(self.alert(days=0, preference=other, due_at=self.now - timedelta(seconds=5)))
+
+        self.assertEqual(scheduler.dispatch_due(), 2)
+        enqueue.assert_called_once_with(scheduler.SEND_TASK, [due[0].pk, due[1].pk])
+        self.assertEqual(set(Notification.objects.values_list("status", flat=True)), {"queued"})
+
+        # A second, overlapping wake finds nothing left to claim
+        enqueue.reset_mock()
+        self.assertEqual(scheduler.dispatch_due(), 0)
+        enqueue.assert_not_called()
+
+    def test_leaves_future_and_settled_alerts(self, enqueue):
+        later = self.alert(days=1, due_at=self.now + timedelta(hours=3))
+        skipped = self.alert(days=0, due_at=self.now - timedelta(hours=1), status="skipped")
+
+        self.assertEqual(scheduler.dispatch_due(), 0)
+        enqueue.assert_not_called()
+        later.refresh_from_db()
+        skipped.refresh_from_db()
+        self.assertEqual((later.status, skipped.status), ("pending", "skipped"))
+
+    @mock.patch("apps.notifications.services.scheduler.SEND_BATCH", 2)
+    def test_sends_in_batches(self, enqueue):
+        for days in range(5):
+            self.alert(days=days - 4, due_at=self.now - timedelta(minutes=days))
+
+        self.assertEqual(scheduler.dispatch_due(), 5)
+        self.assertEqual([len(call.args[1]) for call in enqueue.call_args_list], [2, 2, 1])
+
+    def test_rearms_wake_for_next_slot(self, enqueue):
+        self.alert(days=0, due_at=self.now - timedelta(minutes=1))
+        upcoming = scheduler.slot_of(self.now + timedelta(minutes=5))
+        self.alert(days=1, due_at=upcoming)
+
+        scheduler.dispatch_due()
+        wake = Schedule.objects.get(name=scheduler.WAKE_SCHEDULE)
+        self.assertEqual(wake.next_run, upcoming)
+        self.assertEqual(wake.repeats, 1)
+
+    def test_reaps_alerts_stuck_in_queued(self, enqueue):
+        claimed_at = self.now - scheduler.REQUEUE_AFTER - timedelta(minutes=1)
+        stuck = self.alert(days=-1, status="queued", due_at=claimed_at, queued_at=claimed_at)
+        sending = self.alert(days=0, status="queued", due_at=self.now, queued_at=self.now - timedelta(minutes=1))
+
+        self.assertEqual(scheduler.dispatch_due(), 1)
+        enqueue.assert_called_once_with(scheduler.SEND_TASK, [stuck.pk])
+        stuck.refresh_from_db()
+        sending.refresh_from_db()
+        self.assertEqual((stuck.status, sending.status), ("queued", "queued"))
+        self.assertGreater(stuck.queued_at, sending.queued_at)
+        # The wake comes back for the batch still in flight
+        wake = Schedule.objects.get(name=scheduler.WAKE_SCHEDULE)
+        self.assertEqual(wake.next_run, sending.queued_at + scheduler.REQUEUE_AFTER)
+
+    def second_location(self) -> Location:
+        location, _ = Location.objects.get_or_create_for_point(48.85, 2.35)
+        return location
+
+
+class DailyPlanTests(TestCase):
+    def test_plan_runs_through_run_task(self):
+        scheduler.install_daily_plan()
+        scheduler.install_daily_plan()  # reset, not duplicated
+
+        plan = Schedule.objects.get(name=scheduler.PLAN_SCHEDULE)
+        self.assertEqual((plan.func, plan.schedule_type), ("apps.core.tasks.run_task", Schedule.DAILY))
+        with mock.patch(scheduler.PLAN_TASK, return_value=3) as task:
+            self.assertEqual(run_task(*ast.literal_eval(plan.args)), 3)
+        task.assert_called_once_with()
+
+
+class ReconsiderSwingsTests(AlertTestCase):
+    def test_swing_requeues_skipped_alert(self):
+        alert = self.alert(status="skipped", due_at=self.now - timedelta(hours=1))
+        save_forecasts([self.forecast(30.0)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            save_forecasts([self.forecast(80.0)])
+
+        alert.refresh_from_db()
+        self.assertEqual(alert.status, "pending")
+        self.assertLessEqual(alert.due_at, timezone.now())
+        self.assertTrue(Schedule.objects.filter(name=scheduler.WAKE_SCHEDULE).exists())
+
+    def test_swing_still_below_threshold_leaves_alert(self):
+        alert = self.alert(status="skipped")
+        scheduler.reconsider_swings([(self.forecast(55.0), 30.0)])
+        alert.refresh_from_db()
+        self.assertEqual(alert.status, "skipped")
+
+    def test_downward_swing_leaves_alert(self):
+        alert = self.alert(status="skipped")
+        scheduler.reconsider_swings([(self.forecast(65.0), 90.0)])
+        alert.refresh_from_db()
+        self.assertEqual(alert.status, "skipped")
+
+    def test_swing_after_sunset_leaves_alert(self):
+        alert = self.alert(status="skipped")
+        scheduler.reconsider_swings([(self.forecast(80.0, sunset_in=-timedelta(minutes=5)), 30.0)])
+        alert.refresh_from_db()
+        self.assertEqual(alert.status, "skipped")
+
+    def test_other_dates_and_sent_alerts_are_untouched(self):
+        sent = self.alert(status="sent")
+        tomorrow = self.alert(days=1, status="skipped")
+        scheduler.reconsider_swings([(self.forecast(80.0), 30.0)])
+        sent.refresh_from_db()
+        tomorrow.refresh_from_db()
+        self.assertEqual((sent.status, tomorrow.status), ("sent", "skipped"))
+
+
+@mock.patch("apps.notifications.services.delivery.build_forecasts")
+class SendBatchTests(AlertTestCase):
+    def test_fresh_forecast_is_used(self, build):
+        save_forecasts([self.forecast(80.0)])
+        alert = self.alert(status="queued")
+
+        self.assertEqual(delivery.send_batch([alert.pk]), {"sent": 1})
+        build.assert_not_called()
+
+    def test_expired_forecast_is_rebuilt(self, build):
+        save_forecasts([self.forecast(30.0)])
+        SunsetForecast.objects.update(fetched_at=self.now - timedelta(days=2))
+        build.return_value = [self.forecast(80.0)]
+        alert = self.alert(status="queued")
+
+        self.assertEqual(delivery.send_batch([alert.pk]), {"sent": 1})
+        build.assert_called_once_with([self.location], [self.today])
+
+    def test_outcomes_are_saved_as_each_alert_is_sent(self, build):
+        other, _ = Location.objects.get_or_create_for_point(48.85, 2.35)
+        preference = NotificationPreference.objects.create(user=self.user, location=other)
+        save_forecasts([self.forecast(80.0), make_forecast(other, self.today, quality_score=80.0)])
+        first, second = self.alert(status="queued"), self.alert(preference=preference, status="queued")
+
+        # The task is killed while sending the second alert
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages", side_effect=[1, SystemExit]
+        ), self.assertRaises(SystemExit):
+            delivery.send_batch([first.pk, second.pk])
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.status, second.status), ("sent", "queued"))
+        self.assertIsNotNone(first.sent_at)
+
+
+def resolves_to(address: str):
+    return mock.patch("socket.getaddrinfo", return_value=[(None, None, None, "", (address, 443))])
+
+
+class PushSubscriptionViewTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="watcher", password="x")
+        self.client.force_login(self.user)
+
+    def subscribe(self, endpoint: str):
+        return self.client.post(
+            reverse("push-subscription"),
+            {"endpoint": endpoint, "keys": {"p256dh": "BNc", "auth": "tBH"}},
+            content_type="application/json",
+        )
+
+    def test_public_https_endpoint_is_saved(self):
+        with resolves_to("142.250.180.10"):
+            response = self.subscribe("https://fcm.googleapis.com/fcm/send/abc")
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(PushSubscription.objects.filter(user=self.user).exists())
+
+    def test_internal_endpoints_are_rejected(self):
+        for endpoint, address in [
+            ("http://fcm.googleapis.com/fcm/send/abc", "142.250.180.10"),
+            ("https://127.0.0.1/push", "127.0.0.1"),
+            ("https://169.254.169.254/latest/meta-data", "169.254.169.254"),
+            ("https://push.internal/x", "10.0.0.7"),
+            ("https://[::ffff:192.168.1.1]/x", "::ffff:192.168.1.1"),
+            ("https://rebound.example/x", "fe80::1%eth0"),
+        ]:
+            with self.subTest(endpoint), resolves_to(address):
+                response = self.subscribe(endpoint)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("endpoint", response.json())
+        self.assertFalse(PushSubscription.objects.exists())
+
+    @mock.patch("apps.notifications.services.webpush.DEV_ENDPOINT_HOSTS", {"127.0.0.1"})
+    def test_configured_dev_host_is_allowed(self):
+        response = self.subscribe("http://127.0.0.1:8765/push/abc")
+        self.assertEqual(response.status_code, 201)
+
+
+class EncryptTests(SimpleTestCase):
+    def setUp(self):
+        self.ua_private = ec.generate_private_key(ec.SECP256R1())
+        ua_public = self.ua_private.public_key().public_bytes(
+            serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint
+        )
+        self.auth = os.urandom(16)
+        self.p256dh = base64.urlsafe_b64encode(ua_public).rstrip(b"=").decode()
+        self.auth_b64 = base64.urlsafe_b64encode(self.auth).rstrip(b"=").decode()
+
+    def decrypt(self, body: bytes) -> bytes:
+        """The user agent's side of RFC 8291."""
+        salt, record_size, key_length = body[:16], int.from_bytes(body[16:20], "big"), body[20]
+        as_public, ciphertext = body[21:21 + key_length], body[21 + key_length:]
+        self.assertEqual(record_size, webpush.RECORD_SIZE)
+        shared = self.ua_private.exchange(
+            ec.ECDH(), ec.EllipticCurvePublicKey.from_encoded_point(ec.SECP256R1(), as_public)
+        )
+        ua_public = base64.urlsafe_b64decode(self.p256dh + "==")
+        ikm = HKDF(hashes.SHA256(), 32, self.auth, b"WebPush: info\x00" + ua_public + as_public).derive(shared)
+        cek = HKDF(hashes.SHA256(), 16, salt, b"Content-Encoding: aes128gcm\x00").derive(ikm)
+        nonce = HKDF(hashes.SHA256(), 12, salt, b"Content-Encoding: nonce\x00").derive(ikm)
+        plaintext = AESGCM(cek).decrypt(nonce, ciphertext, None)
+        self.assertEqual(plaintext[-1:], b"\x02")  # the last and only record
+        return plaintext[:-1]
+
+    def test_round_trip(self):
+        for payload in (b"", b'{"title": "Sunset at 20:31"}', os.urandom(webpush.MAX_PAYLOAD)):
+            with self.subTest(size=len(payload)):
+                body = webpush.encrypt(payload, self.p256dh, self.auth_b64)
+                self.assertEqual(self.decrypt(body), payload)
+
+    def test_each_message_gets_its_own_salt_and_key(self):
+        first, second = (webpush.encrypt(b"same", self.p256dh, self.auth_b64) for _ in range(2))
+        self.assertNotEqual(first[:16], second[:16])
+        self.assertNotEqual(first[21:86], second[21:86])
+
+    def test_oversized_payload_is_refused(self):
+        with self.assertRaises(ValueError):
+            webpush.encrypt(os.urandom(webpush.MAX_PAYLOAD + 1), self.p256dh, self.auth_b64)
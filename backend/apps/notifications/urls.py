@@ -0,0 +1,6 @@
+from django.urls import path
+from .views import PushSubscriptionView
+
+urlpatterns = [
+    path("push/", PushSubscriptionView.as_view(), name="push-subscription"),
+]
@@ -0,0 +1,40 @@
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .models import PushSubscription
+from .serializers import PushSubscriptionSerializer
+from .services import webpush
+
+
+class PushSubscriptionView(APIView):
+    """
+    GET    /api/v1/notifications/push/ — the VAPID public key to subscribe with
+    POST   /api/v1/notifications/push/ — register this browser's subscription
+    DELETE /api/v1/notifications/push/ — forget it ({"endpoint": …})
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not webpush.ENABLED:
+            return Response({"error": "Push alerts are not configured."}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response({"public_key": webpush.vapid_public_key()})
+
+    def post(self, request):
+        ser = PushSubscriptionSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        data = ser.validated_data
+        _, created = PushSubscription.objects.update_or_create(
+            endpoint=data["endpoint"],
+            defaults={"user": request.user, "p256dh": data["keys"]["p256dh"], "auth": data["keys"]["auth"]},
+        )
+        return Response(ser.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    def delete(self, request):
+        endpoint = request.data.get("endpoint")
+        if not endpoint:
+            return Response({"error": "endpoint is required."}, status=status.HTTP_400_BAD_REQUEST)
+        PushSubscription.objects.filter(user=request.user, endpoint=endpoint).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forecasts', '0003_forecastsnapshot'),
+        ('ratings', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sunsetrating',
+            index=models.Index(fields=['forecast', '-created_at', '-id'], name='rating_forecast_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sunsetrating',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='rating_user_created_idx'),
+        ),
+        migrations.AlterField(
+            model_name='sunsetrating',
+            name='forecast',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='ratings', to='forecasts.sunsetforecast'),
+        ),
+        migrations.AlterField(
+            model_name='sunsetrating',
+            name='user',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ratings', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
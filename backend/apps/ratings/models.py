@@ -8,14 +8,22 @@ User = get_user_model()
 class SunsetRating(models.Model):
     """User-submitted rating used as ML training data."""
 
-    forecast = models.ForeignKey(SunsetForecast, on_delete=models.CASCADE, related_name="ratings")
-    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="ratings")
+    # Indexed by the composite indexes below
+    forecast = models.ForeignKey(SunsetForecast, on_delete=models.CASCADE, related_name="ratings", db_index=False)
+    user = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name="ratings", db_index=False
+    )
     score = models.PositiveSmallIntegerField()  # 1–5
     comment = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ["-created_at"]
+        # Match the keyset-paginated lists' sort order, per forecast and per user
+        indexes = [
+            models.Index(fields=["forecast", "-created_at", "-id"], name="rating_forecast_created_idx"),
+            models.Index(fields=["user", "-created_at", "-id"], name="rating_user_created_idx"),
+        ]
 
     def __str__(self):
         return f"Rating {self.score}/5 for {self.forecast}"
@@ -1,6 +1,7 @@
 from django.urls import path
-from .views import RatingCreateView
+from .views import MyRatingListView, RatingListCreateView
 
 urlpatterns = [
-    path("", RatingCreateView.as_view(), name="rating-create"),
+    path("", RatingListCreateView.as_view(), name="rating-list-create"),
+    path("mine/", MyRatingListView.as_view(), name="rating-mine"),
 ]
@@ -1,13 +1,29 @@
 from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from apps.core.pagination import KeysetPagination
 from .models import SunsetRating
 from .serializers import SunsetRatingSerializer
 
 
-class RatingCreateView(APIView):
-    """POST /api/v1/ratings/ — submit a 1–5 star rating."""
+class RatingPagination(KeysetPagination):
+    ordering = ("-created_at", "-id")
+
+
+class RatingListCreateView(APIView):
+    """
+    GET  /api/v1/ratings/?forecast=<id> — a forecast's ratings, newest first (keyset-paginated)
+    POST /api/v1/ratings/ — submit a 1–5 star rating.
+    """
+
+    def get(self, request):
+        try:
+            forecast_id = int(request.query_params["forecast"])
+        except (KeyError, ValueError):
+            return Response({"error": "forecast must be a forecast id."}, status=status.HTTP_400_BAD_REQUEST)
+        return _paginated(request, self, SunsetRating.objects.filter(forecast_id=forecast_id))
 
     def post(self, request):
         ser = SunsetRatingSerializer(data=request.data)
@@ -21,3 +37,18 @@ class RatingCreateView(APIView):
             comment=ser.validated_data.get("comment", ""),
         )
         return Response(SunsetRatingSerializer(rating).data, status=status.HTTP_201_CREATED)
+
+
+class MyRatingListView(APIView):
+    """GET /api/v1/ratings/mine/ — the signed-in user's ratings, newest first (keyset-paginated)."""
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return _paginated(request, self, SunsetRating.objects.filter(user=request.user))
+
+
+def _paginated(request, view, queryset) -> Response:
+    paginator = RatingPagination()
+    page = paginator.paginate_queryset(queryset, request, view=view)
+    return paginator.get_paginated_response(SunsetRatingSerializer(page, many=True).data)
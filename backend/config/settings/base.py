@@ -24,6 +24,7 @@ INSTALLED_APPS = [
     "corsheaders",
     "django_q",
     # VesperCast apps
+    "apps.core",
     "apps.locations",
     "apps.forecasts",
     "apps.ratings",
@@ -33,6 +34,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "apps.core.routers.ReplicaPinMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -40,6 +42,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "apps.core.profiling.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "config.urls"
@@ -86,19 +89,155 @@ REST_FRAMEWORK = {
     ],
 }
 
-# Django-Q2 configuration (ORM broker — no Redis needed)
+# Read replicas — aliases in DATABASES that serve reads for READ_REPLICA_APPS.
+# After a write the client is pinned to the primary for REPLICA_PIN_SECONDS;
+# unreachable replicas are re-probed every REPLICA_HEALTH_CHECK_SECONDS.
+DATABASE_ROUTERS = ["apps.core.routers.ReplicaRouter"]
+DATABASE_REPLICAS = []
+READ_REPLICA_APPS = ["forecasts", "locations", "ratings"]
+REPLICA_PIN_SECONDS = config("REPLICA_PIN_SECONDS", default=5.0, cast=float)
+REPLICA_HEALTH_CHECK_SECONDS = 30.0
+
+# Django-Q2 configuration (ORM broker — no Redis needed).  Each lane is a
+# cluster with its own queue and workers; the top level is the `interactive`
+# lane, start the others with `Q_CLUSTER_NAME=<lane> manage.py qcluster`.
 Q_CLUSTER = {
     "name": "vespercast",
+    "cluster_name": "interactive",
     "workers": 2,
     "recycle": 500,
     "timeout": 60,
+    "retry": 90,
     "compress": True,
     "save_limit": 250,
     "queue_limit": 500,
     "cpu_affinity": 1,
     "label": "Django Q",
     "orm": "default",
+    "ALT_CLUSTERS": {
+        # Bulk precompute and rescoring: few workers, long timeouts
+        "batch": {"workers": 2, "timeout": 1800, "retry": 1860, "queue_limit": 50},
+        "notifications": {"workers": 2, "timeout": 120, "retry": 180},
+    },
+}
+
+# Lane, timeout (s) and retry policy per background task; see apps.core.tasks
+BACKGROUND_TASKS = {
+    "apps.forecasts.tasks.refresh_forecasts": {"lane": "interactive", "timeout": 30, "max_attempts": 3, "retry_delay": 15},
+    "apps.forecasts.tasks.prune_forecast_history": {"lane": "batch", "timeout": 1800},
+    "apps.notifications.tasks.plan_alerts": {"lane": "batch", "timeout": 900},
+    "apps.notifications.tasks.dispatch_due": {"lane": "notifications", "timeout": 60, "max_attempts": 3, "retry_delay": 10},
+    "apps.notifications.tasks.send_alerts": {"lane": "notifications", "timeout": 110, "max_attempts": 3, "retry_delay": 20},
 }
 
-# Forecast cache TTL in hours
-FORECAST_CACHE_HOURS = 3
+# Pre-sunset alerts: due times are rounded down to slots of this many
+# seconds, and each slot's alerts are sent in batches of ALERT_SEND_BATCH
+ALERT_SLOT_SECONDS = 60
+ALERT_SEND_BATCH = 500
+# Alerts still queued this long after being claimed go back to pending; keep
+# it above send_alerts' timeout × attempts plus retry delays
+ALERT_REQUEUE_SECONDS = 900
+
+# Web Push (VAPID).  The private key is the raw P-256 key, base64url encoded;
+# push alerts are off while it is unset
+WEBPUSH_VAPID_PRIVATE_KEY = config("WEBPUSH_VAPID_PRIVATE_KEY", default="")
+WEBPUSH_VAPID_SUBJECT = config("WEBPUSH_VAPID_SUBJECT", default="mailto:alerts@vespercast.local")
+WEBPUSH_CONCURRENCY = 32  # pushes in flight at once per send task
+WEBPUSH_MAX_ATTEMPTS = 3
+# Subscriptions must be https on public hosts; these hosts (e.g. the local
+# stand-in's push service) are exempt, for development only
+WEBPUSH_DEV_ENDPOINT_HOSTS = config(
+    "WEBPUSH_DEV_ENDPOINT_HOSTS", default="", cast=lambda v: [s.strip() for s in v.split(",") if s.strip()]
+)
+
+# Forecast cache expiry follows the upstream model runs: a new run starts
+# every model_cycle_hours (UTC) and is served run_available_after_minutes
+# later.  A forecast is kept across runs_kept[lead days] runs, the last
+# entry applying to every longer lead.
+FORECAST_CACHE = {"model_cycle_hours": 6, "run_available_after_minutes": 270, "runs_kept": [1, 1, 2, 2, 4]}
+
+# A refresh only rewrites a forecast if some input moved by more than this
+# (percentage points, mm, km, km/h, score points); otherwise just fetched_at
+# is bumped.  A score move of FORECAST_SCORE_SWING or more is signalled to
+# the alert scheduler.
+FORECAST_CHANGE_THRESHOLDS = {
+    "cloud_cover_total": 5.0,
+    "cloud_cover_low": 5.0,
+    "cloud_cover_mid": 5.0,
+    "cloud_cover_high": 5.0,
+    "relative_humidity": 5.0,
+    "precipitation_probability": 10.0,
+    "precipitation": 0.2,
+    "visibility": 2.0,
+    "wind_speed": 5.0,
+    "quality_score": 2.0,
+    "ensemble_spread": 2.0,
+}
+FORECAST_SCORE_SWING = 15.0
+
+# Forecast snapshot history: full detail for raw_days, then thinned to one
+# snapshot per location every bucket_hours, and dropped after keep_days.
+# Retention deletes `batch` rows at a time.
+FORECAST_HISTORY = {"raw_days": 14, "keep_days": 365, "bucket_hours": 6, "batch": 5000}
+
+# Backtesting (manage.py backtest): where archive samples are checkpointed,
+# worker processes, and location-days per vectorized scorer call
+FORECAST_BACKTEST = {"checkpoint_dir": BASE_DIR / "backtest", "concurrency": 4, "score_batch": 1_000_000}
+
+# `manage.py warm_forecasts` defaults: how many locations and days ahead to
+# warm, worker processes, the demand lookback window, and how many recent
+# forecast requests one saved/alerted user counts as
+FORECAST_WARM = {"top": 200, "days": 3, "concurrency": 4, "lookback_days": 7, "follower_weight": 5}
+
+# Per-location request counts that rank warm_forecasts: each process buffers
+# them and flushes every flush_seconds; daily counts are kept keep_days
+FORECAST_DEMAND = {"flush_seconds": 30, "keep_days": 30}
+
+# Open-Meteo models to combine into an ensemble forecast, e.g.
+# "ecmwf_ifs025,gfs_seamless,icon_seamless"; empty uses the single best-match model
+FORECAST_ENSEMBLE_MODELS = config(
+    "FORECAST_ENSEMBLE_MODELS", default="", cast=lambda v: [s.strip() for s in v.split(",") if s.strip()]
+)
+
+# Cloud sampled this far out toward the sunset (km), on geohash cells of
+# cell_precision chars (5 ≈ 5 km, cached per cell until the next model run).
+# weights blend the observer's score (first) with each sample's; an empty
+# distances_km turns sampling off.
+FORECAST_SUNWARD = {"distances_km": [25, 50, 100], "weights": [0.4, 0.25, 0.2, 0.15], "cell_precision": 5}
+
+# Step of the full-evening timeline (golden hour start to civil dusk)
+# served by /api/v1/forecasts/timeline/
+FORECAST_TIMELINE_STEP_MINUTES = 1
+
+# Locations within one geohash cell share a row (7 chars ≈ 153 m cells)
+LOCATION_GEOHASH_PRECISION = 7
+
+# Shared token buckets per upstream (tokens/second, burst), enforced across all
+# web and task processes.  Nominatim's usage policy allows 1 request/second.
+UPSTREAM_RATE_LIMITS = {
+    "open_meteo": {"rate": 5.0, "burst": 10},
+    "nominatim": {"rate": 1.0, "burst": 1},
+    "open_elevation": {"rate": 2.0, "burst": 4},
+}
+# How long a call may queue for a token before it is deferred
+UPSTREAM_BUDGET_MAX_WAIT = 2.0  # web requests
+UPSTREAM_BUDGET_TASK_MAX_WAIT = 30.0  # background tasks
+
+# Upstream endpoints — override to point at the local stand-in (`make standin`)
+OPEN_METEO_URL = config("OPEN_METEO_URL", default="https://api.open-meteo.com/v1/forecast")
+OPEN_METEO_ARCHIVE_URL = config("OPEN_METEO_ARCHIVE_URL", default="https://archive-api.open-meteo.com/v1/archive")
+OPEN_ELEVATION_URL = config("OPEN_ELEVATION_URL", default="https://api.open-elevation.com/api/v1/lookup")
+NOMINATIM_DOMAIN = config("NOMINATIM_DOMAIN", default="nominatim.openstreetmap.org")
+NOMINATIM_SCHEME = config("NOMINATIM_SCHEME", default="https")
+
+# Raw upstream response archive: off, record (cache honoring freshness
+# headers) or replay (serve only from the archive, never the network)
+UPSTREAM_ARCHIVE_MODE = config("UPSTREAM_ARCHIVE_MODE", default="off")
+UPSTREAM_ARCHIVE_DIR = config("UPSTREAM_ARCHIVE_DIR", default=str(BASE_DIR / "upstream-archive"))
+UPSTREAM_ARCHIVE_DEFAULT_TTL = 900  # seconds, when the upstream sends no freshness headers
+
+# Request profiling — off unless a sample rate or a header token is set
+PROFILING_SAMPLE_RATE = config("PROFILING_SAMPLE_RATE", default=0.0, cast=float)
+PROFILING_TOKEN = config("PROFILING_TOKEN", default="")
+PROFILING_INTERVAL = 0.002  # seconds between stack samples
+PROFILING_DIR = config("PROFILING_DIR", default=str(BASE_DIR / "profiles"))
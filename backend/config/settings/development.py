@@ -10,9 +10,17 @@ DATABASES = {
     "default": {
         "ENGINE": "django.contrib.gis.db.backends.spatialite",
         "NAME": BASE_DIR / "db.sqlite3",  # noqa: F405
+        "CONN_MAX_AGE": config("DB_CONN_MAX_AGE", default=60, cast=int),  # noqa: F405
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+# A second alias on the same SQLite file stands in for a read replica, so the
+# router (replica reads, primary pinning, health fallback) runs end to end
+if config("DB_READ_REPLICA", default=False, cast=bool):  # noqa: F405
+    DATABASES["replica"] = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
+    DATABASE_REPLICAS = ["replica"]
+
 SPATIALITE_LIBRARY_PATH = "/opt/homebrew/lib/mod_spatialite.dylib"
 GDAL_LIBRARY_PATH = "/Applications/Postgres.app/Contents/Versions/16/lib/libgdal.dylib"
 GEOS_LIBRARY_PATH = "/Applications/Postgres.app/Contents/Versions/16/lib/libgeos_c.dylib"
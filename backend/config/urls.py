@@ -7,4 +7,6 @@ urlpatterns = [
     path("api/v1/forecasts/", include("apps.forecasts.urls")),
     path("api/v1/ratings/", include("apps.ratings.urls")),
     path("api/v1/accounts/", include("apps.accounts.urls")),
+    path("api/v1/notifications/", include("apps.notifications.urls")),
+    path("metrics", include("apps.core.urls")),
 ]
@@ -0,0 +1,211 @@
+"""
+Load driver for the forecast and geocode endpoints.
+
+Replays a realistic request mix — a Zipf-weighted set of hot locations,
+a tail of one-off coordinates, mostly-today dates and repeat address
+searches — against a running backend, then reports latency percentiles,
+throughput and how many upstream calls the run cost (read from the
+stand-in's /__stats).
+
+Usage:
+    python -m loadtest.driver --base-url http://127.0.0.1:8000 \\
+        --standin-url http://127.0.0.1:8765 --requests 2000 --concurrency 16
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+import httpx
+
+FORECAST_PATH = "/api/v1/forecasts/"
+GEOCODE_PATH = "/api/v1/locations/geocode/"
+
+SAMPLE_ADDRESSES = [
+    "Santa Monica Pier, CA",
+    "Griffith Observatory, Los Angeles",
+    "Mallory Square, Key West",
+    "Oia, Santorini",
+    "Uluru, Northern Territory",
+    "Cabo da Roca, Portugal",
+    "Haleakala Summit, Maui",
+    "Table Mountain, Cape Town",
+    "Nowhere In Particular",  # exercises the not-found path
+]
+
+
+@dataclass
+class Sample:
+    endpoint: str
+    status: int
+    seconds: float
+
+
+class RequestMix:
+    """Deterministic generator of (endpoint, kwargs) request specs."""
+
+    def __init__(self, seed: int, hot_locations: int, geocode_share: float, cold_share: float, days: int):
+        self.rng = random.Random(seed)
+        self.geocode_share = geocode_share
+        self.cold_share = cold_share
+        self.days = days
+        self.hot = [
+            (round(self.rng.uniform(-50, 60), 4), round(self.rng.uniform(-170, 170), 4))
+            for _ in range(hot_locations)
+        ]
+        # Zipf-ish popularity: a handful of places take most of the traffic
+        self.weights = [1 / (rank + 1) for rank in range(hot_locations)]
+
+    def next(self) -> tuple[str, dict]:
+        rng = self.rng
+        if rng.random() < self.geocode_share:
+            return "geocode", {"json": {"address": rng.choice(SAMPLE_ADDRESSES)}}
+
+        if rng.random() < self.cold_share:
+            lat, lng = round(rng.uniform(-55, 65), 4), round(rng.uniform(-179, 179), 4)
+        else:
+            lat, lng = rng.choices(self.hot, weights=self.weights)[0]
+        # Mostly today; with --days 1 there is no later date to draw
+        offset = 0 if self.days == 1 or rng.random() < 0.6 else rng.randrange(1, self.days)
+        target = (date.today() + timedelta(days=offset)).isoformat()
+        return "forecast", {"params": {"lat": lat, "lng": lng, "date": target}}
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already-sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+def _upstream_stats(client: httpx.Client, standin_url: str | None) -> dict:
+    if not standin_url:
+        return {}
+    try:
+        return client.get(f"{standin_url}/__stats", timeout=5.0).json()
+    except httpx.HTTPError:
+        return {}
+
+
+def run(args) -> dict:
+    mix = RequestMix(args.seed, args.hot_locations, args.geocode_share, args.cold_share, args.days)
+    specs = [mix.next() for _ in range(args.requests)]
+    samples: list[Sample] = []
+    lock = threading.Lock()
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    with httpx.Client(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        before = _upstream_stats(client, args.standin_url)
+
+        def fire(spec):
+            endpoint, kwargs = spec
+            started = time.perf_counter()
+            try:
+                if endpoint == "geocode":
+                    resp = client.post(GEOCODE_PATH, **kwargs)
+                else:
+                    resp = client.get(FORECAST_PATH, **kwargs)
+                status = resp.status_code
+            except httpx.HTTPError:
+                status = 0
+            sample = Sample(endpoint, status, time.perf_counter() - started)
+            with lock:
+                samples.append(sample)
+
+        wall_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(fire, specs))
+        wall = time.perf_counter() - wall_start
+
+        after = _upstream_stats(client, args.standin_url)
+
+    return summarize(samples, wall, before, after)
+
+
+def summarize(samples: list[Sample], wall: float, before: dict, after: dict) -> dict:
+    by_endpoint: dict[str, list[Sample]] = defaultdict(list)
+    for s in samples:
+        by_endpoint[s.endpoint].append(s)
+    by_endpoint["all"] = samples
+
+    endpoints = {}
+    for name, group in by_endpoint.items():
+        latencies = sorted(s.seconds * 1000 for s in group)
+        statuses = defaultdict(int)
+        for s in group:
+            statuses[s.status] += 1
+        endpoints[name] = {
+            "requests": len(group),
+            "errors": sum(1 for s in group if s.status == 0 or s.status >= 500),
+            "statuses": dict(sorted(statuses.items())),
+            "p50_ms": round(percentile(latencies, 50), 1),
+            "p95_ms": round(percentile(latencies, 95), 1),
+            "p99_ms": round(percentile(latencies, 99), 1),
+            "max_ms": round(latencies[-1], 1) if latencies else 0.0,
+        }
+
+    upstream = {}
+    for upstream_name, count in after.get("requests", {}).items():
+        upstream[upstream_name] = {
+            "calls": count - before.get("requests", {}).get(upstream_name, 0),
+            "errors": after.get("errors", {}).get(upstream_name, 0) - before.get("errors", {}).get(upstream_name, 0),
+        }
+
+    return {
+        "wall_seconds": round(wall, 2),
+        "throughput_rps": round(len(samples) / wall, 1) if wall else 0.0,
+        "endpoints": endpoints,
+        "upstream": upstream,
+    }
+
+
+def print_report(report: dict):
+    print(f"\n  {report['wall_seconds']}s wall, {report['throughput_rps']} req/s\n")
+    print(f"  {'endpoint':<10} {'reqs':>6} {'errs':>5} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    for name, e in report["endpoints"].items():
+        print(
+            f"  {name:<10} {e['requests']:>6} {e['errors']:>5} "
+            f"{e['p50_ms']:>7.1f}ms {e['p95_ms']:>6.1f}ms {e['p99_ms']:>6.1f}ms {e['max_ms']:>6.1f}ms"
+        )
+    if report["upstream"]:
+        print("\n  upstream calls")
+        for name, u in sorted(report["upstream"].items()):
+            print(f"    {name:<16} {u['calls']:>6}  ({u['errors']} errors)")
+    print()
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Replay a forecast/geocode request mix and report latency.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--standin-url", default="http://127.0.0.1:8765", help="stand-in server for upstream call counts ('' to skip)")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--hot-locations", type=int, default=50)
+    parser.add_argument("--geocode-share", type=float, default=0.1, help="fraction of requests that are geocodes")
+    parser.add_argument("--cold-share", type=float, default=0.2, help="fraction of forecasts for one-off coordinates")
+    parser.add_argument("--days", type=int, default=7, help="forecast dates are drawn from today + [0, days)")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+    if args.days < 1:
+        parser.error("--days must be at least 1")
+
+    report = run(args)
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Load driver for Web Push fan-out.
+
+Gets --subscriptions subscriptions from the stand-in's push service (a
+--gone-rate share of them already expired), then sends --messages alerts
+spread over them through apps.notifications.services.webpush — the same
+encryption, VAPID signing, pooling and backoff as a real send — and reports
+messages per second and per minute, the outcomes, and what the stand-in
+decrypted.  No database is needed; a throwaway VAPID key is generated.
+
+Usage:
+    python -m loadtest.push --standin-url http://127.0.0.1:8765 \\
+        --subscriptions 1000 --messages 5000 --concurrency 64
+"""
+
+import argparse
+import base64
+import json
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+
+def _vapid_key() -> str:
+    from cryptography.hazmat.primitives.asymmetric import ec
+
+    private = ec.generate_private_key(ec.SECP256R1()).private_numbers().private_value
+    return base64.urlsafe_b64encode(private.to_bytes(32, "big")).rstrip(b"=").decode()
+
+
+def _setup(concurrency: int, max_attempts: int):
+    import django
+    from django.conf import settings
+
+    settings.configure(
+        SECRET_KEY="loadtest",
+        INSTALLED_APPS=["django_q", "apps.core"],
+        DATABASES={"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}},
+        WEBPUSH_VAPID_PRIVATE_KEY=_vapid_key(),
+        WEBPUSH_CONCURRENCY=concurrency,
+        WEBPUSH_MAX_ATTEMPTS=max_attempts,
+    )
+    django.setup()
+
+
+def run(args) -> dict:
+    _setup(args.concurrency, args.max_attempts)
+    from apps.notifications.services import webpush
+
+    standin = httpx.Client(base_url=args.standin_url, timeout=60.0)
+    subscriptions = standin.get(
+        "/push/__subscribe", params={"count": args.subscriptions, "gone_rate": args.gone_rate}
+    ).json()
+    standin.get("/__reset")
+
+    payload = json.dumps({"title": "Great sunset at Stand-in Beach", "body": "Scores 82/100"}).encode()
+    messages = [
+        webpush.PushMessage(i, sub["endpoint"], sub["keys"]["p256dh"], sub["keys"]["auth"], payload)
+        for i, sub in ((i, subscriptions[i % len(subscriptions)]) for i in range(args.messages))
+    ]
+
+    started = time.perf_counter()
+    results = webpush.send_all(messages)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "messages": len(messages),
+        "seconds": round(elapsed, 2),
+        "per_second": round(len(messages) / elapsed, 1),
+        "per_minute": round(len(messages) / elapsed * 60),
+        "outcomes": dict(Counter(r.outcome for r in results)),
+        "standin": standin.get("/__stats").json().get("push", {}),
+    }
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Measure Web Push fan-out against the stand-in push service.")
+    parser.add_argument("--standin-url", default="http://127.0.0.1:8765")
+    parser.add_argument("--subscriptions", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64, help="messages in flight at once")
+    parser.add_argument("--gone-rate", type=float, default=0.02, help="share of subscriptions already expired")
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+        return
+    print(
+        f"\n  {report['messages']} pushes in {report['seconds']}s: "
+        f"{report['per_second']}/s ({report['per_minute']}/min)"
+    )
+    print(f"  outcomes: {report['outcomes']}")
+    print(f"  stand-in: {report['standin']}\n")
+
+
+if __name__ == "__main__":
+    main()
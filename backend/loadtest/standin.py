@@ -0,0 +1,507 @@
+"""
+Local stand-in for the free upstream APIs VesperCast depends on.
+
+Serves just enough of Open-Meteo (/v1/forecast, including multi-location
+requests, and the historical /v1/archive), Nominatim (/search) and open-elevation (/api/v1/lookup) for the
+backend to run end-to-end without touching the network.  Weather is
+synthetic but deterministic per (model, lat, lng, date), so repeated runs
+score identically.
+
+It is also a Web Push service: GET /push/__subscribe hands out browser-like
+subscriptions (endpoint plus p256dh/auth keys), and POST /push/<token>
+checks the VAPID header and decrypts the aes128gcm body like a real push
+service would, answering 201, or 410 for subscriptions created as gone.
+Over plain HTTP clients fall back to HTTP/1.1, so this exercises pooling
+and fan-out rather than HTTP/2 multiplexing.
+
+Usage:
+    python -m loadtest.standin --port 8765 --latency-ms 80 --jitter-ms 40 --error-rate 0.02
+
+Point the backend at it with:
+    OPEN_METEO_URL=http://127.0.0.1:8765/v1/forecast
+    OPEN_METEO_ARCHIVE_URL=http://127.0.0.1:8765/v1/archive
+    OPEN_ELEVATION_URL=http://127.0.0.1:8765/api/v1/lookup
+    NOMINATIM_DOMAIN=127.0.0.1:8765 NOMINATIM_SCHEME=http
+
+Control endpoints:
+    GET /__stats             per-upstream request / error counts, push deliveries
+    GET /push/__subscribe?count=N&gone_rate=0.05
+                             N new push subscriptions, that fraction already expired
+    GET /__reset             zero the counters
+    GET /__config?k=v&...    read or change latency / error injection at runtime
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import logging
+import math
+import random
+import secrets
+import threading
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, fields
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+logger = logging.getLogger(__name__)
+
+HOURLY_UNITS = {
+    "cloudcover": "%",
+    "cloudcover_low": "%",
+    "cloudcover_mid": "%",
+    "cloudcover_high": "%",
+    "relativehumidity_2m": "%",
+    "precipitation_probability": "%",
+    "precipitation": "mm",
+    "visibility": "m",
+    "windspeed_10m": "km/h",
+}
+
+MAX_FORECAST_DAYS = 16
+MAX_ARCHIVE_DAYS = 366 * 5
+# Forecast-only variables the archive (reanalysis) endpoint rejects
+FORECAST_ONLY = {"precipitation_probability", "visibility"}
+
+
+@dataclass
+class Faults:
+    """Latency and error injection applied to every upstream request."""
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 503
+
+
+class Stats:
+    """Thread-safe request / error counters keyed by upstream name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Counter()
+        self.errors = Counter()
+
+    def record(self, upstream: str, failed: bool = False):
+        with self._lock:
+            self.requests[upstream] += 1
+            if failed:
+                self.errors[upstream] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"requests": dict(self.requests), "errors": dict(self.errors)}
+
+    def reset(self):
+        with self._lock:
+            self.requests.clear()
+            self.errors.clear()
+
+
+# ── Synthetic data ────────────────────────────────────────────────────────────
+
+def _rng(*parts) -> random.Random:
+    key = "|".join(str(p) for p in parts).encode()
+    return random.Random(int.from_bytes(hashlib.sha1(key).digest()[:8], "big"))
+
+
+def _resolve_timezone(name: str, lng: float) -> tuple[str, ZoneInfo | timezone]:
+    if name in ("", "GMT", "UTC"):
+        return "GMT", timezone.utc
+    if name == "auto":
+        offset = round(lng / 15)
+        name = f"Etc/GMT-{offset}" if offset >= 0 else f"Etc/GMT+{abs(offset)}"
+    try:
+        return name, ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Invalid timezone: {name}")
+
+
+def _hourly_series(variable: str, lat: float, lng: float, day: date, model: str) -> list:
+    """24 plausible values for one variable on one day."""
+    rng = _rng(model, variable, round(lat, 2), round(lng, 2), day.isoformat())
+    values = []
+    if variable == "precipitation":
+        wet = rng.random() < 0.25
+        for _ in range(24):
+            values.append(round(rng.uniform(0, 3), 1) if wet and rng.random() < 0.5 else 0.0)
+    elif variable == "visibility":
+        base = rng.uniform(2_000, 50_000)
+        for _ in range(24):
+            values.append(None if rng.random() < 0.03 else round(max(200.0, base + rng.gauss(0, 3_000)), 0))
+    elif variable == "windspeed_10m":
+        base = rng.uniform(2, 35)
+        for h in range(24):
+            values.append(round(max(0.0, base + 6 * math.sin(h / 24 * 2 * math.pi) + rng.gauss(0, 2)), 1))
+    else:
+        # Percentages: a slowly drifting daily base with hourly noise
+        base = rng.uniform(0, 100)
+        drift = rng.uniform(-2, 2)
+        for h in range(24):
+            values.append(int(min(100, max(0, base + drift * h + rng.gauss(0, 6)))))
+    return values
+
+
+def _forecast_for_location(
+    lat: float,
+    lng: float,
+    start: date,
+    end: date,
+    variables: list[str],
+    tz_param: str,
+    model: str,
+) -> dict:
+    tz_name, tz = _resolve_timezone(tz_param, lng)
+    local_start = datetime.combine(start, datetime.min.time())
+    offset = tz.utcoffset(local_start)
+
+    days = (end - start).days + 1
+    times = []
+    hourly: dict[str, list] = {v: [] for v in variables}
+    for d in range(days):
+        day = start + timedelta(days=d)
+        times.extend(f"{day.isoformat()}T{h:02d}:00" for h in range(24))
+        for v in variables:
+            hourly[v].extend(_hourly_series(v, lat, lng, day, model))
+
+    return {
+        "latitude": round(lat, 4),
+        "longitude": round(lng, 4),
+        "generationtime_ms": 0.1,
+        "utc_offset_seconds": int(offset.total_seconds()),
+        "timezone": tz_name,
+        "timezone_abbreviation": tz_name.rsplit("/", 1)[-1],
+        "elevation": round(_rng("elevation", round(lat, 2), round(lng, 2)).uniform(0, 1500), 1),
+        "hourly_units": {"time": "iso8601", **{v: HOURLY_UNITS.get(v, "") for v in variables}},
+        "hourly": {"time": times, **hourly},
+    }
+
+
+def open_meteo_forecast(query: dict[str, list[str]]) -> tuple[int, object]:
+    """Mimic GET /v1/forecast, returning (status, body)."""
+    return _open_meteo(query, archive=False)
+
+
+def open_meteo_archive(query: dict[str, list[str]]) -> tuple[int, object]:
+    """Mimic GET /v1/archive (historical reanalysis), returning (status, body)."""
+    return _open_meteo(query, archive=True)
+
+
+def _open_meteo(query: dict[str, list[str]], archive: bool) -> tuple[int, object]:
+    def param(name: str, default: str = "") -> str:
+        return query.get(name, [default])[0]
+
+    try:
+        lats = [float(x) for x in param("latitude").split(",")]
+        lngs = [float(x) for x in param("longitude").split(",")]
+    except ValueError:
+        return 400, {"error": True, "reason": "Latitude and longitude must be numeric"}
+    if len(lats) != len(lngs):
+        return 400, {"error": True, "reason": "Parameter 'latitude' and 'longitude' must have the same number of elements"}
+
+    variables = [v for v in param("hourly").split(",") if v]
+    if archive and FORECAST_ONLY & set(variables):
+        unknown = sorted(FORECAST_ONLY & set(variables))[0]
+        return 400, {"error": True, "reason": f"Cannot initialize WeatherVariable from invalid String value {unknown}"}
+    timezones = param("timezone", "GMT").split(",")
+    if len(timezones) == 1:
+        timezones = timezones * len(lats)
+    model = param("models", "era5" if archive else "best_match")
+
+    if archive and not (param("start_date") and param("end_date")):
+        return 400, {"error": True, "reason": "Parameter 'start_date' and 'end_date' are required"}
+    try:
+        if param("start_date"):
+            start = date.fromisoformat(param("start_date"))
+            end = date.fromisoformat(param("end_date") or param("start_date"))
+        else:
+            start = date.today()
+            end = start + timedelta(days=int(param("forecast_days", "7")) - 1)
+    except ValueError as exc:
+        return 400, {"error": True, "reason": str(exc)}
+    if end < start or (end - start).days >= (MAX_ARCHIVE_DAYS if archive else MAX_FORECAST_DAYS * 2):
+        return 400, {"error": True, "reason": "Invalid date range"}
+
+    try:
+        results = [
+            _forecast_for_location(lat, lng, start, end, variables, tz, model)
+            for lat, lng, tz in zip(lats, lngs, timezones)
+        ]
+    except ValueError as exc:
+        return 400, {"error": True, "reason": str(exc)}
+
+    if len(results) == 1:
+        return 200, results[0]
+    for i, r in enumerate(results):
+        r["location_id"] = i
+    return 200, results
+
+
+def nominatim_search(query: dict[str, list[str]]) -> tuple[int, object]:
+    """Mimic GET /search?q=...&format=json — 'nowhere' never resolves."""
+    q = query.get("q", [""])[0]
+    if not q or "nowhere" in q.lower():
+        return 200, []
+    rng = _rng("nominatim", q.lower())
+    lat = round(rng.uniform(-60, 65), 7)
+    lng = round(rng.uniform(-180, 180), 7)
+    return 200, [{
+        "place_id": rng.randrange(1, 10**9),
+        "licence": "Data © OpenStreetMap contributors, ODbL 1.0.",
+        "osm_type": "node",
+        "osm_id": rng.randrange(1, 10**10),
+        "lat": str(lat),
+        "lon": str(lng),
+        "class": "place",
+        "type": "city",
+        "importance": round(rng.random(), 3),
+        "display_name": f"{q}, Stand-in",
+        "boundingbox": [str(lat - 0.05), str(lat + 0.05), str(lng - 0.05), str(lng + 0.05)],
+    }]
+
+
+def open_elevation_lookup(query: dict[str, list[str]]) -> tuple[int, object]:
+    """Mimic GET /api/v1/lookup?locations=lat,lng|lat,lng."""
+    results = []
+    for pair in query.get("locations", [""])[0].split("|"):
+        try:
+            lat, lng = (float(x) for x in pair.split(","))
+        except ValueError:
+            return 400, {"error": "Invalid locations"}
+        elevation = round(_rng("elevation", round(lat, 2), round(lng, 2)).uniform(0, 1500), 1)
+        results.append({"latitude": lat, "longitude": lng, "elevation": elevation})
+    return 200, {"results": results}
+
+
+ROUTES = {
+    "/v1/forecast": ("open_meteo", open_meteo_forecast),
+    "/v1/archive": ("open_meteo", open_meteo_archive),
+    "/search": ("nominatim", nominatim_search),
+    "/api/v1/lookup": ("open_elevation", open_elevation_lookup),
+}
+
+
+# ── Web Push ──────────────────────────────────────────────────────────────────
+
+def _b64(value: bytes) -> str:
+    return base64.urlsafe_b64encode(value).rstrip(b"=").decode()
+
+
+def _unb64(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+class PushService:
+    """Issues subscriptions and decrypts what is pushed to them (RFC 8291)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions: dict[str, tuple[object, bytes, bool]] = {}  # token → (key, auth, gone)
+        self.delivered = Counter()
+
+    def subscribe(self, base_url: str, count: int, gone_rate: float) -> list[dict]:
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import ec
+
+        issued = []
+        for _ in range(count):
+            key = ec.generate_private_key(ec.SECP256R1())
+            auth = secrets.token_bytes(16)
+            token = secrets.token_urlsafe(16)
+            with self._lock:
+                self._subscriptions[token] = (key, auth, random.random() < gone_rate)
+            public = key.public_key().public_bytes(
+                serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint
+            )
+            issued.append({
+                "endpoint": f"{base_url}/push/{token}",
+                "keys": {"p256dh": _b64(public), "auth": _b64(auth)},
+            })
+        return issued
+
+    def push(self, token: str, headers, body: bytes) -> tuple[int, object]:
+        with self._lock:
+            subscription = self._subscriptions.get(token)
+        if subscription is None:
+            return 404, {"error": "unknown subscription"}
+        key, auth, gone = subscription
+        if gone:
+            self._count("gone")
+            return 410, {"error": "subscription expired"}
+        if not headers.get("Authorization", "").startswith("vapid t=") or not headers.get("TTL"):
+            self._count("rejected")
+            return 401, {"error": "missing VAPID authorization or TTL"}
+        if headers.get("Content-Encoding") != "aes128gcm":
+            self._count("rejected")
+            return 415, {"error": "Content-Encoding must be aes128gcm"}
+        try:
+            self._decrypt(key, auth, body)
+        except Exception as exc:
+            self._count("undecryptable")
+            return 400, {"error": f"cannot decrypt: {exc}"}
+        self._count("delivered")
+        return 201, {}
+
+    def _count(self, outcome: str):
+        with self._lock:
+            self.delivered[outcome] += 1
+
+    @staticmethod
+    def _decrypt(key, auth: bytes, body: bytes) -> bytes:
+        from cryptography.hazmat.primitives import hashes, hmac, serialization
+        from cryptography.hazmat.primitives.asymmetric import ec
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+        def hmac_sha256(k: bytes, data: bytes) -> bytes:
+            h = hmac.HMAC(k, hashes.SHA256())
+            h.update(data)
+            return h.finalize()
+
+        salt, id_len = body[:16], body[20]
+        as_public, ciphertext = body[21:21 + id_len], body[21 + id_len:]
+        ua_public = key.public_key().public_bytes(
+            serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint
+        )
+        shared = key.exchange(ec.ECDH(), ec.EllipticCurvePublicKey.from_encoded_point(ec.SECP256R1(), as_public))
+        ikm = hmac_sha256(hmac_sha256(auth, shared), b"WebPush: info\x00" + ua_public + as_public + b"\x01")
+        prk = hmac_sha256(salt, ikm)
+        cek = hmac_sha256(prk, b"Content-Encoding: aes128gcm\x00\x01")[:16]
+        nonce = hmac_sha256(prk, b"Content-Encoding: nonce\x00\x01")[:12]
+        plaintext = AESGCM(cek).decrypt(nonce, ciphertext, None)
+        if not plaintext.endswith(b"\x02"):
+            raise ValueError("missing last-record delimiter")
+        return plaintext[:-1]
+
+
+# ── HTTP plumbing ─────────────────────────────────────────────────────────────
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, faults: Faults, verbose: bool = False):
+        super().__init__(address, StandInHandler)
+        self.faults = faults
+        self.stats = Stats()
+        self.push_service = PushService()
+        self.verbose = verbose
+        self._rng = random.Random()
+        self._rng_lock = threading.Lock()
+
+    def roll(self) -> tuple[float, bool]:
+        """Return (delay seconds, should fail) for one request."""
+        f = self.faults
+        with self._rng_lock:
+            delay = max(0.0, f.latency_ms + self._rng.uniform(-f.jitter_ms, f.jitter_ms)) / 1000
+            fail = self._rng.random() < f.error_rate
+        return delay, fail
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    server: StandInServer
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        if url.path == "/__stats":
+            return self._send(200, {**self.server.stats.snapshot(), "push": dict(self.server.push_service.delivered)})
+        if url.path == "/__reset":
+            self.server.stats.reset()
+            self.server.push_service.delivered.clear()
+            return self._send(200, {"ok": True})
+        if url.path == "/__config":
+            return self._configure(query)
+        if url.path == "/push/__subscribe":
+            try:
+                count = int(query.get("count", ["1"])[0])
+                gone_rate = float(query.get("gone_rate", ["0"])[0])
+            except ValueError:
+                return self._send(400, {"error": True, "reason": "count and gone_rate must be numeric"})
+            base_url = f"http://{self.headers.get('Host', '%s:%s' % self.server.server_address[:2])}"
+            return self._send(200, self.server.push_service.subscribe(base_url, count, gone_rate))
+
+        route = ROUTES.get(url.path.rstrip("/") or url.path)
+        if route is None:
+            return self._send(404, {"error": True, "reason": f"No stand-in for {url.path}"})
+        upstream, handler = route
+
+        delay, fail = self.server.roll()
+        if delay:
+            time.sleep(delay)
+        if fail:
+            self.server.stats.record(upstream, failed=True)
+            return self._send(self.server.faults.error_status, {"error": True, "reason": "Injected failure"})
+
+        status, body = handler(query)
+        self.server.stats.record(upstream, failed=status >= 400)
+        self._send(status, body)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if not url.path.startswith("/push/"):
+            return self._send(404, {"error": True, "reason": f"No stand-in for POST {url.path}"})
+
+        delay, fail = self.server.roll()
+        if delay:
+            time.sleep(delay)
+        if fail:
+            self.server.stats.record("web_push", failed=True)
+            return self._send(self.server.faults.error_status, {"error": True, "reason": "Injected failure"})
+
+        status, payload = self.server.push_service.push(url.path.removeprefix("/push/"), self.headers, body)
+        self.server.stats.record("web_push", failed=status >= 400)
+        self._send(status, payload)
+
+    def _configure(self, query: dict[str, list[str]]):
+        faults = self.server.faults
+        for f in fields(Faults):
+            if f.name in query:
+                try:
+                    setattr(faults, f.name, type(getattr(faults, f.name))(query[f.name][0]))
+                except ValueError:
+                    return self._send(400, {"error": True, "reason": f"Bad value for {f.name}"})
+        self._send(200, asdict(faults))
+
+    def _send(self, status: int, body: object):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            logger.info("%s %s", self.address_string(), format % args)
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Local Open-Meteo / Nominatim / open-elevation / Web Push stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="mean injected latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="uniform ± jitter around the mean")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail (0–1)")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status returned for injected failures")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    faults = Faults(args.latency_ms, args.jitter_ms, args.error_rate, args.error_status)
+    server = StandInServer((args.host, args.port), faults, verbose=args.verbose)
+    logger.info("Stand-in listening on http://%s:%s (%s)", args.host, args.port, faults)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
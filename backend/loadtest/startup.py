@@ -0,0 +1,137 @@
+"""
+Cold-start benchmark for web and Django-Q worker processes.
+
+Boots each process kind in a fresh interpreter under `python -X importtime`,
+several times, and reports the median wall time to ready plus the import
+cost attributed to each top-level package (the sum of its modules' self
+times), so a dependency creeping onto the startup path shows up by name.
+
+Profiles:
+    web     django.setup(), the WSGI app and the full URLconf (which pulls
+            in every view module), i.e. what a web worker pays before its
+            first request
+    worker  django.setup() and the Django-Q cluster, i.e. what a recycled
+            Q worker pays before its first task
+
+Usage:
+    python -m loadtest.startup --runs 5 --top 15
+    python -m loadtest.startup --profile worker --json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+PROFILES = {
+    "web": (
+        "import django; django.setup(); "
+        "from config.wsgi import application; "
+        "from django.urls import get_resolver; get_resolver().url_patterns"
+    ),
+    "worker": "import django; django.setup(); import django_q.cluster",
+}
+
+_TIMER = (
+    "import time; _t = time.perf_counter()\n"
+    "{body}\n"
+    "print('__ready__', time.perf_counter() - _t)\n"
+)
+
+
+def boot_once(profile: str, settings_module: str) -> tuple[float, dict[str, float]]:
+    """Boot one fresh interpreter; returns (seconds to ready, {module: self seconds})."""
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings_module}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _TIMER.format(body=PROFILES[profile])],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=False,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{profile} boot failed:\n{proc.stderr[-2000:]}")
+
+    ready = next(float(line.split()[1]) for line in proc.stdout.splitlines() if line.startswith("__ready__"))
+    modules = {}
+    for line in proc.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(self_us) / 1e6
+    return ready, modules
+
+
+def run(profile: str, runs: int, settings_module: str) -> dict:
+    ready_times = []
+    by_package: dict[str, list[float]] = defaultdict(list)
+    module_count = 0
+    for _ in range(runs):
+        ready, modules = boot_once(profile, settings_module)
+        ready_times.append(ready)
+        module_count = len(modules)
+        totals: dict[str, float] = defaultdict(float)
+        for name, seconds in modules.items():
+            totals[name.split(".")[0]] += seconds
+        for package, seconds in totals.items():
+            by_package[package].append(seconds)
+
+    packages = {
+        # A package missing from some runs (already imported elsewhere) counts as 0 there
+        package: statistics.median(samples + [0.0] * (runs - len(samples)))
+        for package, samples in by_package.items()
+    }
+    return {
+        "profile": profile,
+        "runs": runs,
+        "ready_ms": round(statistics.median(ready_times) * 1000, 1),
+        "ready_ms_min": round(min(ready_times) * 1000, 1),
+        "modules_imported": module_count,
+        "packages_ms": {
+            name: round(seconds * 1000, 1)
+            for name, seconds in sorted(packages.items(), key=lambda item: item[1], reverse=True)
+        },
+    }
+
+
+def print_report(report: dict, top: int):
+    print(
+        f"\n  {report['profile']}: {report['ready_ms']}ms to ready "
+        f"(median of {report['runs']}, best {report['ready_ms_min']}ms), "
+        f"{report['modules_imported']} modules imported\n"
+    )
+    print(f"  {'package':<28} {'import ms':>10}")
+    for name, ms in list(report["packages_ms"].items())[:top]:
+        print(f"  {name:<28} {ms:>10.1f}")
+    print()
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Measure web and Q-worker cold start, with import cost per package.")
+    parser.add_argument("--profile", choices=[*PROFILES, "all"], default="all")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="packages to list per profile")
+    parser.add_argument(
+        "--settings",
+        default=os.environ.get("DJANGO_SETTINGS_MODULE", "config.settings.development"),
+        help="DJANGO_SETTINGS_MODULE for the booted processes",
+    )
+    parser.add_argument("--json", action="store_true", help="print the reports as JSON")
+    args = parser.parse_args(argv)
+
+    profiles = list(PROFILES) if args.profile == "all" else [args.profile]
+    reports = [run(profile, args.runs, args.settings) for profile in profiles]
+    if args.json:
+        json.dump(reports, sys.stdout, indent=2)
+        print()
+    else:
+        for report in reports:
+            print_report(report, args.top)
+
+
+if __name__ == "__main__":
+    main()
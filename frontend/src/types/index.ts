@@ -25,6 +25,8 @@ export interface SunsetForecast {
   wind_speed: number | null
   quality_score: number
   quality_label: 'poor' | 'fair' | 'good' | 'great' | 'epic'
+  ensemble_spread: number | null
+  ensemble_members: number | null
   fetched_at: string
 }
 